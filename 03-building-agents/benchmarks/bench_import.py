@@ -0,0 +1,85 @@
+"""Import-time regression check for lib modules.
+
+Imports each module in a fresh interpreter under ``python -X importtime``
+and reports its cumulative import time (median of --repeat runs). Fails
+(exit code 1) when a module exceeds the budget or pulls in a heavy
+optional dependency that should only load when its feature is used.
+
+Usage:
+    python benchmarks/bench_import.py [--budget-ms 1200] [--repeat 5]
+        [--modules lib.agents lib.llm ...]
+"""
+from __future__ import annotations
+
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+PACKAGE_ROOT = Path(__file__).resolve().parents[1]
+
+DEFAULT_MODULES = ["lib.agents", "lib.llm", "lib.tools", "lib.memory", "lib.rag", "lib.vector_db"]
+# Loaded on first use only (VectorStoreManager, web_search/HTTP tools, PDFLoader)
+HEAVY_MODULES = {"chromadb", "tavily", "requests", "pdfplumber"}
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+def measure(module: str) -> Tuple[float, Set[str]]:
+    """Cumulative import time of ``module`` in ms, and the top-level packages it imported"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PACKAGE_ROOT, capture_output=True, text=True, check=True,
+    )
+    total_us = 0
+    packages: Set[str] = set()
+    for line in completed.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        _, cumulative, indent, name = match.groups()
+        packages.add(name.split(".")[0])
+        if name == module and not indent:
+            total_us = int(cumulative)
+    return total_us / 1000, packages
+
+
+def run(modules: List[str], repeat: int) -> Dict[str, Tuple[float, Set[str]]]:
+    results = {}
+    for module in modules:
+        samples, packages = [], set()
+        for _ in range(repeat):
+            elapsed_ms, packages = measure(module)
+            samples.append(elapsed_ms)
+        results[module] = (statistics.median(samples), packages)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=1200.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'module':<16} {'median ms':>10}  heavy dependencies")
+    for module, (elapsed_ms, packages) in run(args.modules, args.repeat).items():
+        heavy = sorted(HEAVY_MODULES & packages)
+        print(f"{module:<16} {elapsed_ms:>10.1f}  {', '.join(heavy) or '-'}")
+        if elapsed_ms > args.budget_ms:
+            failures.append(f"{module} took {elapsed_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+        if heavy:
+            failures.append(f"{module} imports {', '.join(heavy)} at load time")
+
+    if failures:
+        print("\nFAILED:\n - " + "\n - ".join(failures))
+        sys.exit(1)
+    print(f"\nOK: all modules within {args.budget_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
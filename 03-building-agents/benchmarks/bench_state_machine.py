@@ -0,0 +1,85 @@
+"""Micro-benchmark for StateMachine per-step overhead.
+
+Runs a loop of no-op steps so the numbers reflect only the machine's own
+bookkeeping (schema checks, transition lookup, snapshots), not step logic.
+
+The uncompiled path no longer exists in the tree, so its numbers are checked
+in next to this script (bench_state_machine.baseline.json) and printed beside
+the compiled measurement. Compare them on the machine that recorded them.
+
+Usage:
+    python benchmarks/bench_state_machine.py [--steps 2000] [--repeat 5]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional, TypedDict
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from lib.state_machine import EntryPoint, StateMachine, Step, Termination  # noqa: E402
+
+BASELINE_PATH = Path(__file__).with_name("bench_state_machine.baseline.json")
+
+
+class BenchState(TypedDict):
+    user_query: str
+    instructions: str
+    messages: List[str]
+    current_tool_calls: Optional[List[str]]
+    session_id: str
+    total_tokens: Optional[int]
+    count: int
+
+
+def build_machine(steps: int) -> StateMachine[BenchState]:
+    machine = StateMachine[BenchState](BenchState)
+    entry = EntryPoint[BenchState]()
+    tick = Step[BenchState]("tick", lambda state: {"count": state["count"] + 1})
+    termination = Termination[BenchState]()
+    machine.add_steps([entry, tick, termination])
+    machine.connect(entry, tick)
+    machine.connect(tick, [tick, termination],
+                    lambda state: tick if state["count"] < steps else termination)
+    return machine
+
+
+def measure(steps: int, repeat: int) -> List[float]:
+    machine = build_machine(steps)
+    if hasattr(machine, "compile"):
+        machine.compile()
+    per_step_us: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        machine.run({"user_query": "q", "messages": [], "session_id": "s", "count": 0})
+        elapsed = time.perf_counter() - started
+        per_step_us.append(elapsed / steps * 1e6)
+    return per_step_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    samples = measure(args.steps, args.repeat)
+    median = statistics.median(samples)
+    print(f"steps/run: {args.steps}  runs: {args.repeat}")
+    print(f"{'':<12}{'median':>10}{'min':>10}{'max':>10}  (us/step)")
+    if BASELINE_PATH.exists():
+        baseline = json.loads(BASELINE_PATH.read_text())
+        print(f"{'uncompiled':<12}{baseline['median_us']:>10.2f}{baseline['min_us']:>10.2f}"
+              f"{baseline['max_us']:>10.2f}  (recorded, Python {baseline['python']})")
+    print(f"{'compiled':<12}{median:>10.2f}{min(samples):>10.2f}{max(samples):>10.2f}")
+    if BASELINE_PATH.exists():
+        print(f"speedup: {baseline['median_us'] / median:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
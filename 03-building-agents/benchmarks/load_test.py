@@ -0,0 +1,162 @@
+"""Load test: N concurrent agent sessions against the local mock OpenAI server.
+
+Each session runs a full Agent turn (LLM -> tool call -> LLM) over real HTTP
+through lib.clients and lib.scheduler, so the numbers show the overhead of
+the agent loop and client stack under concurrency, with the provider's
+latency replaced by a configurable distribution.
+
+Usage:
+    python benchmarks/load_test.py [--sessions 200] [--concurrency 32]
+        [--latency-median 0.2] [--latency-sigma 0.5] [--mode thread|async]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from lib.agents import Agent  # noqa: E402
+from lib.mock_server import LatencyModel, MockOpenAIServer  # noqa: E402
+from lib.state_machine import latency_stats  # noqa: E402
+from lib.tooling import TokenCounter, set_default_token_counter, tool  # noqa: E402
+
+
+@tool
+def lookup_order(order_id: str) -> dict:
+    """Look up the status of an order.
+
+    Inputs:
+        order_id (str): Order identifier
+    """
+    return {"order_id": order_id, "status": "shipped"}
+
+
+def build_agent() -> Agent:
+    return Agent(
+        model_name="gpt-4o-mini",
+        instructions="You are a support agent. Use tools to answer.",
+        tools=[lookup_order],
+        temperature=0.0,
+    )
+
+
+class ApproximateEncoding:
+    """About 4 characters per token, for when o200k_base cannot be downloaded"""
+
+    def encode(self, text: str) -> List[int]:
+        return [0] * (len(text) // 4 + 1)
+
+    def encode_batch(self, texts: List[str]) -> List[List[int]]:
+        return [self.encode(text) for text in texts]
+
+
+def use_offline_token_counter_if_needed() -> bool:
+    """Fall back to ApproximateEncoding when tiktoken's files are not available.
+
+    Returns:
+        True if the fallback was installed
+    """
+    try:
+        TokenCounter().encoding
+        return False
+    except Exception:
+        set_default_token_counter(TokenCounter(encoding=ApproximateEncoding()))
+        return True
+
+
+Result = Tuple[float, Optional[BaseException]]
+
+
+def session(agent: Agent, index: int) -> Result:
+    started = time.perf_counter()
+    try:
+        agent.invoke(f"Where is order {index}?", session_id=f"session-{index}")
+        error = None
+    except Exception as e:
+        error = e
+    return time.perf_counter() - started, error
+
+
+async def asession(agent: Agent, index: int, semaphore: asyncio.Semaphore) -> Result:
+    async with semaphore:
+        started = time.perf_counter()
+        try:
+            await agent.ainvoke(f"Where is order {index}?", session_id=f"session-{index}")
+            error = None
+        except Exception as e:
+            error = e
+        return time.perf_counter() - started, error
+
+
+def run_threads(agent: Agent, sessions: int, concurrency: int) -> List[Result]:
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(lambda i: session(agent, i), range(sessions)))
+
+
+def run_async(agent: Agent, sessions: int, concurrency: int) -> List[Result]:
+    async def main() -> List[Result]:
+        semaphore = asyncio.Semaphore(concurrency)
+        return await asyncio.gather(*(asession(agent, i, semaphore) for i in range(sessions)))
+    return asyncio.run(main())
+
+
+def percentile(ordered: List[float], p: float) -> float:
+    # Nearest-rank, as in lib.state_machine.latency_stats
+    rank = max(1, -(-len(ordered) * p // 100))
+    return ordered[int(rank) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency-median", type=float, default=0.2, help="seconds per chat completion")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="lognormal spread (0 = fixed)")
+    parser.add_argument("--mode", choices=["thread", "async"], default="thread")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.latency_sigma > 0:
+        latency = LatencyModel.lognormal(args.latency_median, args.latency_sigma, seed=args.seed)
+    else:
+        latency = LatencyModel.fixed(args.latency_median)
+
+    if use_offline_token_counter_if_needed():
+        print("tiktoken o200k_base unavailable: estimating tokens at ~4 characters each")
+    with MockOpenAIServer(latency=latency) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "mock")
+        agent = build_agent()
+        runner = run_async if args.mode == "async" else run_threads
+        started = time.perf_counter()
+        results = runner(agent, args.sessions, args.concurrency)
+        elapsed = time.perf_counter() - started
+        requests = dict(server.requests)
+
+    # Failed sessions would flatter throughput and latency: report successes only
+    durations = sorted(duration for duration, error in results if error is None)
+    errors = [error for _, error in results if error is not None]
+    print(f"sessions: {args.sessions}  concurrency: {args.concurrency}  mode: {args.mode}  "
+          f"failures: {len(errors)}")
+    if errors:
+        print(f"first failure: {type(errors[0]).__name__}: {errors[0]}")
+    print(f"mock latency: {latency.kind} median {args.latency_median:.3f}s sigma {args.latency_sigma}")
+    print(f"chat requests: {requests['chat']}  wall time: {elapsed:.2f}s")
+    print(f"throughput: {len(durations) / elapsed:.1f} sessions/s, {requests['chat'] / elapsed:.1f} requests/s")
+    if durations:
+        stats = latency_stats(durations)
+        print(f"session latency: p50 {stats['p50_ms']:.0f} ms, p95 {stats['p95_ms']:.0f} ms, "
+              f"p99 {percentile(durations, 99) * 1000:.0f} ms, max {stats['max_ms']:.0f} ms")
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,20 @@
-from typing import TypedDict, List, Optional, Union, TypeVar
+from typing import TypedDict, Any, Callable, Dict, Iterator, List, Literal, Optional, Set, Tuple, Union
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait as wait_futures
+from collections import deque
+from dataclasses import dataclass
+import asyncio
 import json
+import queue
+import threading
+import time
 
-from lib.state_machine import StateMachine, Step, EntryPoint, Termination, Run
+from lib.state_machine import StateMachine, Step, EntryPoint, Termination, Run, Resource, SnapshotRetention
 from lib.llm import LLM
-from lib.messages import AIMessage, UserMessage, SystemMessage, ToolMessage
-from lib.tooling import Tool, ToolCall
-from lib.memory import ShortTermMemory
+from lib.messages import AIMessage, BaseMessage, UserMessage, SystemMessage, ToolMessage
+from lib.sandbox import ToolMemoryError, ToolTimeoutError
+from lib.tooling import Tool, ToolArgumentError, ToolCall
+from lib.memory import ConversationWindow, ShortTermMemory
+from lib.caching import MISSING, ToolResultCache
 
 
 # Define the state schema
@@ -17,7 +26,31 @@ class AgentState(TypedDict):
     session_id: str  # Session identifier for memory management
     total_tokens: Optional[int]  # Tokens used by the most recent LLM call
     cumulative_tokens: Optional[int]  # Tokens used by all LLM calls in this run so far
+    conversation_summary: Optional[str]  # Summary of turns evicted from the session window
     
+class StreamCancelled(Exception):
+    """Raised inside a streamed run once its consumer stops iterating"""
+
+
+@dataclass
+class AgentEvent:
+    """One item of Agent.stream().
+
+    Types:
+        token: ``content`` holds the next fragment of the assistant's reply
+        tool_start: a tool call is about to run (``tool_call_id``, ``name``, ``arguments``)
+        tool_end: a tool call finished (``tool_call_id``, ``name``, ``result``)
+        run_end: the workflow finished; ``run`` is the final Run
+    """
+    type: Literal["token", "tool_start", "tool_end", "run_end"]
+    content: str = ""
+    tool_call_id: Optional[str] = None
+    name: Optional[str] = None
+    arguments: Optional[Dict[str, Any]] = None
+    result: Any = None
+    run: Optional[Run] = None
+
+
 class Agent:
     def __init__(self, 
                  model_name: str,
@@ -25,7 +58,14 @@ class Agent:
                  tools: List[Tool] = None,
                  temperature: float = 0.7,
                  include_tool_docs: bool = True,
-                 strict_tool_validation: bool = True):
+                 strict_tool_validation: bool = True,
+                 history_token_budget: Optional[int] = None,
+                 history_summarizer: Optional[Callable[[Optional[str], List[BaseMessage]], str]] = None,
+                 history_token_counter: Optional[Callable[[BaseMessage], int]] = None,
+                 max_tool_workers: int = 8,
+                 tool_timeout: Optional[float] = 60.0,
+                 tool_cache: Optional[ToolResultCache] = None,
+                 snapshot_retention: Optional[SnapshotRetention] = None):
         """
         Initialize an Agent instance
         
@@ -34,6 +74,25 @@ class Agent:
             instructions: System instructions for the agent
             tools: Optional list of tools available to the agent
             temperature: Temperature parameter for LLM (default: 0.7)
+            history_token_budget: Tokens of prior conversation replayed per
+                session (default: half of the model's input budget, leaving
+                room for instructions, tools and the current tool loop)
+            history_summarizer: Optional callable(previous_summary, evicted_messages)
+                that summarizes turns dropped from the window (see
+                lib.memory.llm_summarizer)
+            history_token_counter: Optional per-message token counter
+                (default: tiktoken o200k_base estimate)
+            max_tool_workers: Maximum tool calls from one assistant turn that
+                run concurrently
+            tool_timeout: Seconds to wait for a tool call unless the tool sets
+                its own ``timeout`` (None = wait forever). A timed-out call is
+                answered with a {"status": "error"} result so the model can
+                react; only ``mode="process"`` tools are actually stopped.
+            tool_cache: Optional cache shared across runs (and agents) for
+                results of tools declared with ``@tool(cacheable=True)``
+            snapshot_retention: Which snapshots each Run keeps (default: all),
+                e.g. SnapshotRetention.last(4) to bound memory per session
+                when tool loops run long
         """
         self.tools = tools if tools else []
         if strict_tool_validation and self.tools:
@@ -41,10 +100,40 @@ class Agent:
         self.instructions = self._augment_instructions_with_tools(instructions) if include_tool_docs and self.tools else instructions
         self.model_name = model_name
         self.temperature = temperature
-        self.memory = ShortTermMemory()
+        # One LLM per agent, built on first use so an Agent can be created before
+        # credentials are configured; it reuses the process-wide pooled OpenAI client
+        self._llm: Optional[LLM] = None
+        self._llm_lock = threading.Lock()
+        # Finished runs are stored as they are; retention bounds their size
+        self.memory = ShortTermMemory(copy_objects=False)
+        self._history_token_budget = history_token_budget
+        self.history_summarizer = history_summarizer
+        self.history_token_counter = history_token_counter
+        self.conversations: Dict[str, ConversationWindow] = {}
+        self.max_tool_workers = max_tool_workers
+        self.tool_timeout = tool_timeout
+        self.tool_cache = tool_cache
+        self.snapshot_retention = snapshot_retention
                 
-        # Initialize state machine
+        # Initialize state machine (the async variant is built on first ainvoke)
         self.workflow = self._create_state_machine()
+        self._async_workflow: Optional[StateMachine[AgentState]] = None
+
+    @property
+    def llm(self) -> LLM:
+        if self._llm is None:
+            with self._llm_lock:
+                if self._llm is None:
+                    self._llm = LLM(
+                        model=self.model_name,
+                        temperature=self.temperature,
+                        tools=self.tools
+                    )
+        return self._llm
+
+    @property
+    def history_token_budget(self) -> int:
+        return self._history_token_budget or self.llm.model_config.input_budget_tokens // 2
 
     def _augment_instructions_with_tools(self, base_instructions: str) -> str:
         lines = []
@@ -89,23 +178,24 @@ class Agent:
             if getattr(m, "role", None) != "system"
         ]
 
-        messages = [SystemMessage(content=state["instructions"])]
+        instructions = state["instructions"]
+        if state.get("conversation_summary"):
+            instructions += "\n\nSummary of the earlier conversation:\n" + state["conversation_summary"]
+
+        messages = [SystemMessage(content=instructions)]
         messages.extend(prior_without_system)
         messages.append(UserMessage(content=state["user_query"]))
 
         return {"messages": messages, "session_id": state["session_id"]}
 
-    def _llm_step(self, state: AgentState) -> AgentState:
-        """Step logic: Process the current state through the LLM"""
+    @staticmethod
+    def _emitter(resource: Optional[Resource]) -> Optional[Callable[[AgentEvent], None]]:
+        """Event sink set by Agent.stream() (None for plain invoke)"""
+        return resource.vars.get("emit") if resource is not None else None
 
-        # Initialize LLM
-        llm = LLM(
-            model=self.model_name,
-            temperature=self.temperature,
-            tools=self.tools
-        )
-
-        response = llm.invoke(state["messages"])
+    def _llm_update(self, state: AgentState, response: AIMessage) -> AgentState:
+        """Turn an LLM reply into the state update shared by the sync and async LLM steps"""
+        llm = self.llm
         tool_calls = response.tool_calls if response.tool_calls else None
 
         # Create AI message with content and tool calls
@@ -123,34 +213,200 @@ class Agent:
                 last_total = llm.last_usage.get("total_tokens")
                 updated["total_tokens"] = last_total
                 prev_cum = state.get("cumulative_tokens", 0) or 0
-                if last_total is not None:
+                # A ResponseCache hit replays the original call's usage without spending it
+                if last_total is not None and not llm.last_usage.get("cached"):
                     updated["cumulative_tokens"] = prev_cum + int(last_total)
             except Exception:
                 pass
         return updated
 
-    def _tool_step(self, state: AgentState) -> AgentState:
-        """Step logic: Execute any pending tool calls"""
-        tool_calls = state["current_tool_calls"] or []
-        tool_messages = []
-        
-        for call in tool_calls:
-            # Access tool call data correctly
-            function_name = call.function.name
-            function_args = json.loads(call.function.arguments)
-            tool_call_id = call.id
-            # Find the matching tool
-            tool = next((t for t in self.tools if t.name == function_name), None)
-            if tool:
-                # Preserve structured results so the model can reason on fields
-                result = tool(**function_args)
-                tool_messages.append(
-                    ToolMessage(
-                        content=json.dumps(result), 
-                        tool_call_id=tool_call_id, 
-                        name=function_name, 
-                    )
-                )
+    def _llm_step(self, state: AgentState, resource: Resource = None) -> AgentState:
+        """Step logic: Process the current state through the LLM"""
+        emit = self._emitter(resource)
+        if emit is None:
+            response = self.llm.invoke(state["messages"])
+        else:
+            for event in self.llm.stream(state["messages"]):
+                if event.type == "delta":
+                    emit(AgentEvent("token", content=event.content))
+                else:
+                    response = event.message
+        return self._llm_update(state, response)
+
+    async def _allm_step(self, state: AgentState) -> AgentState:
+        """Async step logic: Process the current state through the LLM"""
+        response = await self.llm.ainvoke(state["messages"])
+        return self._llm_update(state, response)
+
+    def _tool_timeout(self, tool: Tool) -> Optional[float]:
+        return tool.timeout if tool.timeout is not None else self.tool_timeout
+
+    @staticmethod
+    def _error_result(message: str) -> Dict[str, str]:
+        # Same envelope as the tools' own {"status": "error"} results
+        return {"status": "error", "error": message}
+
+    def _timeout_result(self, call: ToolCall, timeout: Optional[float]) -> Dict[str, str]:
+        return self._error_result(f"Tool '{call.function.name}' timed out after {timeout}s")
+
+    def _failure_result(self, call: ToolCall, tool: Tool, error: Exception) -> Dict[str, str]:
+        """Error envelope for a call stopped by its timeout or memory limit"""
+        if isinstance(error, ToolMemoryError):
+            return self._error_result(
+                f"Tool '{call.function.name}' exceeded its memory limit of {tool.memory_limit_mb} MB"
+            )
+        return self._timeout_result(call, self._tool_timeout(tool))
+
+    def _run_tool_calls(self, calls: List[ToolCall], tools: List[Tool],
+                        arguments: List[Dict[str, Any]]) -> Tuple[List[Any], Set[int]]:
+        """Run tool calls according to their execution modes.
+
+        Thread and process tools run concurrently, at most max_tool_workers at a
+        time (a process tool's thread just waits on its worker process); inline
+        tools run one by one on this thread, without a timeout. A call's timeout
+        counts from when it starts, not while it waits for a free worker.
+
+        Returns:
+            The results in call order, and the positions of calls that failed
+            to finish (timeout or memory limit)
+        """
+        if len(calls) == 1 and (tools[0].mode == "inline" or (
+                tools[0].mode == "thread" and tools[0].timeout is None and self.tool_timeout is None)):
+            return [tools[0](**arguments[0])], set()
+
+        pooled = deque(i for i, tool in enumerate(tools) if tool.mode != "inline")
+        max_running = max(1, self.max_tool_workers)
+        # One thread per call: a timed-out thread-mode call cannot be stopped,
+        # so it keeps its thread while the next call starts on a new one
+        pool = ThreadPoolExecutor(max_workers=max(1, len(pooled)), thread_name_prefix="agent-tool")
+        results: List[Any] = [None] * len(calls)
+        failed: Set[int] = set()
+        # Position -> (future, deadline); at most max_tool_workers at a time
+        running: Dict[int, Tuple[Future, Optional[float]]] = {}
+
+        def start_calls():
+            while pooled and len(running) < max_running:
+                i = pooled.popleft()
+                timeout = self._tool_timeout(tools[i])
+                # Each call's timeout counts from its own start; process tools
+                # enforce theirs by killing the worker
+                deadline = None if timeout is None or tools[i].mode == "process" else time.monotonic() + timeout
+                running[i] = (pool.submit(tools[i].execute, arguments[i], timeout), deadline)
+
+        try:
+            start_calls()
+            for i, tool in enumerate(tools):
+                if tool.mode == "inline":
+                    results[i] = tool(**arguments[i])
+            while running:
+                deadlines = [deadline for _, deadline in running.values() if deadline is not None]
+                wait_time = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+                wait_futures([future for future, _ in running.values()], timeout=wait_time,
+                             return_when=FIRST_COMPLETED)
+                now = time.monotonic()
+                for i, (future, deadline) in list(running.items()):
+                    if future.done():
+                        del running[i]
+                        try:
+                            results[i] = future.result()
+                        except (ToolTimeoutError, ToolMemoryError) as e:
+                            failed.add(i)
+                            results[i] = self._failure_result(calls[i], tools[i], e)
+                    elif deadline is not None and now >= deadline:
+                        # Abandon the call; its thread finishes in the background
+                        del running[i]
+                        failed.add(i)
+                        results[i] = self._timeout_result(calls[i], self._tool_timeout(tools[i]))
+                start_calls()
+            return results, failed
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _arun_tool_calls(self, calls: List[ToolCall], tools: List[Tool],
+                               arguments: List[Dict[str, Any]]) -> Tuple[List[Any], Set[int]]:
+        """Async counterpart of _run_tool_calls: async tools are awaited, sync
+        tools run in the default executor (process tools wait on their worker
+        there), at most max_tool_workers at a time. Inline sync tools run on
+        the event loop."""
+        semaphore = asyncio.Semaphore(max(1, self.max_tool_workers))
+
+        async def run_one(tool: Tool, args: Dict[str, Any]) -> Any:
+            if tool.mode == "inline":
+                return await tool.func(**args) if tool.is_async else tool(**args)
+            async with semaphore:
+                if tool.mode == "process":
+                    return await asyncio.to_thread(tool.execute, args, self._tool_timeout(tool))
+                return await asyncio.wait_for(tool.acall(**args), self._tool_timeout(tool))
+
+        outcomes = await asyncio.gather(
+            *[run_one(t, args) for t, args in zip(tools, arguments)], return_exceptions=True
+        )
+        results = []
+        failed: Set[int] = set()
+        for position, (call, tool, outcome) in enumerate(zip(calls, tools, outcomes)):
+            if isinstance(outcome, (asyncio.TimeoutError, ToolMemoryError)):
+                # ToolTimeoutError is a TimeoutError, which asyncio.TimeoutError aliases
+                failed.add(position)
+                results.append(self._failure_result(call, tool, outcome))
+            elif isinstance(outcome, BaseException):
+                raise outcome
+            else:
+                results.append(outcome)
+        return results, failed
+
+    def _resolve_tool_calls(self, state: AgentState) -> Tuple[List[ToolCall], List[Tool], List[Optional[Dict[str, Any]]], Dict[int, Dict[str, Any]]]:
+        """Pending calls to known tools (unknown tools are skipped) with validated arguments.
+
+        Returns:
+            The calls, their tools, their coerced arguments (None where invalid)
+            and, by position, the error results of calls with invalid arguments
+        """
+        tools_by_name = {t.name: t for t in self.tools}
+        known = [call for call in state["current_tool_calls"] or [] if call.function.name in tools_by_name]
+        tools = [tools_by_name[call.function.name] for call in known]
+        arguments: List[Optional[Dict[str, Any]]] = []
+        invalid: Dict[int, Dict[str, Any]] = {}
+        for position, (call, tool) in enumerate(zip(known, tools)):
+            try:
+                arguments.append(tool.validate_arguments(call.function.arguments))
+            except ToolArgumentError as e:
+                # Rejected before running, so the model can fix the call on its next turn
+                arguments.append(None)
+                invalid[position] = e.result()
+        return known, tools, arguments, invalid
+
+    def _cached_results(self, tools: List[Tool], arguments: List[Optional[Dict[str, Any]]],
+                        invalid: Dict[int, Dict[str, Any]]) -> List[Any]:
+        """Results served by the tool cache or argument errors, MISSING where the call must run"""
+        results: List[Any] = [MISSING] * len(tools)
+        for i, error in invalid.items():
+            results[i] = error
+        if self.tool_cache is not None:
+            for i, (tool, args) in enumerate(zip(tools, arguments)):
+                if tool.cacheable and i not in invalid:
+                    results[i] = self.tool_cache.get(tool.name, args)
+        return results
+
+    def _merge_results(self, results: List[Any], pending: List[int], fresh: List[Any],
+                       failed: Set[int], tools: List[Tool], arguments: List[Dict[str, Any]]):
+        for position, (i, result) in enumerate(zip(pending, fresh)):
+            results[i] = result
+            # Error envelopes (e.g. a rate API that was down) are retried next time
+            is_error = isinstance(result, dict) and result.get("status") == "error"
+            if self.tool_cache is not None and tools[i].cacheable and position not in failed and not is_error:
+                self.tool_cache.set(tools[i].name, arguments[i], result, ttl=tools[i].ttl)
+
+    @staticmethod
+    def _tool_update(state: AgentState, calls: List[ToolCall], results: List[Any]) -> AgentState:
+        # Preserve structured results so the model can reason on fields
+        tool_messages = [
+            ToolMessage(
+                content=json.dumps(result),
+                tool_call_id=call.id,
+                name=call.function.name,
+            )
+            for call, result in zip(calls, results)
+        ]
         
         # Clear tool calls and add results to messages
         return {
@@ -159,15 +415,54 @@ class Agent:
             "session_id": state["session_id"],
         }
 
-    def _create_state_machine(self) -> StateMachine[AgentState]:
-        """Create the internal state machine for the agent"""
-        machine = StateMachine[AgentState](AgentState)
+    def _tool_step(self, state: AgentState, resource: Resource = None) -> AgentState:
+        """Step logic: Execute any pending tool calls"""
+        emit = self._emitter(resource)
+        known, tools, arguments, invalid = self._resolve_tool_calls(state)
+
+        if emit is not None:
+            for call, args in zip(known, arguments):
+                emit(AgentEvent("tool_start", tool_call_id=call.id, name=call.function.name, arguments=args))
+
+        results = self._cached_results(tools, arguments, invalid)
+        pending = [i for i, result in enumerate(results) if result is MISSING]
+        if pending:
+            fresh, failed = self._run_tool_calls(
+                [known[i] for i in pending], [tools[i] for i in pending], [arguments[i] for i in pending]
+            )
+            self._merge_results(results, pending, fresh, failed, tools, arguments)
+
+        if emit is not None:
+            for call, result in zip(known, results):
+                emit(AgentEvent("tool_end", tool_call_id=call.id, name=call.function.name, result=result))
+
+        return self._tool_update(state, known, results)
+
+    async def _atool_step(self, state: AgentState) -> AgentState:
+        """Async step logic: Execute any pending tool calls"""
+        known, tools, arguments, invalid = self._resolve_tool_calls(state)
+        results = self._cached_results(tools, arguments, invalid)
+        pending = [i for i, result in enumerate(results) if result is MISSING]
+        if pending:
+            fresh, failed = await self._arun_tool_calls(
+                [known[i] for i in pending], [tools[i] for i in pending], [arguments[i] for i in pending]
+            )
+            self._merge_results(results, pending, fresh, failed, tools, arguments)
+        return self._tool_update(state, known, results)
+
+    def _create_state_machine(self, use_async: bool = False) -> StateMachine[AgentState]:
+        """Create the internal state machine for the agent
+
+        Args:
+            use_async: Build the graph with the async LLM/tool steps used by ainvoke()
+        """
+        machine = StateMachine[AgentState](AgentState, snapshot_retention=self.snapshot_retention)
         
         # Create steps
         entry = EntryPoint[AgentState]()
         message_prep = Step[AgentState]("message_prep", self._prepare_messages_step)
-        llm_processor = Step[AgentState]("llm_processor", self._llm_step)
-        tool_executor = Step[AgentState]("tool_executor", self._tool_step)
+        llm_processor = Step[AgentState]("llm_processor", self._allm_step if use_async else self._llm_step)
+        tool_executor = Step[AgentState]("tool_executor", self._atool_step if use_async else self._tool_step)
         termination = Termination[AgentState]()
         
         machine.add_steps([entry, message_prep, llm_processor, tool_executor, termination])
@@ -200,31 +495,132 @@ class Agent:
         """
 
         session_id = session_id or "default"
+        initial_state = self._initial_state(query, session_id)
+        run_object = self.workflow.run(initial_state)
+        self._remember(run_object, initial_state)
+        return run_object
+
+    async def ainvoke(self, query: str, session_id: Optional[str] = None) -> Run:
+        """
+        Async version of invoke()
+
+        The LLM is called through AsyncOpenAI, async tools are awaited and sync
+        tools run in the default executor, so many sessions can be served
+        concurrently from one event loop.
+
+        Example:
+            >>> runs = await asyncio.gather(*(agent.ainvoke(q, session_id=q) for q in queries))
+        """
+        session_id = session_id or "default"
+        if self._async_workflow is None:
+            self._async_workflow = self._create_state_machine(use_async=True)
+        initial_state = self._initial_state(query, session_id)
+        run_object = await self._async_workflow.arun(initial_state)
+        # The history summarizer makes a blocking LLM call; keep it off the event loop
+        await asyncio.to_thread(self._remember, run_object, initial_state)
+        return run_object
+
+    def stream(self, query: str, session_id: Optional[str] = None) -> Iterator[AgentEvent]:
+        """
+        Run the agent on a query, yielding events as they happen
+
+        The assistant's reply arrives as ``token`` events while it is being
+        generated, tool calls are bracketed by ``tool_start``/``tool_end``
+        events, and the last event is ``run_end`` carrying the final Run
+        (also stored in the session like invoke()). Errors raised by the
+        workflow are re-raised from the generator.
+
+        If the consumer stops early (``break`` or closing the generator), the
+        run is cancelled at its next event (a pending LLM or tool call still
+        finishes) and the partial turn is discarded: it is not added to the
+        session's history.
+
+        Example:
+            >>> for event in agent.stream("What's the weather in Lisbon?"):
+            ...     if event.type == "token":
+            ...         print(event.content, end="", flush=True)
+            ...     elif event.type == "run_end":
+            ...         run = event.run
+        """
+        session_id = session_id or "default"
+        initial_state = self._initial_state(query, session_id)
+        events: "queue.Queue[Any]" = queue.Queue()
+        finished = object()
+        outcome: Dict[str, Any] = {}
+        cancelled = threading.Event()
+
+        def emit(event: AgentEvent):
+            if cancelled.is_set():
+                raise StreamCancelled("The stream consumer stopped reading")
+            events.put(event)
+
+        def drive():
+            try:
+                outcome["run"] = self.workflow.run(initial_state, Resource(vars={"emit": emit}))
+            except BaseException as error:
+                outcome["error"] = error
+            finally:
+                events.put(finished)
+
+        # The workflow runs on a worker thread and feeds the queue this generator drains
+        worker = threading.Thread(target=drive, name="agent-stream", daemon=True)
+        worker.start()
+        try:
+            while True:
+                event = events.get()
+                if event is finished:
+                    break
+                yield event
+        except GeneratorExit:
+            # Stop the worker at its next event instead of finishing the run unseen
+            cancelled.set()
+            raise
+        worker.join()
+
+        if "error" in outcome:
+            raise outcome["error"]
+        self._remember(outcome["run"], initial_state)
+        yield AgentEvent("run_end", run=outcome["run"])
+
+    def _initial_state(self, query: str, session_id: str) -> AgentState:
         # Ensure session exists
         self.memory.create_session(session_id)
 
-        # Preload full prior messages for conversational continuity (entire session)
-        previous_messages: List[dict] = []
-        prior_runs: List[Run[AgentState]] = self.memory.get_all_objects(session_id)
-        for run in prior_runs:
-            final_state = run.get_final_state()
-            if final_state and final_state.get("messages"):
-                previous_messages.extend(final_state["messages"])  # append in chronological order
-
-        initial_state: AgentState = {
+        # Replay the session's token-bounded window instead of every prior run
+        window = self.get_conversation(session_id)
+        return {
             "user_query": query,
             "instructions": self.instructions,
-            "messages": previous_messages,
+            "messages": window.messages(),
             "current_tool_calls": None,
             "session_id": session_id,
+            "conversation_summary": window.summary,
         }
 
-        run_object = self.workflow.run(initial_state)
+    def _remember(self, run_object: Run, initial_state: AgentState):
+        session_id = initial_state["session_id"]
+        # The new turn follows the system message and the replayed history
+        final_state = run_object.get_final_state()
+        if final_state and final_state.get("messages"):
+            replayed = len(initial_state["messages"])
+            self.get_conversation(session_id).append_turn(final_state["messages"][1 + replayed:])
 
         # Persist run in memory under this session
         self.memory.add(run_object, session_id)
 
-        return run_object
+    def get_conversation(self, session_id: Optional[str] = None) -> ConversationWindow:
+        """Return the conversation window of a session, creating it on first use"""
+        session_id = session_id or "default"
+        window = self.conversations.get(session_id)
+        if window is None:
+            kwargs = {"token_counter": self.history_token_counter} if self.history_token_counter else {}
+            window = ConversationWindow(
+                token_budget=self.history_token_budget,
+                summarizer=self.history_summarizer,
+                **kwargs,
+            )
+            self.conversations[session_id] = window
+        return window
 
     def get_session_runs(self, session_id: Optional[str] = None) -> List[Run]:
         """Return all Run objects for a session (default if None)."""
@@ -233,3 +629,7 @@ class Agent:
     def reset_session(self, session_id: Optional[str] = None):
         """Reset memory for a specific session or all sessions."""
         self.memory.reset(session_id)
+        if session_id is None:
+            self.conversations.clear()
+        else:
+            self.conversations.pop(session_id, None)
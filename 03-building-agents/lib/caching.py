@@ -0,0 +1,416 @@
+from typing import Any, Dict, Hashable, Optional, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from pydantic import BaseModel
+
+
+# Sentinel returned by LRUCache.get when a key is absent (None can be a cached value)
+MISSING = object()
+
+
+@dataclass
+class CacheStats:
+    """Counters for a cache instance"""
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    size: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def dict(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "size": self.size,
+            "hit_rate": self.hit_rate,
+        }
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache with optional per-entry TTL.
+
+    Example:
+        >>> cache = LRUCache(maxsize=256, ttl=600)
+        >>> cache.set("key", {"answer": 42})
+        >>> cache.get("key", MISSING)
+        {'answer': 42}
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        """
+        Args:
+            maxsize: Maximum number of entries before the least recently used is evicted
+            ttl: Default time-to-live in seconds (None = entries never expire)
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[Any, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = CacheStats()
+
+    def __str__(self) -> str:
+        return f"LRUCache(size={len(self._data)}, maxsize={self.maxsize}, ttl={self.ttl})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is not None and expires_at <= time.monotonic():
+                    del self._data[key]
+                    self._stats.expirations += 1
+                else:
+                    self._data.move_to_end(key)
+                    self._stats.hits += 1
+                    return value
+            self._stats.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store a value; ``ttl`` overrides the cache default for this entry"""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._stats.evictions += 1
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    @property
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                evictions=self._stats.evictions,
+                expirations=self._stats.expirations,
+                size=len(self._data),
+            )
+
+
+def _canonical(value: Any) -> Any:
+    """Convert a value into JSON-serializable data with a deterministic layout
+
+    Raises:
+        TypeError: for values that have no exact canonical form (their repr may
+            be truncated or not unique, e.g. large numpy arrays)
+    """
+    if isinstance(value, BaseModel):
+        return _canonical(value.model_dump(mode="json"))
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((_canonical(v) for v in value), key=repr)
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    raise TypeError(f"Cannot build a stable cache key from a {type(value).__name__} value")
+
+
+def stable_hash(value: Any) -> str:
+    """SHA-256 of a canonical JSON encoding of ``value`` (stable across processes)
+
+    Raises:
+        TypeError: if ``value`` contains something other than JSON-like data
+            and pydantic models
+    """
+    encoded = json.dumps(_canonical(value), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def canonical_arguments(arguments: Dict[str, Any]) -> str:
+    """Canonical JSON of tool-call arguments (sorted keys, no whitespace)"""
+    return json.dumps(arguments, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+class SQLiteStore:
+    """Persistent key/value tier for the caches in this module.
+
+    Values are stored as JSON with an absolute expiry (wall clock, so entries
+    stay valid across processes). Safe to use from several threads.
+    """
+
+    def __init__(self, path: str, table: str):
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " expires_at REAL)"
+            )
+
+    def __str__(self) -> str:
+        return f"SQLiteStore('{self.path}', table='{self.table}')"
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+    def get(self, key: str) -> Tuple[Any, Optional[float]]:
+        """Return (value, seconds left or None) or (MISSING, None) if absent or expired"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return MISSING, None
+        value, expires_at = row
+        remaining = None
+        if expires_at is not None:
+            remaining = expires_at - time.time()
+            if remaining <= 0:
+                return MISSING, None
+        return json.loads(value), remaining
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Store a JSON-serializable value; returns False (and stores nothing) otherwise"""
+        try:
+            encoded = json.dumps(value)
+        except (TypeError, ValueError):
+            return False
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?)",
+                (key, encoded, expires_at),
+            )
+        return True
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {self.table}")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ToolResultCache:
+    """Cross-run cache of tool results: an in-memory LRU, optionally backed by SQLite.
+
+    Only tools declared with ``@tool(cacheable=True)`` are cached, each with
+    its own ``ttl`` (falling back to ``default_ttl``). Keys are the tool name
+    plus the canonical JSON of the call arguments. The SQLite store lets
+    results survive restarts and be shared by several processes; values are
+    stored as JSON, so only JSON-serializable results are persisted.
+
+    Example:
+        >>> cache = ToolResultCache(path="tool_cache.db")
+        >>> agent = Agent("gpt-4o-mini", instructions, tools=get_all_tools(), tool_cache=cache)
+        >>> cache.stats()["hit_rate"]
+    """
+
+    def __init__(self, maxsize: int = 1024, default_ttl: Optional[float] = None,
+                 path: Optional[str] = None):
+        """
+        Args:
+            maxsize: Maximum entries kept in memory
+            default_ttl: Seconds a result stays valid when the tool sets no ttl
+                (None = until evicted)
+            path: Optional SQLite database file for a persistent second tier
+        """
+        self.memory = LRUCache(maxsize=maxsize, ttl=default_ttl)
+        self.default_ttl = default_ttl
+        self.path = path
+        self.store = SQLiteStore(path, "tool_results") if path is not None else None
+        self._lock = threading.Lock()
+        self._tool_stats: Dict[str, Dict[str, int]] = {}
+        self._store_hits = 0
+
+    def __str__(self) -> str:
+        return f"ToolResultCache(size={len(self.memory)}, path={self.path!r})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+    @staticmethod
+    def key(tool_name: str, arguments: Dict[str, Any]) -> str:
+        return f"{tool_name}:{canonical_arguments(arguments)}"
+
+    def _count(self, tool_name: str, outcome: str):
+        with self._lock:
+            counts = self._tool_stats.setdefault(tool_name, {"hits": 0, "misses": 0})
+            counts[outcome] += 1
+
+    def get(self, tool_name: str, arguments: Dict[str, Any]) -> Any:
+        """Return the cached result or MISSING"""
+        key = self.key(tool_name, arguments)
+        value = self.memory.get(key, MISSING)
+        if value is MISSING and self.store is not None:
+            value, remaining = self.store.get(key)
+            if value is not MISSING:
+                # Promote to memory for the rest of the entry's lifetime
+                self.memory.set(key, value, ttl=remaining)
+                with self._lock:
+                    self._store_hits += 1
+        self._count(tool_name, "misses" if value is MISSING else "hits")
+        return value
+
+    def set(self, tool_name: str, arguments: Dict[str, Any], value: Any, ttl: Optional[float] = None):
+        """Store a result; ``ttl`` overrides ``default_ttl``"""
+        key = self.key(tool_name, arguments)
+        ttl = self.default_ttl if ttl is None else ttl
+        self.memory.set(key, value, ttl=ttl)
+        if self.store is not None:
+            self.store.set(key, value, ttl=ttl)
+
+    def clear(self):
+        self.memory.clear()
+        if self.store is not None:
+            self.store.clear()
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Overall and per-tool hit/miss counts with hit rates"""
+        with self._lock:
+            per_tool = {
+                name: {**counts, "hit_rate": counts["hits"] / max(1, counts["hits"] + counts["misses"])}
+                for name, counts in self._tool_stats.items()
+            }
+            store_hits = self._store_hits
+        hits = sum(counts["hits"] for counts in per_tool.values())
+        misses = sum(counts["misses"] for counts in per_tool.values())
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "store_hits": store_hits,
+            "memory": self.memory.stats.dict(),
+            "tools": per_tool,
+        }
+
+
+class ResponseCache:
+    """Content-addressed cache of chat completions: an in-memory LRU, optionally backed by SQLite.
+
+    Keys hash the full request (model, temperature, messages, tools,
+    tool_choice and response_format), so any change to the prompt is a
+    miss. Entries hold the assistant message and the usage of the original
+    call as plain JSON. By default only temperature-0 requests are cached,
+    since sampling at higher temperatures is meant to vary.
+
+    Example:
+        >>> cache = ResponseCache(path="llm_cache.db")
+        >>> judge = LLM(model="gpt-4o-mini", response_cache=cache)
+        >>> cache.stats()
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None,
+                 path: Optional[str] = None, deterministic_only: bool = True):
+        """
+        Args:
+            maxsize: Maximum responses kept in memory
+            ttl: Seconds a response stays valid (None = until evicted)
+            path: Optional SQLite database file for a persistent second tier
+            deterministic_only: Skip requests with temperature > 0
+        """
+        self.memory = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.ttl = ttl
+        self.path = path
+        self.deterministic_only = deterministic_only
+        self.store = SQLiteStore(path, "llm_responses") if path is not None else None
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._store_hits = 0
+
+    def __str__(self) -> str:
+        return f"ResponseCache(size={len(self.memory)}, path={self.path!r})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+    def accepts(self, payload: Dict[str, Any]) -> bool:
+        return not self.deterministic_only or not payload.get("temperature")
+
+    @staticmethod
+    def key(payload: Dict[str, Any]) -> str:
+        """Stable hash of a chat-completion request payload"""
+        request = dict(payload)
+        response_format = request.get("response_format")
+        if isinstance(response_format, type) and issubclass(response_format, BaseModel):
+            request["response_format"] = {
+                "name": response_format.__name__,
+                "schema": response_format.model_json_schema(),
+            }
+        return stable_hash(request)
+
+    def get(self, key: str) -> Any:
+        """Return the cached entry ({"message": ..., "usage": ...}) or MISSING"""
+        entry = self.memory.get(key, MISSING)
+        store_hit = False
+        if entry is MISSING and self.store is not None:
+            entry, remaining = self.store.get(key)
+            if entry is not MISSING:
+                self.memory.set(key, entry, ttl=remaining)
+                store_hit = True
+        with self._lock:
+            if entry is MISSING:
+                self._misses += 1
+            else:
+                self._hits += 1
+                self._store_hits += store_hit
+        return entry
+
+    def set(self, key: str, message: Dict[str, Any], usage: Optional[Dict[str, Any]]):
+        entry = {"message": message, "usage": usage}
+        self.memory.set(key, entry)
+        if self.store is not None:
+            self.store.set(key, entry, ttl=self.ttl)
+
+    def clear(self):
+        self.memory.clear()
+        if self.store is not None:
+            self.store.clear()
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits, misses, store_hits = self._hits, self._misses, self._store_hits
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "store_hits": store_hits,
+            "memory": self.memory.stats.dict(),
+        }
@@ -0,0 +1,293 @@
+from typing import Any, Dict, List, Optional
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+import json
+import pickle
+import sqlite3
+import threading
+
+
+@dataclass
+class SnapshotRecord:
+    """A stored snapshot: the fields its step changed plus what should run next"""
+    run_id: str
+    seq: int
+    snapshot_id: str
+    step_id: str
+    timestamp: datetime
+    changes: Dict[str, Any]
+    has_parent: bool
+    # None for all but the last snapshot of a superstep: its siblings' updates
+    # come after it, so it is not a point the run can continue from
+    next_steps: Optional[List[str]]
+    timing: Optional[Any] = None
+
+
+@dataclass
+class _Appended:
+    """Stored in place of a list that extends the field's previously stored value"""
+    base_length: int
+    items: List[Any]
+
+
+@dataclass
+class RunRecord:
+    """A stored run header"""
+    run_id: str
+    start_timestamp: datetime
+    end_timestamp: Optional[datetime] = None
+
+
+class Checkpointer(ABC):
+    """Interface for durable snapshot storage used by StateMachine.
+
+    Implementations must be safe to call from several threads.
+    """
+
+    @abstractmethod
+    def save(self, run: Any, snapshots: List[Any], next_steps: List[str]):
+        """Persist the snapshots produced by one step (or one fan-out of steps).
+
+        Args:
+            run: The Run the snapshots belong to
+            snapshots: Snapshots in the order they were added to the run
+            next_steps: Step ids the workflow will execute next; stored with
+                the last snapshot only (earlier ones get None)
+        """
+
+    @abstractmethod
+    def complete(self, run: Any):
+        """Mark a run as finished"""
+
+    def abort(self, run: Any):
+        """A step of the run raised; release per-run state (the run stays resumable)"""
+
+    @abstractmethod
+    def list_runs(self) -> List[RunRecord]:
+        """Return all stored runs, oldest first (unfinished runs have no end_timestamp)"""
+
+    @abstractmethod
+    def load_run(self, run_id: str) -> Optional[RunRecord]:
+        """Return the header of a stored run, or None"""
+
+    @abstractmethod
+    def load_snapshots(self, run_id: str) -> List[SnapshotRecord]:
+        """Return the stored snapshots of a run in execution order"""
+
+    @abstractmethod
+    def find_snapshot(self, snapshot_id: str) -> Optional[SnapshotRecord]:
+        """Locate a snapshot by id (the earliest stored copy if it was forked)"""
+
+    @abstractmethod
+    def copy_run(self, source_run_id: str, upto_seq: int, target_run_id: str,
+                 start_timestamp: datetime):
+        """Copy the history of a run up to (and including) ``upto_seq`` into a new run"""
+
+
+class SQLiteCheckpointer(Checkpointer):
+    """Checkpointer backed by a local SQLite database.
+
+    Each snapshot row stores only the fields its step changed (pickled). A
+    changed list that starts with the previously stored value of its field
+    (e.g. ``messages`` after a step appends to it) is stored as just the new
+    items, so the history is not rewritten on every step. Pass ":memory:" for
+    a throwaway store.
+
+    Example:
+        >>> checkpointer = SQLiteCheckpointer("runs.db")
+        >>> machine = StateMachine(AgentState, checkpointer=checkpointer)
+        >>> run = machine.resume(run_id)
+    """
+
+    def __init__(self, path: str = "checkpoints.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # run_id -> field -> list last written for it, the base of the next suffix
+        self._stored_lists: Dict[str, Dict[str, List[Any]]] = {}
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS runs ("
+                " run_id TEXT PRIMARY KEY,"
+                " start_timestamp TEXT NOT NULL,"
+                " end_timestamp TEXT)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS snapshots ("
+                " run_id TEXT NOT NULL,"
+                " seq INTEGER NOT NULL,"
+                " snapshot_id TEXT NOT NULL,"
+                " step_id TEXT NOT NULL,"
+                " timestamp TEXT NOT NULL,"
+                " changes BLOB NOT NULL,"
+                " has_parent INTEGER NOT NULL,"
+                " next_steps TEXT NOT NULL,"
+                " timing BLOB,"
+                " PRIMARY KEY (run_id, seq))"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_snapshots_snapshot_id ON snapshots (snapshot_id)"
+            )
+
+    def __str__(self) -> str:
+        return f"SQLiteCheckpointer('{self.path}')"
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def save(self, run: Any, snapshots: List[Any], next_steps: List[str]):
+        if not snapshots:
+            return
+        first_seq = run.total_snapshots - len(snapshots)
+        with self._lock:
+            stored = dict(self._stored_lists.get(run.run_id, {}))
+        rows = [
+            (
+                run.run_id,
+                first_seq + offset,
+                snapshot.snapshot_id,
+                snapshot.step_id,
+                snapshot.timestamp.isoformat(),
+                pickle.dumps(self._compact(snapshot.changes, stored), protocol=pickle.HIGHEST_PROTOCOL),
+                int(snapshot.parent is not None),
+                json.dumps(next_steps if offset == len(snapshots) - 1 else None),
+                pickle.dumps(snapshot.timing, protocol=pickle.HIGHEST_PROTOCOL),
+            )
+            for offset, snapshot in enumerate(snapshots)
+        ]
+        with self._lock, self._conn:
+            self._stored_lists[run.run_id] = stored
+            self._conn.execute(
+                "INSERT OR IGNORE INTO runs (run_id, start_timestamp) VALUES (?, ?)",
+                (run.run_id, run.start_timestamp.isoformat()),
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+
+    def complete(self, run: Any):
+        end = run.end_timestamp.isoformat() if run.end_timestamp else None
+        with self._lock, self._conn:
+            self._stored_lists.pop(run.run_id, None)
+            self._conn.execute(
+                "INSERT OR IGNORE INTO runs (run_id, start_timestamp) VALUES (?, ?)",
+                (run.run_id, run.start_timestamp.isoformat()),
+            )
+            self._conn.execute(
+                "UPDATE runs SET end_timestamp = ? WHERE run_id = ?", (end, run.run_id)
+            )
+
+    def abort(self, run: Any):
+        with self._lock:
+            self._stored_lists.pop(run.run_id, None)
+
+    def list_runs(self) -> List[RunRecord]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT run_id, start_timestamp, end_timestamp FROM runs ORDER BY start_timestamp"
+            ).fetchall()
+        return [self._to_run_record(row) for row in rows]
+
+    def load_run(self, run_id: str) -> Optional[RunRecord]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT run_id, start_timestamp, end_timestamp FROM runs WHERE run_id = ?",
+                (run_id,),
+            ).fetchone()
+        return self._to_run_record(row) if row else None
+
+    def load_snapshots(self, run_id: str) -> List[SnapshotRecord]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT run_id, seq, snapshot_id, step_id, timestamp, changes, has_parent, next_steps, timing"
+                " FROM snapshots WHERE run_id = ? ORDER BY seq",
+                (run_id,),
+            ).fetchall()
+        # Suffix rows extend the value of the last row that stored the field
+        current: Dict[str, List[Any]] = {}
+        return [self._to_record(row, current) for row in rows]
+
+    def find_snapshot(self, snapshot_id: str) -> Optional[SnapshotRecord]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT s.run_id, s.seq"
+                " FROM snapshots s JOIN runs r ON r.run_id = s.run_id"
+                " WHERE s.snapshot_id = ? ORDER BY r.start_timestamp LIMIT 1",
+                (snapshot_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        run_id, seq = row
+        return next((r for r in self.load_snapshots(run_id) if r.seq == seq), None)
+
+    def copy_run(self, source_run_id: str, upto_seq: int, target_run_id: str,
+                 start_timestamp: datetime):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO runs (run_id, start_timestamp) VALUES (?, ?)",
+                (target_run_id, start_timestamp.isoformat()),
+            )
+            self._conn.execute(
+                "INSERT INTO snapshots"
+                " SELECT ?, seq, snapshot_id, step_id, timestamp, changes, has_parent, next_steps, timing"
+                " FROM snapshots WHERE run_id = ? AND seq <= ?",
+                (target_run_id, source_run_id, upto_seq),
+            )
+
+    @staticmethod
+    def _to_run_record(row) -> RunRecord:
+        return RunRecord(
+            run_id=row[0],
+            start_timestamp=datetime.fromisoformat(row[1]),
+            end_timestamp=datetime.fromisoformat(row[2]) if row[2] else None,
+        )
+
+    @staticmethod
+    def _compact(changes: Dict[str, Any], stored: Dict[str, List[Any]]) -> Dict[str, Any]:
+        """Replace lists that extend their field's stored value with the new items"""
+        compact = {}
+        for key, value in changes.items():
+            previous = stored.get(key)
+            if (isinstance(value, list) and previous is not None
+                    and len(value) >= len(previous) and value[:len(previous)] == previous):
+                compact[key] = _Appended(len(previous), value[len(previous):])
+            else:
+                compact[key] = value
+            if isinstance(value, list):
+                # A copy, so a list later mutated in place is not mistaken for its base
+                stored[key] = list(value)
+            else:
+                stored.pop(key, None)
+        return compact
+
+    @staticmethod
+    def _expand(changes: Dict[str, Any], current: Dict[str, List[Any]]) -> Dict[str, Any]:
+        expanded = {}
+        for key, value in changes.items():
+            if isinstance(value, _Appended):
+                value = current[key][:value.base_length] + value.items
+            expanded[key] = value
+            if isinstance(value, list):
+                current[key] = value
+            else:
+                current.pop(key, None)
+        return expanded
+
+    @classmethod
+    def _to_record(cls, row, current: Dict[str, List[Any]]) -> SnapshotRecord:
+        return SnapshotRecord(
+            run_id=row[0],
+            seq=row[1],
+            snapshot_id=row[2],
+            step_id=row[3],
+            timestamp=datetime.fromisoformat(row[4]),
+            changes=cls._expand(pickle.loads(row[5]), current),
+            has_parent=bool(row[6]),
+            next_steps=json.loads(row[7]),
+            timing=pickle.loads(row[8]) if row[8] is not None else None,
+        )
@@ -0,0 +1,131 @@
+from typing import Dict, Optional, Tuple
+from dataclasses import dataclass
+import asyncio
+import os
+import threading
+import weakref
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+
+DEFAULT_BASE_URL = "https://openai.vocareum.com/v1"
+
+
+@dataclass(frozen=True)
+class PoolLimits:
+    """HTTP connection-pool settings for a shared OpenAI client"""
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0  # seconds an idle connection stays open
+    timeout: Optional[float] = None  # seconds per request (None = the SDK default, 600 s)
+    max_retries: int = 0  # retries/backoff are handled by lib.scheduler
+
+    def to_httpx_limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    def timeout_kwargs(self) -> Dict[str, float]:
+        # Without an explicit timeout the SDK's own default applies; a shorter one
+        # would make slow but legitimate completions time out and be retried
+        return {} if self.timeout is None else {"timeout": self.timeout}
+
+
+ClientKey = Tuple[str, str, PoolLimits]
+
+_clients: Dict[ClientKey, OpenAI] = {}
+# Async connections belong to the event loop that opened them, so async
+# clients are pooled per loop and dropped together with it
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[ClientKey, AsyncOpenAI]]" = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+_default_limits = PoolLimits()
+
+
+def resolve_credentials(api_key: Optional[str] = None, base_url: Optional[str] = None) -> Tuple[str, str]:
+    """Explicit args first, then OPENAI_API_KEY / OPENAI_BASE_URL, then the Vocareum default URL"""
+    return (
+        api_key or os.getenv("OPENAI_API_KEY"),
+        base_url or os.getenv("OPENAI_BASE_URL") or DEFAULT_BASE_URL,
+    )
+
+
+def set_default_pool_limits(limits: PoolLimits):
+    """Pool limits used by clients created without explicit limits from now on"""
+    global _default_limits
+    _default_limits = limits
+
+
+def get_openai_client(api_key: Optional[str] = None, base_url: Optional[str] = None,
+                      limits: Optional[PoolLimits] = None) -> OpenAI:
+    """Return the process-wide OpenAI client for these credentials, creating it once.
+
+    Clients are keyed by (base_url, api_key, limits), so every LLM talking to
+    the same endpoint reuses one connection pool, keep-alive connections and
+    TLS sessions instead of opening new ones per call. OpenAI clients are
+    thread-safe, so the shared instance can serve concurrent runs.
+
+    Args:
+        api_key: API key (default: OPENAI_API_KEY)
+        base_url: API base URL (default: OPENAI_BASE_URL, then the Vocareum proxy)
+        limits: Connection-pool settings (default: see set_default_pool_limits)
+
+    Returns:
+        OpenAI: The shared client
+    """
+    api_key, base_url = resolve_credentials(api_key, base_url)
+    limits = limits or _default_limits
+    key = (base_url, api_key, limits)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = OpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                max_retries=limits.max_retries,
+                http_client=DefaultHttpxClient(limits=limits.to_httpx_limits()),
+                **limits.timeout_kwargs(),
+            )
+            _clients[key] = client
+    return client
+
+
+def get_async_openai_client(api_key: Optional[str] = None, base_url: Optional[str] = None,
+                            limits: Optional[PoolLimits] = None) -> AsyncOpenAI:
+    """Async counterpart of get_openai_client(), shared within the running event loop.
+
+    Must be called from a coroutine; each event loop gets its own pool.
+    """
+    loop = asyncio.get_running_loop()
+    api_key, base_url = resolve_credentials(api_key, base_url)
+    limits = limits or _default_limits
+    key = (base_url, api_key, limits)
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(key)
+        if client is None:
+            client = AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                max_retries=limits.max_retries,
+                http_client=DefaultAsyncHttpxClient(limits=limits.to_httpx_limits()),
+                **limits.timeout_kwargs(),
+            )
+            clients[key] = client
+    return client
+
+
+def close_clients():
+    """Close and forget every shared client (e.g. at shutdown or between tests)"""
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+        # Async clients can only be closed from their loop; forget them
+        _async_clients.clear()
+    for client in clients:
+        client.close()
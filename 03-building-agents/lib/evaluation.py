@@ -5,6 +5,7 @@ from pydantic import BaseModel, Field
 from lib.agents import AgentState
 from lib.state_machine import Run
 from lib.llm import LLM
+from lib.scheduler import Priority
 from lib.messages import AIMessage, BaseMessage
 from lib.parsers import PydanticOutputParser
 
@@ -65,8 +66,9 @@ class JudgeEvaluation(BaseModel):
 class AgentEvaluator:
     """Comprehensive agent evaluation framework"""
     
-    def __init__(self):
-        self.llm_judge = LLM(model="gpt-4o-mini")
+    def __init__(self, llm_judge: Optional[LLM] = None):
+        # The default judge shares the pooled OpenAI client with Agent and RAG
+        self.llm_judge = llm_judge or LLM(model="gpt-4o-mini", priority=Priority.BATCH)
     
     def evaluate_final_response(self, 
                           test_case: TestCase, 
@@ -250,16 +252,24 @@ class AgentEvaluator:
         if not final_state:
             return self._create_failed_evaluation("No final state found")
         
-        # Analyze the trajectory
-        actual_steps = [
-            snapshot for snapshot in run.snapshots 
-            if snapshot.step_id not in ["__entry__", "__termination__"]
-        ]
-        steps_taken = len(actual_steps)
+        # Analyze the trajectory. Step counts survive snapshot retention policies,
+        # so they are used instead of counting the (possibly partial) snapshots.
+        step_counts = getattr(run, "step_counts", None) or {}
+        if step_counts:
+            steps_taken = sum(
+                count for step_id, count in step_counts.items()
+                if step_id not in ["__entry__", "__termination__"]
+            )
+        else:
+            steps_taken = len([
+                snapshot for snapshot in run.snapshots
+                if snapshot.step_id not in ["__entry__", "__termination__"]
+            ])
+        partial_history = not getattr(run, "has_full_history", True)
         messages = final_state.get("messages", [])
         total_tokens = final_state.get("cumulative_tokens", final_state.get("total_tokens", 0))
 
-        # Per-step token accounting (LLM steps only)
+        # Per-step token accounting (LLM steps only; only retained snapshots)
         per_step_tokens: List[int] = []
         for snap in run.snapshots:
             if snap.step_id == "llm_processor":
@@ -326,6 +336,11 @@ class AgentEvaluator:
         overall_score = sum(scores) / len(scores)
         
         feedback = f"Trajectory: {steps_taken} steps, Tools used: {tool_calls_made}, Expected: {test_case.expected_tools}"
+        if partial_history:
+            feedback += (
+                f" (partial trajectory: {len(run.snapshots)} of {run.total_snapshots} snapshots retained;"
+                " per-step tokens cover retained LLM steps only)"
+            )
         
         return EvaluationResult(
             task_completion=task_completion,
@@ -0,0 +1,86 @@
+from typing import Any, List
+import logging
+
+
+class StateMachineObserver:
+    """Receives StateMachine lifecycle events.
+
+    Every callback is a no-op by default; subclass and override the ones you
+    need. Callbacks run on the thread driving the run (the event loop for
+    arun), so they should return quickly.
+    """
+
+    def on_run_start(self, run: Any, state: Any):
+        pass
+
+    def on_step_start(self, run: Any, step_id: str):
+        pass
+
+    def on_step_end(self, run: Any, snapshot: Any):
+        pass
+
+    def on_transition(self, run: Any, source: str, targets: List[str]):
+        pass
+
+    def on_termination(self, run: Any, step_id: str):
+        pass
+
+    def on_run_end(self, run: Any):
+        pass
+
+    def on_run_error(self, run: Any, error: BaseException):
+        pass
+
+
+class LoggingObserver(StateMachineObserver):
+    """Emits one structured log record per event.
+
+    Fields are attached through ``extra`` (``event``, ``run_id``, ``step_id``,
+    ``duration_ms``, ``targets``) so JSON log formatters can pick them up.
+    """
+
+    def __init__(self, logger: logging.Logger = None, level: int = logging.DEBUG):
+        self.logger = logger or logging.getLogger("lib.state_machine")
+        self.level = level
+
+    def _log(self, event: str, run: Any, message: str, level: int = None, **fields):
+        level = self.level if level is None else level
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, message, extra={"event": event, "run_id": run.run_id, **fields})
+
+    def on_run_start(self, run: Any, state: Any):
+        self._log("run_start", run, f"Run {run.run_id} started")
+
+    def on_step_start(self, run: Any, step_id: str):
+        self._log("step_start", run, f"Step {step_id} started", step_id=step_id)
+
+    def on_step_end(self, run: Any, snapshot: Any):
+        duration_ms = snapshot.timing.duration * 1000 if snapshot.timing else None
+        self._log("step_end", run, f"Step {snapshot.step_id} finished",
+                  step_id=snapshot.step_id, duration_ms=duration_ms)
+
+    def on_transition(self, run: Any, source: str, targets: List[str]):
+        self._log("transition", run, f"{source} -> {targets}", step_id=source, targets=targets)
+
+    def on_termination(self, run: Any, step_id: str):
+        self._log("termination", run, f"Terminating: {step_id}", step_id=step_id)
+
+    def on_run_end(self, run: Any):
+        self._log("run_end", run, f"Run {run.run_id} finished")
+
+    def on_run_error(self, run: Any, error: BaseException):
+        self._log("run_error", run, f"Run {run.run_id} failed: {error}",
+                  level=logging.ERROR, error=repr(error))
+
+
+class PrintObserver(StateMachineObserver):
+    """Console progress in the format StateMachine used to print unconditionally"""
+
+    def on_step_end(self, run: Any, snapshot: Any):
+        if snapshot.step_id == "__entry__":
+            print(f"[StateMachine] Starting: {snapshot.step_id}")
+        else:
+            print(f"[StateMachine] Executing step: {snapshot.step_id}")
+
+    def on_termination(self, run: Any, step_id: str):
+        print(f"[StateMachine] Terminating: {step_id}")
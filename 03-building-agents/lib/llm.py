@@ -1,14 +1,36 @@
-from typing import List, Optional, Dict, Any
+from typing import Iterator, List, Literal, Optional, Dict, Any, Tuple
+from dataclasses import dataclass
 from pydantic import BaseModel
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from lib.messages import (
     AnyMessage,
     AIMessage,
     BaseMessage,
     UserMessage,
 )
-from lib.tooling import Tool, estimate_tokens_for_payload, ModelConfig
-import os
+from lib.tooling import (
+    Tool, ToolCall, ToolSpec, estimate_tokens_for_payload, ModelConfig,
+    TOOLS_WRAPPER_TOKENS, TOOL_SEPARATOR_TOKENS,
+)
+from lib.caching import MISSING, ResponseCache
+from lib.clients import PoolLimits, get_async_openai_client, get_openai_client
+from lib.scheduler import Priority, RequestScheduler, get_default_scheduler
+import contextvars
+import weakref
+
+# Usage of each LLM's most recent call, tracked per thread and per asyncio task
+# so one LLM can serve concurrent runs. One variable for all LLMs; a fresh
+# mapping is set on every update, so tasks never see each other's writes.
+_last_usage: contextvars.ContextVar[Optional[weakref.WeakKeyDictionary]] = \
+    contextvars.ContextVar("llm_last_usage", default=None)
+
+@dataclass
+class StreamEvent:
+    """One item of LLM.stream(): a content delta, or the assembled final message"""
+    type: Literal["delta", "message"]
+    content: str = ""
+    message: Optional[AIMessage] = None
+
 
 class LLM:
     def __init__(
@@ -17,31 +39,97 @@ class LLM:
         temperature: float = 0.0,
         tools: Optional[List[Tool]] = None,
         api_key: Optional[str] = None,
-        base_url: Optional[str] = None
+        base_url: Optional[str] = None,
+        client: Optional[OpenAI] = None,
+        pool_limits: Optional[PoolLimits] = None,
+        async_client: Optional[AsyncOpenAI] = None,
+        response_cache: Optional[ResponseCache] = None,
+        scheduler: Optional[RequestScheduler] = None,
+        priority: Priority = Priority.DEFAULT,
     ):
+        """
+        Args:
+            model: Chat model name
+            temperature: Sampling temperature
+            tools: Tools the model may call
+            api_key: API key (default: OPENAI_API_KEY)
+            base_url: API base URL (default: OPENAI_BASE_URL, then the Vocareum proxy)
+            client: Explicit OpenAI client; by default the process-wide pooled
+                client for (base_url, api_key, pool_limits) is reused, so
+                creating many LLM objects does not open new connections
+            pool_limits: Connection-pool settings for the shared client
+            async_client: Explicit AsyncOpenAI client for ainvoke(); by default
+                the pooled client of the running event loop is used
+            response_cache: Opt-in cache of completions keyed by the full
+                request; repeated identical requests (temperature 0 by
+                default) are answered without calling the API
+            scheduler: Rate-limit scheduler for API calls (default: the
+                process-wide one, see lib.scheduler.set_default_scheduler)
+            priority: Scheduling class of this LLM's requests
+        """
         self.model = model
         self.temperature = temperature
         self.tools: Dict[str, Tool] = {
             tool.name: tool for tool in (tools or [])
         }
-        client_kwargs = {}
-        if api_key:
-            client_kwargs["api_key"] = api_key
-        else:
-            openai_api_key = os.getenv("OPENAI_API_KEY")
-            client_kwargs["api_key"] = openai_api_key
-
-        # Prefer explicit arg, then env OPENAI_BASE_URL, then Vocareum default
-        env_base_url = os.getenv("OPENAI_BASE_URL")
-        client_kwargs["base_url"] = base_url or env_base_url or "https://openai.vocareum.com/v1"
-    
-        self.client = OpenAI(**client_kwargs)
+        # Compiled specs of self.tools in order and their payload dicts, built
+        # once (reset by register_tool) and published together as one tuple
+        self._compiled_tools: Optional[Tuple[List[ToolSpec], List[Dict[str, Any]]]] = None
+        # Prefer explicit args, then env OPENAI_API_KEY / OPENAI_BASE_URL, then Vocareum default
+        self.client = client or get_openai_client(api_key, base_url, pool_limits)
+        self._client_args = (api_key, base_url, pool_limits)
+        self._async_client = async_client
+        self.response_cache = response_cache
+        self.scheduler = scheduler
+        self.priority = priority
         # Default model config (you can override externally if needed)
         self.model_config = ModelConfig.for_gpt4o_mini()
-        self.last_usage: Optional[Dict[str, Any]] = None
+
+    @property
+    def last_usage(self) -> Optional[Dict[str, Any]]:
+        """Token usage of the most recent call on the calling thread or task"""
+        usages = _last_usage.get()
+        return usages.get(self) if usages is not None else None
+
+    @last_usage.setter
+    def last_usage(self, value: Optional[Dict[str, Any]]):
+        usages = weakref.WeakKeyDictionary(_last_usage.get() or {})
+        usages[self] = value
+        _last_usage.set(usages)
+
+    def _schedule(self, payload: Dict[str, Any]):
+        """The scheduler for this call and the request's estimated input tokens"""
+        scheduler = self.scheduler or get_default_scheduler()
+        tokens = 0
+        if scheduler.limits_tokens:
+            tokens = estimate_tokens_for_payload(payload["messages"])
+            # Payload tools are always a prefix of the compiled specs (see _build_payload)
+            for spec in self.tool_specs[:len(payload.get("tools", []))]:
+                tokens += spec.tokens + TOOL_SEPARATOR_TOKENS
+        return scheduler, tokens
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        """AsyncOpenAI client for ainvoke() (only available inside a running event loop)"""
+        return self._async_client or get_async_openai_client(*self._client_args)
 
     def register_tool(self, tool: Tool):
         self.tools[tool.name] = tool
+        self._compiled_tools = None
+
+    def _compile_tools(self) -> Tuple[List[ToolSpec], List[Dict[str, Any]]]:
+        """The registered tools' specs and payload dicts, always from the same compilation"""
+        compiled = self._compiled_tools
+        if compiled is None:
+            specs = [tool.spec for tool in self.tools.values()]
+            # Concurrent callers may both build it; each publishes a consistent pair
+            compiled = self._compiled_tools = (specs, [spec.spec for spec in specs])
+        return compiled
+
+    @property
+    def tool_specs(self) -> List[ToolSpec]:
+        """Precompiled specs of the registered tools, shared by every payload"""
+        return self._compile_tools()[0]
 
     def _build_payload(self, messages: List[BaseMessage]) -> Dict[str, Any]:
         payload = {
@@ -52,22 +140,24 @@ class LLM:
 
         if self.tools:
             # Start with all tools, then prune if exceeding input budget
-            tool_specs = [tool.dict() for tool in self.tools.values()]
-            payload["tools"] = tool_specs
+            specs, tool_dicts = self._compile_tools()
+            payload["tools"] = list(tool_dicts)
             payload["tool_choice"] = "auto"
 
-            # Token budget prune pass
-            est = estimate_tokens_for_payload(payload["messages"], tool_specs)
-            if est > self.model_config.input_budget_tokens:
+            # Token budget prune pass: message counts are memoized and each
+            # spec's estimate is cached on its ToolSpec, so pruning is plain arithmetic
+            budget = self.model_config.input_budget_tokens
+            total = estimate_tokens_for_payload(payload["messages"]) + TOOLS_WRAPPER_TOKENS
+            tool_tokens = [spec.tokens + TOOL_SEPARATOR_TOKENS for spec in specs]
+            if total + sum(tool_tokens) > budget:
                 # Keep tools in declared order and drop from the end until it fits
-                pruned = []
-                for spec in tool_specs:
-                    candidate = pruned + [spec]
-                    if estimate_tokens_for_payload(payload["messages"], candidate) <= self.model_config.input_budget_tokens:
-                        pruned = candidate
-                    else:
+                kept = 0
+                for tokens in tool_tokens:
+                    if total + tokens > budget:
                         break
-                payload["tools"] = pruned
+                    total += tokens
+                    kept += 1
+                payload["tools"] = tool_dicts[:kept]
 
         return payload
 
@@ -88,14 +178,81 @@ class LLM:
         payload = self._build_payload(messages)
         if response_format:
             payload.update({"response_format": response_format})
-            response = self.client.beta.chat.completions.parse(**payload)
+        cache_key = self._cache_key(payload)
+        if cache_key is not None:
+            cached = self._from_cache(cache_key)
+            if cached is not None:
+                return cached
+
+        scheduler, tokens = self._schedule(payload)
+        if response_format:
+            create = self.client.beta.chat.completions.parse
         else:
-            response = self.client.chat.completions.create(**payload)
+            create = self.client.chat.completions.create
+        response = scheduler.call(lambda: create(**payload), tokens=tokens, priority=self.priority)
         choice = response.choices[0]
         message = choice.message
 
         # Capture usage if provided by API
-        usage = getattr(response, "usage", None)
+        self._record_usage(getattr(response, "usage", None))
+
+        ai_message = AIMessage(
+            content=message.content,
+            tool_calls=message.tool_calls
+        )
+        if cache_key is not None:
+            self.response_cache.set(cache_key, ai_message.model_dump(mode="json"), self.last_usage)
+        return ai_message
+
+    def _cache_key(self, payload: Dict[str, Any]) -> Optional[str]:
+        if self.response_cache is None or not self.response_cache.accepts(payload):
+            return None
+        try:
+            return self.response_cache.key(payload)
+        except TypeError:
+            # Not exactly hashable: call the API rather than risk a wrong hit
+            return None
+
+    def _from_cache(self, cache_key: str) -> Optional[AIMessage]:
+        entry = self.response_cache.get(cache_key)
+        if entry is MISSING:
+            return None
+        # Report the original usage, flagged so callers can tell no tokens were spent
+        self.last_usage = {**entry["usage"], "cached": True} if entry["usage"] else None
+        return AIMessage.model_validate(entry["message"])
+
+    async def ainvoke(self,
+                      input: str | BaseMessage | List[BaseMessage],
+                      response_format: BaseModel = None,) -> AIMessage:
+        """Async version of invoke() using AsyncOpenAI"""
+        messages = self._convert_input(input)
+        payload = self._build_payload(messages)
+        if response_format:
+            payload.update({"response_format": response_format})
+        cache_key = self._cache_key(payload)
+        if cache_key is not None:
+            cached = self._from_cache(cache_key)
+            if cached is not None:
+                return cached
+
+        scheduler, tokens = self._schedule(payload)
+        if response_format:
+            create = self.async_client.beta.chat.completions.parse
+        else:
+            create = self.async_client.chat.completions.create
+        response = await scheduler.acall(lambda: create(**payload), tokens=tokens, priority=self.priority)
+        message = response.choices[0].message
+        self._record_usage(getattr(response, "usage", None))
+
+        ai_message = AIMessage(
+            content=message.content,
+            tool_calls=message.tool_calls
+        )
+        if cache_key is not None:
+            self.response_cache.set(cache_key, ai_message.model_dump(mode="json"), self.last_usage)
+        return ai_message
+
+    def _record_usage(self, usage: Any):
         if usage:
             self.last_usage = {
                 "prompt_tokens": getattr(usage, "prompt_tokens", None),
@@ -105,7 +262,59 @@ class LLM:
         else:
             self.last_usage = None
 
-        return AIMessage(
-            content=message.content,
-            tool_calls=message.tool_calls
-        )
+    def stream(self, input: str | BaseMessage | List[BaseMessage]) -> Iterator[StreamEvent]:
+        """Stream a chat completion.
+
+        Yields a ``delta`` event per content fragment as it arrives, then one
+        ``message`` event with the complete AIMessage. Tool-call fragments are
+        assembled incrementally and only appear on the final message.
+
+        Example:
+            >>> for event in llm.stream("Tell me a story"):
+            ...     if event.type == "delta":
+            ...         print(event.content, end="", flush=True)
+        """
+        messages = self._convert_input(input)
+        payload = self._build_payload(messages)
+        payload["stream"] = True
+        payload["stream_options"] = {"include_usage": True}
+
+        content_parts: List[str] = []
+        # index -> {"id", "name", "arguments"} accumulated across chunks
+        tool_fragments: Dict[int, Dict[str, Any]] = {}
+        usage = None
+        scheduler, tokens = self._schedule(payload)
+        chunks = scheduler.call(lambda: self.client.chat.completions.create(**payload),
+                                tokens=tokens, priority=self.priority)
+        for chunk in chunks:
+            usage = getattr(chunk, "usage", None) or usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if getattr(delta, "content", None):
+                content_parts.append(delta.content)
+                yield StreamEvent("delta", content=delta.content)
+            for fragment in getattr(delta, "tool_calls", None) or []:
+                entry = tool_fragments.setdefault(fragment.index, {"id": None, "name": "", "arguments": []})
+                if fragment.id:
+                    entry["id"] = fragment.id
+                function = getattr(fragment, "function", None)
+                if function is not None:
+                    if function.name:
+                        entry["name"] += function.name
+                    if function.arguments:
+                        entry["arguments"].append(function.arguments)
+
+        self._record_usage(usage)
+        tool_calls = [
+            ToolCall(
+                id=entry["id"],
+                type="function",
+                function={"name": entry["name"], "arguments": "".join(entry["arguments"])},
+            )
+            for _, entry in sorted(tool_fragments.items())
+        ]
+        yield StreamEvent("message", message=AIMessage(
+            content="".join(content_parts) if content_parts or not tool_calls else None,
+            tool_calls=tool_calls or None,
+        ))
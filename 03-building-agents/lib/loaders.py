@@ -2,7 +2,6 @@ from typing import List
 import os
 import json
 import glob
-import pdfplumber
 from lib.documents import Corpus, Document
 
 
@@ -31,8 +30,9 @@ class PDFLoader:
         self.pdf_path = pdf_path
 
     def load(self) -> Document:
-        corpus = Corpus()
+        import pdfplumber  # imported on first use; it is slow to load
 
+        corpus = Corpus()
         with pdfplumber.open(self.pdf_path) as pdf:
             for num, page in enumerate(pdf.pages, start=1):
                 text = page.extract_text()
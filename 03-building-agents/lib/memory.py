@@ -1,11 +1,17 @@
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, List, Optional, Tuple
+from collections import deque
 from dataclasses import dataclass, field
 from datetime import datetime
 import copy
 
 from lib.documents import Document
-from lib.vector_db import VectorStoreManager
-from chromadb.api.types import QueryResult
+from lib.messages import BaseMessage, SystemMessage, UserMessage
+from lib.tooling import estimate_tokens_for_message
+
+if TYPE_CHECKING:
+    # chromadb is only needed once a LongTermMemory is created
+    from chromadb.api.types import QueryResult
+    from lib.vector_db import VectorStoreManager
 
 
 class SessionNotFoundError(Exception):
@@ -15,8 +21,14 @@ class SessionNotFoundError(Exception):
 
 @dataclass
 class ShortTermMemory():
-    """Manage the history of objects across multiple sessions"""
+    """Manage the history of objects across multiple sessions
+
+    Objects are deep-copied on add and on read unless ``copy_objects`` is
+    False, in which case they are stored by reference (e.g. Agent's finished
+    Runs, which are not modified afterwards and may hold long histories).
+    """
     sessions: Dict[str, List[Any]] = field(default_factory=lambda: {})
+    copy_objects: bool = True
 
     def __post_init__(self):
         """Initialize the default session"""
@@ -86,7 +98,7 @@ class ShortTermMemory():
         """
         session_id = session_id or "default"
         self._validate_session(session_id)
-        self.sessions[session_id].append(copy.deepcopy(object))
+        self.sessions[session_id].append(copy.deepcopy(object) if self.copy_objects else object)
 
     def get_all_objects(self, session_id: Optional[str] = None) -> List[Any]:
         """Get all objects for a session
@@ -102,6 +114,8 @@ class ShortTermMemory():
         """
         session_id = session_id or "default"
         self._validate_session(session_id)
+        if not self.copy_objects:
+            return list(self.sessions[session_id])
         return [copy.deepcopy(obj) for obj in self.sessions[session_id]]
 
     def get_last_object(self, session_id: Optional[str] = None) -> Optional[Any]:
@@ -162,6 +176,100 @@ class ShortTermMemory():
 
 # =================== Long-term Memory (Agentic RAG-backed) ===================
 
+def _estimate_message_tokens(message: BaseMessage) -> int:
+    return estimate_tokens_for_message(message.dict())
+
+
+@dataclass
+class ConversationWindow:
+    """Append-only conversation history kept within a token budget.
+
+    Each appended turn (the messages produced by one agent invocation) is
+    token-counted once, so building the next prompt costs nothing beyond
+    concatenating the retained turns. When the retained turns exceed
+    ``token_budget`` the oldest whole turns are evicted (keeping tool calls and
+    their results together); the latest turn is always kept. With a
+    ``summarizer`` the evicted messages are folded into a running summary.
+
+    Example:
+        >>> window = ConversationWindow(token_budget=4_000)
+        >>> window.append_turn([UserMessage(content="hi"), AIMessage(content="hello")])
+        >>> window.messages()
+    """
+    token_budget: int
+    token_counter: Callable[[BaseMessage], int] = _estimate_message_tokens
+    summarizer: Optional[Callable[[Optional[str], List[BaseMessage]], str]] = None
+    turns: Deque[Tuple[List[BaseMessage], int]] = field(default_factory=deque)
+    summary: Optional[str] = None
+    total_tokens: int = 0  # tokens of the retained turns
+    summary_tokens: int = 0
+    evicted_turns: int = 0
+
+    def __str__(self) -> str:
+        return (f"ConversationWindow(turns={len(self.turns)}, tokens={self.total_tokens}, "
+                f"budget={self.token_budget}, evicted={self.evicted_turns})")
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+    def append_turn(self, messages: List[BaseMessage]):
+        """Add the non-system messages of one turn and evict old turns if over budget"""
+        messages = [m for m in messages if getattr(m, "role", None) != "system"]
+        if not messages:
+            return
+        tokens = sum(self.token_counter(m) for m in messages)
+        self.turns.append((messages, tokens))
+        self.total_tokens += tokens
+        self._evict()
+
+    def _evict(self):
+        while len(self.turns) > 1 and self.total_tokens + self.summary_tokens > self.token_budget:
+            evicted: List[BaseMessage] = []
+            while len(self.turns) > 1 and self.total_tokens + self.summary_tokens > self.token_budget:
+                turn, tokens = self.turns.popleft()
+                self.total_tokens -= tokens
+                self.evicted_turns += 1
+                evicted.extend(turn)
+            if self.summarizer is None:
+                return
+            # A longer summary can push the window over budget again; evict more if so
+            self.summary = self.summarizer(self.summary, evicted)
+            self.summary_tokens = self.token_counter(SystemMessage(content=self.summary)) if self.summary else 0
+
+    def messages(self) -> List[BaseMessage]:
+        """Retained messages in chronological order"""
+        return [message for turn, _ in self.turns for message in turn]
+
+    def clear(self):
+        self.turns.clear()
+        self.summary = None
+        self.total_tokens = 0
+        self.summary_tokens = 0
+        self.evicted_turns = 0
+
+
+def llm_summarizer(llm: Any, max_words: int = 200) -> Callable[[Optional[str], List[BaseMessage]], str]:
+    """Build a ConversationWindow summarizer that asks ``llm`` to fold evicted turns into the summary
+
+    Args:
+        llm: An lib.llm.LLM (anything with invoke(str) -> message with .content)
+        max_words: Target length of the running summary
+    """
+    def summarize(previous: Optional[str], evicted: List[BaseMessage]) -> str:
+        transcript = "\n".join(
+            f"{m.role}: {m.content}" for m in evicted if m.content
+        )
+        prompt = (
+            f"Update the running summary of a conversation in at most {max_words} words. "
+            "Keep facts, decisions and open questions; drop pleasantries."
+            f"\n# Current summary:\n{previous or '(empty)'}"
+            f"\n# New messages:\n{transcript}"
+            "\n# Updated summary:"
+        )
+        return llm.invoke(UserMessage(content=prompt)).content or (previous or "")
+    return summarize
+
+
 @dataclass
 class MemoryFragment:
     """
@@ -203,7 +311,7 @@ class LongTermMemory:
     - Semantic similarity search
     """
 
-    def __init__(self, db: VectorStoreManager):
+    def __init__(self, db: 'VectorStoreManager'):
         self.vector_store = db.create_store("long_term_memory", force=True)
 
     def get_namespaces(self) -> List[str]:
@@ -0,0 +1,346 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import array
+import base64
+import hashlib
+import itertools
+import json
+import math
+import random
+import threading
+import time
+import uuid
+
+
+@dataclass
+class LatencyModel:
+    """Response delay distribution, in seconds.
+
+    Example:
+        >>> LatencyModel.fixed(0.05)
+        >>> LatencyModel.lognormal(median=0.4, sigma=0.5)
+    """
+    kind: str = "fixed"  # fixed | uniform | lognormal
+    a: float = 0.0
+    b: float = 0.0
+    seed: Optional[int] = None
+    _rng: random.Random = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._rng = random.Random(self.seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def fixed(cls, seconds: float) -> 'LatencyModel':
+        return cls("fixed", seconds)
+
+    @classmethod
+    def uniform(cls, low: float, high: float, seed: Optional[int] = None) -> 'LatencyModel':
+        return cls("uniform", low, high, seed)
+
+    @classmethod
+    def lognormal(cls, median: float, sigma: float = 0.5, seed: Optional[int] = None) -> 'LatencyModel':
+        return cls("lognormal", median, sigma, seed)
+
+    def sample(self) -> float:
+        with self._lock:
+            if self.kind == "uniform":
+                return self._rng.uniform(self.a, self.b)
+            if self.kind == "lognormal":
+                return self._rng.lognormvariate(math.log(self.a), self.b) if self.a > 0 else 0.0
+        return self.a
+
+
+@dataclass
+class MockReply:
+    """A scripted assistant reply: text, tool calls ([(name, arguments)]), or both"""
+    content: Optional[str] = None
+    tool_calls: List[Tuple[str, Dict[str, Any]]] = field(default_factory=list)
+
+
+Responder = Callable[[Dict[str, Any]], MockReply]
+
+
+def deterministic_embedding(text: str, dimensions: int = 64) -> List[float]:
+    """Unit vector derived from the words of ``text``: same text, same vector.
+
+    Each word adds a pseudo-random direction seeded by its hash, so texts that
+    share words end up close together, which keeps retrieval tests meaningful.
+    """
+    vector = [0.0] * dimensions
+    for word in text.lower().split() or [""]:
+        seed = int.from_bytes(hashlib.sha256(word.encode("utf-8")).digest()[:8], "big")
+        rng = random.Random(seed)
+        for i in range(dimensions):
+            vector[i] += rng.gauss(0.0, 1.0)
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def _example_from_schema(schema: Dict[str, Any], defs: Dict[str, Any]) -> Any:
+    """Smallest value matching a JSON schema (for response_format requests)"""
+    if "$ref" in schema:
+        return _example_from_schema(defs.get(schema["$ref"].split("/")[-1], {}), defs)
+    for key in ("anyOf", "oneOf", "allOf"):
+        if key in schema:
+            return _example_from_schema(schema[key][0], defs)
+    if "enum" in schema:
+        return schema["enum"][0]
+    kind = schema.get("type")
+    if kind == "object":
+        return {name: _example_from_schema(prop, defs) for name, prop in schema.get("properties", {}).items()}
+    if kind == "array":
+        return []
+    if kind == "integer":
+        return 0
+    if kind == "number":
+        return 0.0
+    if kind == "boolean":
+        return True
+    if kind == "null":
+        return None
+    return "mock"
+
+
+def default_responder(request: Dict[str, Any]) -> MockReply:
+    """Call each offered tool once after a user turn, then answer in text.
+
+    Tool arguments are filled from the tool's JSON schema, so any agent can
+    complete a tool round trip against the mock.
+    """
+    messages = request.get("messages", [])
+    last = messages[-1] if messages else {}
+    tools = request.get("tools") or []
+    if tools and last.get("role") == "user":
+        calls = []
+        for spec in tools:
+            function = spec["function"]
+            parameters = function.get("parameters", {})
+            calls.append((function["name"], _example_from_schema(parameters, parameters.get("$defs", {}))))
+        return MockReply(tool_calls=calls)
+    question = next((m.get("content") for m in reversed(messages) if m.get("role") == "user"), "")
+    return MockReply(content=f"Mock answer to: {question}")
+
+
+class ScriptedResponder:
+    """Replays replies in order (cycling), e.g. a tool call followed by an answer"""
+
+    def __init__(self, replies: List[MockReply]):
+        self._replies = itertools.cycle(replies)
+        self._lock = threading.Lock()
+
+    def __call__(self, request: Dict[str, Any]) -> MockReply:
+        with self._lock:
+            return next(self._replies)
+
+
+def _count_tokens(value: Any) -> int:
+    # Whitespace tokens: cheap and stable, which is all load tests need
+    return len(json.dumps(value).split())
+
+
+class MockOpenAIServer:
+    """Local OpenAI-compatible server for /v1/chat/completions and /v1/embeddings.
+
+    Runs on a background thread (one thread per connection) so real OpenAI
+    clients, Agent, RAG and chromadb's embedding function can be exercised
+    offline. Supports tool calls, streaming (SSE) and response_format.
+
+    Example:
+        >>> with MockOpenAIServer(latency=LatencyModel.lognormal(0.3)) as server:
+        ...     llm = LLM(base_url=server.base_url, api_key="mock")
+        ...     llm.invoke("hello").content
+        'Mock answer to: hello'
+    """
+
+    def __init__(self, responder: Optional[Union[Responder, List[MockReply]]] = None,
+                 latency: Optional[LatencyModel] = None, embedding_latency: Optional[LatencyModel] = None,
+                 embedding_dimensions: int = 64, host: str = "127.0.0.1", port: int = 0):
+        """
+        Args:
+            responder: Callable(request) -> MockReply, or a list of replies to cycle
+                through (default: default_responder)
+            latency: Delay before each chat completion (default: none)
+            embedding_latency: Delay before each embeddings response (default: none)
+            embedding_dimensions: Size of the deterministic embeddings
+            host: Interface to bind
+            port: Port to bind (0 = any free port)
+        """
+        if isinstance(responder, list):
+            responder = ScriptedResponder(responder)
+        self.responder: Responder = responder or default_responder
+        self.latency = latency or LatencyModel.fixed(0.0)
+        self.embedding_latency = embedding_latency or LatencyModel.fixed(0.0)
+        self.embedding_dimensions = embedding_dimensions
+        self.requests: Dict[str, int] = {"chat": 0, "embeddings": 0}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    def __str__(self) -> str:
+        return f"MockOpenAIServer('{self.base_url}')"
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+    def __enter__(self) -> 'MockOpenAIServer':
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> 'MockOpenAIServer':
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _count(self, kind: str):
+        with self._lock:
+            self.requests[kind] += 1
+
+    def chat_completion(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Build a chat.completion body for a request"""
+        reply = self.responder(request)
+        if request.get("response_format") and reply.content is None and not reply.tool_calls:
+            schema = request["response_format"].get("json_schema", {}).get("schema", {})
+            reply = MockReply(content=json.dumps(_example_from_schema(schema, schema.get("$defs", {}))))
+        tool_calls = [
+            {
+                "id": f"call_{uuid.uuid4().hex[:12]}",
+                "type": "function",
+                "function": {"name": name, "arguments": json.dumps(arguments)},
+            }
+            for name, arguments in reply.tool_calls
+        ]
+        message: Dict[str, Any] = {"role": "assistant", "content": reply.content}
+        if tool_calls:
+            message["tool_calls"] = tool_calls
+        prompt_tokens = _count_tokens(request.get("messages", []))
+        completion_tokens = _count_tokens(message)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if tool_calls else "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    @staticmethod
+    def stream_chunks(completion: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Split a completion into chat.completion.chunk events (word deltas, one chunk per tool call)"""
+        base = {key: completion[key] for key in ("id", "created", "model")}
+        base["object"] = "chat.completion.chunk"
+        message = completion["choices"][0]["message"]
+        chunks = []
+        words = (message.get("content") or "").split(" ")
+        for i, word in enumerate(words if message.get("content") else []):
+            delta = {"content": word if i == 0 else " " + word}
+            if i == 0:
+                delta["role"] = "assistant"
+            chunks.append({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+        for index, call in enumerate(message.get("tool_calls", [])):
+            arguments = call["function"]["arguments"]
+            middle = len(arguments) // 2
+            # Send each call's arguments in two fragments, as the real API does
+            for part, fragment in enumerate((arguments[:middle], arguments[middle:])):
+                tool_delta = {"index": index, "function": {"arguments": fragment}}
+                if part == 0:
+                    tool_delta.update({"id": call["id"], "type": "function"})
+                    tool_delta["function"]["name"] = call["function"]["name"]
+                chunks.append({**base, "choices": [{"index": 0, "delta": {"tool_calls": [tool_delta]}, "finish_reason": None}]})
+        chunks.append({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": completion["choices"][0]["finish_reason"]}]})
+        chunks.append({**base, "choices": [], "usage": completion["usage"]})
+        return chunks
+
+    def embeddings(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        inputs = request.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        as_base64 = request.get("encoding_format") == "base64"
+        data = []
+        for index, text in enumerate(inputs):
+            vector = deterministic_embedding(str(text), self.embedding_dimensions)
+            if as_base64:
+                vector = base64.b64encode(array.array("f", vector).tobytes()).decode("ascii")
+            data.append({"object": "embedding", "index": index, "embedding": vector})
+        tokens = sum(len(str(text).split()) for text in inputs)
+        return {
+            "object": "list",
+            "data": data,
+            "model": request.get("model", "mock-embedding"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; with Nagle on, the
+            # body waits for the client's delayed ACK (~40 ms per request)
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, body: Dict[str, Any]):
+                encoded = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(encoded)))
+                self.end_headers()
+                self.wfile.write(encoded)
+
+            def _send_stream(self, chunks: List[Dict[str, Any]]):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for chunk in chunks:
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                request = json.loads(self.rfile.read(length) or b"{}")
+                path = self.path.rstrip("/")
+                if path.endswith("/chat/completions"):
+                    server._count("chat")
+                    time.sleep(server.latency.sample())
+                    completion = server.chat_completion(request)
+                    if request.get("stream"):
+                        self._send_stream(server.stream_chunks(completion))
+                    else:
+                        self._send_json(200, completion)
+                elif path.endswith("/embeddings"):
+                    server._count("embeddings")
+                    time.sleep(server.embedding_latency.sample())
+                    self._send_json(200, server.embeddings(request))
+                else:
+                    self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "not_found"}})
+
+        return Handler
@@ -1,10 +1,13 @@
-from typing import TypedDict, List
+from typing import TYPE_CHECKING, TypedDict, List, Optional
 import logging
 
-from lib.state_machine import StateMachine, Step, EntryPoint, Termination, Run, Resource
+from lib.caching import LRUCache
+from lib.state_machine import StateMachine, Step, EntryPoint, Termination, Run, Resource, BatchResult
 from lib.llm import LLM
 from lib.messages import BaseMessage, UserMessage, SystemMessage
-from lib.vector_db import VectorStore
+
+if TYPE_CHECKING:
+    from lib.vector_db import VectorStore
 
 
 logging.getLogger('pdfminer').setLevel(logging.ERROR)
@@ -31,8 +34,13 @@ class RAG:
     
     The RAG pattern enhances LLM responses by providing relevant external knowledge,
     reducing hallucinations and improving factual accuracy.
+
+    Pass a ``step_cache`` to memoize retrieval and prompt construction for
+    repeated questions. Use a TTL when the vector store keeps changing, since
+    cached retrievals are not invalidated when documents are added.
     """
-    def __init__(self, llm: LLM, vector_store: VectorStore):
+    def __init__(self, llm: LLM, vector_store: 'VectorStore', step_cache: Optional[LRUCache] = None):
+        self.step_cache = step_cache
         self.workflow = self._create_state_machine()
         self.resource = Resource(
             vars = {
@@ -43,7 +51,7 @@ class RAG:
 
     def _retrieve(self, state:RAGState, resource:Resource) -> RAGState:
         question = state["question"]
-        vector_store:VectorStore = resource.vars.get("vector_store")
+        vector_store: VectorStore = resource.vars.get("vector_store")
         results = vector_store.query(query_texts=[question])
 
         documents = results['documents'][0] if results['documents'] else []
@@ -80,12 +88,12 @@ class RAG:
         }
 
     def _create_state_machine(self) -> StateMachine[RAGState]:
-        machine = StateMachine[RAGState](RAGState)
+        machine = StateMachine[RAGState](RAGState, step_cache=self.step_cache)
 
         # Create steps
         entry = EntryPoint[RAGState]()
-        retrieve = Step[RAGState]("retrieve", self._retrieve)
-        augment = Step[RAGState]("augment", self._augment)
+        retrieve = Step[RAGState]("retrieve", self._retrieve, reads=["question"])
+        augment = Step[RAGState]("augment", self._augment, reads=["question", "documents"])
         generate = Step[RAGState]("generate", self._generate)
         termination = Termination[RAGState]()
 
@@ -125,3 +133,22 @@ class RAG:
             resource = self.resource,
         )
         return run_object
+
+    def invoke_many(self, queries: List[str], max_concurrency: int = 8) -> BatchResult:
+        """
+        Run the RAG pipeline for many queries concurrently.
+
+        Args:
+            queries (List[str]): Questions to answer
+            max_concurrency (int): Maximum number of pipelines running at once
+
+        Returns:
+            BatchResult: One item per query in input order; failed queries carry
+            their error instead of aborting the batch
+
+        Example:
+            >>> batch = rag.invoke_many(["What is RAG?", "What is an agent?"])
+            >>> answers = [run.get_final_state()["answer"] for run in batch.runs if run]
+        """
+        states: List[RAGState] = [{"question": query} for query in queries]
+        return self.workflow.run_many(states, resource=self.resource, max_concurrency=max_concurrency)
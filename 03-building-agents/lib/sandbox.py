@@ -0,0 +1,176 @@
+from typing import Any, Dict, Literal, Optional
+import importlib
+import multiprocessing
+import os
+import sys
+import threading
+
+
+ExecutionMode = Literal["inline", "thread", "process"]
+
+
+class ToolTimeoutError(TimeoutError):
+    """A sandboxed tool call did not finish within its timeout (the worker was killed)"""
+
+
+class ToolMemoryError(MemoryError):
+    """A sandboxed tool call exceeded its memory limit"""
+
+
+_context = None
+_context_lock = threading.Lock()
+# Modules defining process-mode tools, imported once by the fork server
+_preload = ["lib.tooling"]
+
+
+def register_module(module: str):
+    """Have the fork server import ``module`` so workers do not re-import it per call.
+
+    Only modules registered before the first process-mode call are preloaded;
+    later ones are imported by each worker.
+    """
+    with _context_lock:
+        if module != "__main__" and module not in _preload:
+            _preload.append(module)
+
+
+def _start_fork_server():
+    # Some Python versions do not apply the parent's sys.path in the fork
+    # server before preloading, so pass it through the environment
+    from multiprocessing import forkserver
+    previous = os.environ.get("PYTHONPATH")
+    os.environ["PYTHONPATH"] = os.pathsep.join(path or os.getcwd() for path in sys.path)
+    try:
+        forkserver.ensure_running()
+    finally:
+        if previous is None:
+            del os.environ["PYTHONPATH"]
+        else:
+            os.environ["PYTHONPATH"] = previous
+
+
+def _get_context():
+    """Start method for tool workers: forkserver where available (fast, safe with
+    the agent's threads), spawn elsewhere"""
+    global _context
+    with _context_lock:
+        if _context is None:
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                _context = multiprocessing.get_context("forkserver")
+                # Forked workers start with the tool modules already imported
+                _context.set_forkserver_preload(list(_preload))
+                _start_fork_server()
+            else:
+                _context = multiprocessing.get_context("spawn")
+        return _context
+
+
+def _resolve(module: str, qualname: str):
+    target = importlib.import_module(module)
+    for part in qualname.split("."):
+        target = getattr(target, part)
+    return target
+
+
+def _limit_memory(megabytes: int):
+    """Let the process grow by ``megabytes`` of address space (POSIX only)"""
+    try:
+        import resource
+    except ImportError:
+        return
+    baseline = 0
+    try:
+        with open("/proc/self/statm") as f:
+            baseline = int(f.read().split()[0]) * resource.getpagesize()
+    except OSError:
+        pass
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    limit = baseline + megabytes * 1024 * 1024
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _worker(conn, module: str, qualname: str, arguments: Dict[str, Any], memory_limit_mb: Optional[int]):
+    """Child process entry point: resolve the tool by name, run it, send back the outcome"""
+    try:
+        # @tool replaces the function with a Tool at module level; Tool.__call__
+        # also runs async functions to completion
+        target = _resolve(module, qualname)
+        if memory_limit_mb is not None:
+            _limit_memory(memory_limit_mb)
+        outcome = ("ok", target(**arguments))
+    except MemoryError:
+        outcome = ("memory", None)
+    except BaseException as e:
+        outcome = ("raise", e)
+    try:
+        conn.send(outcome)
+    except Exception:
+        # Unpicklable result or exception: report it as text
+        kind, value = outcome
+        conn.send(("raise", RuntimeError(f"{type(value).__name__}: {value}")))
+    finally:
+        conn.close()
+
+
+def run_in_process(module: str, qualname: str, arguments: Dict[str, Any],
+                   timeout: Optional[float] = None, memory_limit_mb: Optional[int] = None) -> Any:
+    """Run a top-level tool in a fresh worker process and return its result.
+
+    Unlike threads, the worker can be killed, so the timeout and memory limit
+    are enforced, and CPU-bound tools do not hold the agent's GIL.
+
+    Args:
+        module: Module defining the tool (e.g. "lib.tools")
+        qualname: Name of the tool in that module
+        arguments: Keyword arguments (and the result) must be picklable
+        timeout: Seconds before the worker is killed (None = wait forever)
+        memory_limit_mb: Address space the call may add beyond the worker's
+            baseline (Linux; ignored where unsupported)
+
+    Returns:
+        The tool's return value
+
+    Raises:
+        ToolTimeoutError: if the call did not finish in time
+        ToolMemoryError: if the call hit the memory limit
+        Exception: whatever the tool raised
+    """
+    context = _get_context()
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(
+        target=_worker,
+        args=(sender, module, qualname, arguments, memory_limit_mb),
+        name=f"tool-{qualname}",
+        daemon=True,
+    )
+    process.start()
+    sender.close()
+    try:
+        if not receiver.poll(timeout):
+            process.kill()
+            raise ToolTimeoutError(f"Tool '{qualname}' timed out after {timeout}s")
+        try:
+            kind, value = receiver.recv()
+        except EOFError:
+            # The worker died without reporting (e.g. killed by the OS)
+            process.join()
+            raise RuntimeError(f"Tool '{qualname}' worker exited with code {process.exitcode}")
+    finally:
+        receiver.close()
+        process.join()
+    if kind == "memory":
+        raise ToolMemoryError(f"Tool '{qualname}' exceeded its memory limit of {memory_limit_mb} MB")
+    if kind == "raise":
+        raise value
+    return value
+
+
+def process_target(func) -> str:
+    """Why ``func`` cannot run in a worker process, or "" if it can"""
+    if "<locals>" in func.__qualname__:
+        return "it is defined inside a function"
+    if func.__module__ == "__main__" and not hasattr(sys.modules.get("__main__"), "__file__"):
+        return "it is defined in an interactive session"
+    return ""
@@ -0,0 +1,302 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+from dataclasses import dataclass, field
+from enum import IntEnum
+import asyncio
+import heapq
+import itertools
+import random
+import threading
+import time
+
+import openai
+
+
+T = TypeVar("T")
+
+
+class Priority(IntEnum):
+    """Scheduling class of a request; lower values are served first"""
+    INTERACTIVE = 0  # user-facing agent turns
+    DEFAULT = 1
+    BATCH = 2  # evaluation judges, backfills
+
+
+@dataclass(frozen=True)
+class RateLimits:
+    """Provider limits to stay under (None = unlimited)"""
+    requests_per_minute: Optional[float] = None
+    tokens_per_minute: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Retry 429/5xx/connection errors with full-jitter exponential backoff"""
+    max_retries: int = 5
+    base_delay: float = 0.5  # seconds
+    max_delay: float = 30.0  # seconds
+
+    def delay(self, attempt: int, error: BaseException) -> float:
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            return min(self.max_delay, retry_after)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Rate limits (429), server errors (5xx), timeouts and dropped connections"""
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    status = getattr(error, "status_code", None)
+    return status == 429 or (status is not None and status >= 500)
+
+
+class TokenBucket:
+    """Continuously refilling bucket; ``capacity`` units per ``period`` seconds"""
+
+    def __init__(self, capacity: float, period: float = 60.0):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` units are available (0 if they are now)"""
+        self._refill(now)
+        # Requests larger than the whole bucket only wait for a full bucket
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+
+@dataclass
+class SchedulerMetrics:
+    """Counters of a RequestScheduler"""
+    submitted: int = 0
+    completed: int = 0
+    failed: int = 0
+    retries: int = 0
+    throttled_seconds: float = 0.0  # total time requests spent queued
+    max_queue_depth: int = 0
+    retries_by_status: Dict[str, int] = field(default_factory=dict)
+
+
+class RequestScheduler:
+    """Admits LLM requests under shared requests/min and tokens/min budgets.
+
+    Waiting requests are admitted strictly by priority (then arrival), and
+    failed calls that look transient are retried with backoff. One scheduler
+    is meant to be shared by every LLM in the process (see
+    set_default_scheduler), so parallel agents stay under the provider's
+    limits instead of tripping 429s.
+
+    Example:
+        >>> scheduler = RequestScheduler(RateLimits(requests_per_minute=500, tokens_per_minute=200_000))
+        >>> set_default_scheduler(scheduler)
+        >>> scheduler.metrics()["queue_depth"]
+    """
+
+    def __init__(self, limits: Optional[RateLimits] = None, retry: Optional[RetryPolicy] = None,
+                 poll_interval: float = 0.005):
+        """
+        Args:
+            limits: Budgets to enforce (default: unlimited, retries only)
+            retry: Backoff policy for transient errors
+            poll_interval: How often queued async requests re-check their turn
+        """
+        self.limits = limits or RateLimits()
+        self.retry = retry or RetryPolicy()
+        self.poll_interval = poll_interval
+        self._requests = TokenBucket(self.limits.requests_per_minute) if self.limits.requests_per_minute else None
+        self._tokens = TokenBucket(self.limits.tokens_per_minute) if self.limits.tokens_per_minute else None
+        self._cond = threading.Condition()
+        self._queue: List[Tuple[int, int]] = []
+        self._sequence = itertools.count()
+        self._metrics = SchedulerMetrics()
+
+    def __str__(self) -> str:
+        return f"RequestScheduler(limits={self.limits}, queued={len(self._queue)})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+    @property
+    def limits_tokens(self) -> bool:
+        """Whether callers need to estimate request tokens"""
+        return self._tokens is not None
+
+    def _enqueue(self, priority: Priority) -> Tuple[int, int]:
+        ticket = (int(priority), next(self._sequence))
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            self._metrics.max_queue_depth = max(self._metrics.max_queue_depth, len(self._queue))
+        return ticket
+
+    def _poll(self, ticket: Tuple[int, int], tokens: float) -> Optional[float]:
+        """Admit the ticket if it is first in line and the budgets allow it.
+
+        Must hold the lock. Returns None once admitted, else the seconds to
+        wait (infinity when another ticket is ahead; it notifies on admission).
+        """
+        if self._queue[0] != ticket:
+            return float("inf")
+        now = time.monotonic()
+        wait = 0.0
+        if self._requests is not None:
+            wait = max(wait, self._requests.wait_time(1, now))
+        if self._tokens is not None:
+            wait = max(wait, self._tokens.wait_time(tokens, now))
+        if wait > 0:
+            return wait
+        if self._requests is not None:
+            self._requests.take(1)
+        if self._tokens is not None:
+            self._tokens.take(tokens)
+        heapq.heappop(self._queue)
+        self._cond.notify_all()
+        return None
+
+    def _abandon(self, ticket: Tuple[int, int]):
+        with self._cond:
+            if ticket in self._queue:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+
+    def acquire(self, tokens: float = 0, priority: Priority = Priority.DEFAULT):
+        """Block until a request of ``tokens`` estimated tokens may be sent"""
+        ticket = self._enqueue(priority)
+        started = time.monotonic()
+        try:
+            with self._cond:
+                while True:
+                    wait = self._poll(ticket, tokens)
+                    if wait is None:
+                        self._metrics.throttled_seconds += time.monotonic() - started
+                        return
+                    self._cond.wait(timeout=None if wait == float("inf") else wait)
+        except BaseException:
+            self._abandon(ticket)
+            raise
+
+    async def aacquire(self, tokens: float = 0, priority: Priority = Priority.DEFAULT):
+        """Async acquire(): waits on the event loop instead of blocking a thread"""
+        ticket = self._enqueue(priority)
+        started = time.monotonic()
+        try:
+            while True:
+                with self._cond:
+                    wait = self._poll(ticket, tokens)
+                    if wait is None:
+                        self._metrics.throttled_seconds += time.monotonic() - started
+                        return
+                await asyncio.sleep(min(wait, self.poll_interval) if wait != float("inf") else self.poll_interval)
+        except BaseException:
+            self._abandon(ticket)
+            raise
+
+    def _record_failure(self, error: BaseException, attempt: int) -> Optional[float]:
+        """Count a failed attempt; return the backoff delay or None to give up"""
+        with self._cond:
+            if not is_retryable(error) or attempt >= self.retry.max_retries:
+                self._metrics.failed += 1
+                return None
+            self._metrics.retries += 1
+            status = str(getattr(error, "status_code", None) or type(error).__name__)
+            self._metrics.retries_by_status[status] = self._metrics.retries_by_status.get(status, 0) + 1
+        return self.retry.delay(attempt, error)
+
+    def _record_submit(self):
+        with self._cond:
+            self._metrics.submitted += 1
+
+    def _record_success(self):
+        with self._cond:
+            self._metrics.completed += 1
+
+    def call(self, fn: Callable[[], T], tokens: float = 0, priority: Priority = Priority.DEFAULT) -> T:
+        """Run ``fn`` once admitted, retrying transient errors (each retry is re-admitted)"""
+        self._record_submit()
+        attempt = 0
+        while True:
+            self.acquire(tokens, priority)
+            try:
+                result = fn()
+            except Exception as error:
+                delay = self._record_failure(error, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self._record_success()
+            return result
+
+    async def acall(self, fn: Callable[[], Awaitable[T]], tokens: float = 0,
+                    priority: Priority = Priority.DEFAULT) -> T:
+        """Async call(): ``fn`` returns a fresh awaitable per attempt"""
+        self._record_submit()
+        attempt = 0
+        while True:
+            await self.aacquire(tokens, priority)
+            try:
+                result = await fn()
+            except Exception as error:
+                delay = self._record_failure(error, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self._record_success()
+            return result
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth (total and per priority) plus throughput/retry counters"""
+        with self._cond:
+            depth_by_priority: Dict[str, int] = {}
+            for priority, _ in self._queue:
+                name = Priority(priority).name.lower()
+                depth_by_priority[name] = depth_by_priority.get(name, 0) + 1
+            m = self._metrics
+            return {
+                "queue_depth": len(self._queue),
+                "queue_depth_by_priority": depth_by_priority,
+                "max_queue_depth": m.max_queue_depth,
+                "submitted": m.submitted,
+                "completed": m.completed,
+                "failed": m.failed,
+                "retries": m.retries,
+                "retries_by_status": dict(m.retries_by_status),
+                "throttled_seconds": m.throttled_seconds,
+            }
+
+
+_default_scheduler = RequestScheduler()
+
+
+def get_default_scheduler() -> RequestScheduler:
+    """The process-wide scheduler LLMs use unless given their own"""
+    return _default_scheduler
+
+
+def set_default_scheduler(scheduler: RequestScheduler):
+    """Replace the process-wide scheduler (e.g. to apply your account's rate limits)"""
+    global _default_scheduler
+    _default_scheduler = scheduler
@@ -1,9 +1,18 @@
-from typing import Any, Callable, Dict, List, Optional, Union, TypeVar, Generic, cast, Type, TypedDict, get_type_hints
+from typing import Any, Annotated, Callable, Dict, FrozenSet, List, Literal, Optional, Set, Tuple, Union, TypeVar, Generic, cast, Type, TypedDict, get_type_hints, get_origin
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import asyncio
 from dataclasses import dataclass, field
 from datetime import datetime
 import uuid
 import copy
 import inspect
+import math
+import time
+
+from lib.caching import LRUCache, MISSING, stable_hash
+from lib.checkpoint import Checkpointer, SnapshotRecord
+from lib.events import StateMachineObserver
 
 
 StateSchema = TypeVar("StateSchema")
@@ -12,12 +21,34 @@ StateSchema = TypeVar("StateSchema")
 class Resource:
     vars: Dict[str, Any]
 
+
+@lru_cache(maxsize=None)
+def schema_fields(state_schema: Type[StateSchema]) -> FrozenSet[str]:
+    """Field names of a state schema, resolved once per schema"""
+    return frozenset(get_type_hints(state_schema))
+
+
 class Step(Generic[StateSchema]):
-    def __init__(self, step_id: str, logic: Callable[[StateSchema], Dict]):
+    def __init__(self, step_id: str, logic: Callable[[StateSchema], Dict],
+                 reads: Optional[List[str]] = None, cache_ttl: Optional[float] = None):
+        """
+        Args:
+            step_id: Unique identifier of the step within its workflow
+            logic: Function taking (state) or (state, resource) and returning updates
+            reads: State fields the logic depends on. Declaring them marks the
+                step as pure with respect to those fields, so a StateMachine
+                with a step_cache can reuse its output for identical inputs.
+            cache_ttl: Seconds a memoized output stays valid (default: the
+                cache's own TTL)
+        """
         self.step_id = step_id
         self.logic = logic
+        self.reads: Optional[Tuple[str, ...]] = tuple(reads) if reads is not None else None
+        self.cache_ttl = cache_ttl
         # Store the number of parameters the logic function expects
         self.logic_params_count = self._calculate_params_count()
+        # Coroutine logic (async def) can only be awaited through StateMachine.arun
+        self.is_async = inspect.iscoroutinefunction(logic)
 
     def __str__(self) -> str:
         return f"Step('{self.step_id}')"
@@ -34,27 +65,58 @@ class Step(Generic[StateSchema]):
             # For regular functions
             return self.logic.__code__.co_argcount
 
-    def run(self, state: StateSchema, state_schema: Type[StateSchema], resource: Resource=None) -> StateSchema:
+    def _call_logic(self, state: StateSchema, resource: Resource=None) -> Any:
         # Call logic function with appropriate number of arguments
         if self.logic_params_count == 1:
-            result = self.logic(state)
+            return self.logic(state)
         elif self.logic_params_count == 2:
-            result = self.logic(state, resource)
+            return self.logic(state, resource)
         else:
             raise ValueError(
                 f"Step '{self.step_id}' logic function must accept either 1 argument (state) "
                 f"or 2 arguments (state, resource). Found {self.logic_params_count} arguments."
             ) 
+
+    def cache_key(self, state: StateSchema) -> Optional[str]:
+        """Stable key for memoizing this step's output, or None if it declares no
+        reads or they hold values that cannot be hashed exactly (not cached)"""
+        if self.reads is None:
+            return None
+        inputs = {name: state[name] for name in self.reads if name in state}
+        # Fields missing from the state are listed separately so they never collide with None
+        missing = [name for name in self.reads if name not in state]
+        try:
+            return f"{self.step_id}:{stable_hash([inputs, missing])}"
+        except TypeError:
+            return None
+
+    def _filter_result(self, result: Dict[str, Any], state_schema: Type[StateSchema]) -> Dict[str, Any]:
         # Get expected fields from the TypedDict
-        expected_fields = get_type_hints(state_schema)
-        
+        expected_fields = schema_fields(state_schema)
+
+        # Only keep fields that are defined in state_schema
+        return {
+            field: value for field, value in result.items()
+            if field in expected_fields
+        }
+
+    def execute(self, state: StateSchema, state_schema: Type[StateSchema], resource: Resource=None) -> Dict[str, Any]:
+        """Run the step logic and return only the updates for fields in state_schema"""
+        if self.is_async:
+            raise TypeError(f"Step '{self.step_id}' has async logic; use StateMachine.arun() instead of run().")
+        return self._filter_result(self._call_logic(state, resource), state_schema)
+
+    async def aexecute(self, state: StateSchema, state_schema: Type[StateSchema], resource: Resource=None) -> Dict[str, Any]:
+        """Async counterpart of execute(); sync logic is offloaded to a worker thread"""
+        if self.is_async:
+            result = await self._call_logic(state, resource)
+            return self._filter_result(result, state_schema)
+        return await asyncio.to_thread(self.execute, state, state_schema, resource)
+
+    def run(self, state: StateSchema, state_schema: Type[StateSchema], resource: Resource=None) -> StateSchema:
         # Create new state with all fields from state_schema
-        # Only copy fields that are defined in state_schema
         updated = {**state}
-        for field, value in result.items():
-            if field in expected_fields:
-                updated[field] = value
-        
+        updated.update(self.execute(state, state_schema, resource))
         return cast(StateSchema, updated)
 
 
@@ -64,6 +126,10 @@ class EntryPoint(Step[StateSchema]):
     def __init__(self):
         super().__init__("__entry__", lambda x: {})
 
+    async def aexecute(self, state: StateSchema, state_schema: Type[StateSchema], resource: Resource=None) -> Dict[str, Any]:
+        # Nothing to offload; avoid a thread hop at the start of every async run
+        return self.execute(state, state_schema, resource)
+
 
 class Termination(Step[StateSchema]):
     """Special step that marks the end of the workflow.
@@ -84,27 +150,89 @@ class Transition(Generic[StateSchema]):
     def __repr__(self) -> str:
         return self.__str__()
 
+    @staticmethod
+    def _normalize(result: Union[str, List[str], Step[StateSchema], List[Step[StateSchema]]]) -> List[str]:
+        if isinstance(result, Step):
+            return [result.step_id]
+        elif isinstance(result, list) and all(isinstance(x, Step) for x in result):
+            return [step.step_id for step in result]
+        elif isinstance(result, str):
+            return [result]
+        return result
+
     def resolve(self, state: StateSchema) -> List[str]:
+        if self.condition:
+            return self._normalize(self.condition(state))
+        return self.targets
+
+    async def aresolve(self, state: StateSchema) -> List[str]:
+        """Resolve targets, awaiting the condition if it is a coroutine function"""
         if self.condition:
             result = self.condition(state)
-            if isinstance(result, Step):
-                return [result.step_id]
-            elif isinstance(result, list) and all(isinstance(x, Step) for x in result):
-                return [step.step_id for step in result]
-            elif isinstance(result, str):
-                return [result]
-            return result
+            if inspect.isawaitable(result):
+                result = await result
+            return self._normalize(result)
         return self.targets
 
 
+@dataclass
+class StepTiming:
+    """Wall-clock span of one step execution"""
+    started_at: datetime
+    ended_at: datetime
+    duration: float  # seconds, measured with a monotonic clock
+    lane: int = 0  # position among sibling steps that ran in parallel
+    cached: bool = False  # output was served from the StateMachine step_cache
+
+    @property
+    def metadata(self) -> Dict:
+        return {
+            "started_at": self.started_at.strftime("%Y-%m-%d %H:%M:%S.%f"),
+            "ended_at": self.ended_at.strftime("%Y-%m-%d %H:%M:%S.%f"),
+            "duration_ms": self.duration * 1000,
+            "lane": self.lane,
+            "cached": self.cached,
+        }
+
+
+def latency_stats(durations: List[float]) -> Dict[str, float]:
+    """Summarize step durations (seconds) in milliseconds: count, total, mean, p50, p95, max"""
+    if not durations:
+        return {"count": 0, "total_ms": 0.0, "mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+    ordered = sorted(durations)
+
+    def percentile(p: float) -> float:
+        # Nearest-rank percentile
+        rank = max(1, math.ceil(p / 100 * len(ordered)))
+        return ordered[rank - 1] * 1000
+
+    total = sum(ordered)
+    return {
+        "count": len(ordered),
+        "total_ms": total * 1000,
+        "mean_ms": total / len(ordered) * 1000,
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
 @dataclass
 class Snapshot(Generic[StateSchema]):
-    """Represents a single state snapshot in time"""
+    """Represents a single state snapshot in time.
+
+    Only the fields a step changed are stored in ``changes``; everything else is
+    shared with the ``parent`` snapshot. ``state_data`` rebuilds the full state
+    view on demand, so unchanged lists (e.g. ``messages``) are never copied.
+    """
     snapshot_id: str
     timestamp: datetime
-    state_data: StateSchema
+    changes: Dict[str, Any]
     state_schema: Type[StateSchema]
     step_id: str
+    parent: Optional['Snapshot[StateSchema]'] = field(default=None, repr=False, compare=False)
+    timing: Optional[StepTiming] = field(default=None, compare=False)
+    _state_data: Optional[Dict[str, Any]] = field(default=None, init=False, repr=False, compare=False)
 
     def __str__(self) -> str:
         return f"Snapshot('{self.snapshot_id}') @ [{self.timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')}]: {self.step_id}.State({self.state_data})"
@@ -112,15 +240,67 @@ class Snapshot(Generic[StateSchema]):
     def __repr__(self) -> str:
         return self.__str__()
 
+    @property
+    def state_data(self) -> StateSchema:
+        """Full state view at this snapshot (shallow copy; values are shared)."""
+        if self._state_data is None:
+            # Walk up to the closest materialized ancestor iteratively so long
+            # tool loops do not hit the recursion limit.
+            chain: List[Snapshot[StateSchema]] = []
+            node: Optional[Snapshot[StateSchema]] = self
+            while node is not None and node._state_data is None:
+                chain.append(node)
+                node = node.parent
+            view: Dict[str, Any] = dict(node._state_data) if node is not None else {}
+            for snap in reversed(chain):
+                view.update(snap.changes)
+            self._state_data = view
+        return cast(StateSchema, dict(self._state_data))
+
+    @property
+    def metadata(self) -> Dict:
+        metadata = {
+            "snapshot_id": self.snapshot_id,
+            "step_id": self.step_id,
+            "timestamp": self.timestamp.strftime("%Y-%m-%d %H:%M:%S.%f"),
+        }
+        if self.timing:
+            metadata.update(self.timing.metadata)
+        return metadata
+
+    def detach(self):
+        """Store the full state locally and drop the reference to the parent."""
+        self.changes = dict(self.state_data)
+        self.parent = None
+
     @classmethod
     def create(cls, state_data: StateSchema, state_schema: Type[StateSchema],
-               step_id:str) -> 'Snapshot[StateSchema]':
+               step_id:str, parent: Optional['Snapshot[StateSchema]'] = None,
+               changes: Optional[Dict[str, Any]] = None,
+               timing: Optional[StepTiming] = None) -> 'Snapshot[StateSchema]':
+        """Create a snapshot that shares unchanged fields with ``parent``.
+
+        ``changes`` may be passed when the caller already knows which fields
+        differ from the parent; otherwise they are computed by identity, which
+        misses values mutated in place (StateMachine passes the fields each
+        step returned).
+        """
+        if parent is None:
+            changes = dict(state_data)
+        elif changes is None:
+            previous = parent.state_data
+            changes = {
+                key: value for key, value in state_data.items()
+                if key not in previous or previous[key] is not value
+            }
         return cls(
             snapshot_id=str(uuid.uuid4()),
             timestamp=datetime.now(),
-            state_data=state_data,
+            changes=changes,
             state_schema=state_schema,
             step_id=step_id,
+            parent=parent,
+            timing=timing,
         )
 
 
@@ -131,6 +311,9 @@ class Run(Generic[StateSchema]):
     start_timestamp: datetime
     snapshots: List[Snapshot[StateSchema]] = field(default_factory=list)
     end_timestamp: Optional[datetime] = None
+    # Executed steps per step_id, including snapshots dropped by a retention policy
+    step_counts: Dict[str, int] = field(default_factory=dict)
+    dropped_snapshots: int = 0
 
     def __str__(self) -> str:
         return f"Run('{self.run_id}')"
@@ -151,12 +334,58 @@ class Run(Generic[StateSchema]):
             "run_id": self.run_id,
             "start_timestamp": self.start_timestamp.strftime("%Y-%m-%d %H:%M:%S.%f"),
             "end_timestamp": self.end_timestamp.strftime("%Y-%m-%d %H:%M:%S.%f"),
-            "snapshot_counts": len(self.snapshots)
+            "snapshot_counts": len(self.snapshots),
+            "dropped_snapshots": self.dropped_snapshots,
         }
 
+    @property
+    def total_snapshots(self) -> int:
+        """Number of snapshots ever added to this run (retained or dropped)"""
+        return len(self.snapshots) + self.dropped_snapshots
+
+    @property
+    def has_full_history(self) -> bool:
+        return self.dropped_snapshots == 0
+
+    def latency_breakdown(self) -> Dict[str, Dict[str, float]]:
+        """Per-step latency summary for this run, keyed by step_id.
+
+        Each entry holds latency_stats() plus ``share``: the fraction of all
+        step time spent in that step (e.g. llm_processor vs tool_executor).
+        """
+        durations: Dict[str, List[float]] = {}
+        for snapshot in self.snapshots:
+            if snapshot.timing is not None:
+                durations.setdefault(snapshot.step_id, []).append(snapshot.timing.duration)
+        grand_total = sum(sum(values) for values in durations.values())
+        breakdown: Dict[str, Dict[str, float]] = {}
+        for step_id, values in durations.items():
+            stats = latency_stats(values)
+            stats["share"] = (sum(values) / grand_total) if grand_total else 0.0
+            breakdown[step_id] = stats
+        return breakdown
+
+    @property
+    def last_snapshot(self) -> Optional[Snapshot[StateSchema]]:
+        return self.snapshots[-1] if self.snapshots else None
+
     def add_snapshot(self, snapshot: Snapshot[StateSchema]):
         """Add a new snapshot to this run"""
         self.snapshots.append(snapshot)
+        self.step_counts[snapshot.step_id] = self.step_counts.get(snapshot.step_id, 0) + 1
+
+    def drop_snapshot(self, index: int):
+        """Remove a snapshot while keeping the remaining state views intact.
+
+        The dropped snapshot's changes are folded into the snapshot that was
+        built on top of it, so nothing keeps a reference to the dropped one.
+        """
+        dropped = self.snapshots.pop(index)
+        for child in self.snapshots[index:index + 1]:
+            if child.parent is dropped:
+                child.changes = {**dropped.changes, **child.changes}
+                child.parent = dropped.parent
+        self.dropped_snapshots += 1
 
     def complete(self):
         """Mark this run as complete"""
@@ -169,9 +398,187 @@ class Run(Generic[StateSchema]):
         return self.snapshots[-1].state_data
 
 
+@dataclass
+class BatchItem(Generic[StateSchema]):
+    """One input of StateMachine.run_many: its run (partial if it failed) and error"""
+    index: int
+    run: Optional[Run[StateSchema]] = None
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class BatchResult(Generic[StateSchema]):
+    """Outcome of StateMachine.run_many, with items in input order"""
+    items: List[BatchItem[StateSchema]]
+
+    def __str__(self) -> str:
+        return f"BatchResult(total={len(self.items)}, failed={len(self.errors)})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    @property
+    def runs(self) -> List[Optional[Run[StateSchema]]]:
+        """Runs in input order (None where the state was rejected before starting)"""
+        return [item.run for item in self.items]
+
+    @property
+    def errors(self) -> Dict[int, BaseException]:
+        """Errors keyed by input index"""
+        return {item.index: item.error for item in self.items if item.error is not None}
+
+    @property
+    def ok(self) -> bool:
+        return all(item.ok for item in self.items)
+
+    @property
+    def metadata(self) -> Dict:
+        return {
+            "total": len(self.items),
+            "succeeded": sum(1 for item in self.items if item.ok),
+            "failed": len(self.errors),
+        }
+
+
+def get_reducers(state_schema: Type[StateSchema]) -> Dict[str, Callable[[Any, Any], Any]]:
+    """Collect per-field reducers declared with ``Annotated`` on the schema.
+
+    Example:
+        >>> class State(TypedDict):
+        ...     documents: Annotated[List[str], operator.add]
+    """
+    reducers: Dict[str, Callable[[Any, Any], Any]] = {}
+    for name, hint in get_type_hints(state_schema, include_extras=True).items():
+        if get_origin(hint) is Annotated:
+            for meta in hint.__metadata__:
+                if callable(meta):
+                    reducers[name] = meta
+                    break
+    return reducers
+
+
+@dataclass(frozen=True)
+class SnapshotRetention:
+    """Which snapshots a run keeps in memory.
+
+    The latest snapshot is always kept so Run.get_final_state() keeps working.
+
+    Example:
+        >>> StateMachine(AgentState, snapshot_retention=SnapshotRetention.last(5))
+        >>> StateMachine(AgentState, snapshot_retention=SnapshotRetention.steps("llm_processor"))
+    """
+    mode: Literal["all", "final", "last_n", "steps"] = "all"
+    last_n: int = 0
+    step_ids: FrozenSet[str] = frozenset()
+
+    @classmethod
+    def keep_all(cls) -> 'SnapshotRetention':
+        return cls("all")
+
+    @classmethod
+    def final_only(cls) -> 'SnapshotRetention':
+        return cls("final")
+
+    @classmethod
+    def last(cls, n: int) -> 'SnapshotRetention':
+        if n < 1:
+            raise ValueError("SnapshotRetention.last() needs n >= 1")
+        return cls("last_n", last_n=n)
+
+    @classmethod
+    def steps(cls, *step_ids: Union[str, Step]) -> 'SnapshotRetention':
+        return cls("steps", step_ids=frozenset(
+            s.step_id if isinstance(s, Step) else s for s in step_ids
+        ))
+
+    def apply(self, run: Run, added: int = 1):
+        """Drop the snapshots this policy does not keep (cheap, run after every superstep)
+
+        Args:
+            run: The run to trim
+            added: Snapshots added since the last call (several after a fan-out)
+        """
+        if self.mode == "final":
+            while len(run.snapshots) > 1:
+                run.drop_snapshot(0)
+        elif self.mode == "last_n":
+            while len(run.snapshots) > self.last_n:
+                run.drop_snapshot(0)
+        elif self.mode == "steps":
+            # Only the snapshots added since the last call and the one that was
+            # latest then are unfiltered; the new latest is always kept
+            first = max(0, len(run.snapshots) - added - 1)
+            for index in range(len(run.snapshots) - 2, first - 1, -1):
+                if run.snapshots[index].step_id not in self.step_ids:
+                    run.drop_snapshot(index)
+
+
+@dataclass(frozen=True)
+class CompiledGraph(Generic[StateSchema]):
+    """Validated, precomputed view of a StateMachine used on the hot path"""
+    entry_id: str
+    fields: FrozenSet[str]
+    steps: Dict[str, Step[StateSchema]]
+    transitions: Dict[str, Tuple[Transition[StateSchema], ...]]
+    # Every step reachable from each step through any transition target
+    descendants: Dict[str, FrozenSet[str]]
+
+
 class StateMachine(Generic[StateSchema]):
-    def __init__(self, state_schema: Type[StateSchema]):
+    def __init__(self, state_schema: Type[StateSchema], deepcopy_snapshots: bool = False,
+                 max_workers: int = 8, checkpointer: Optional[Checkpointer] = None,
+                 snapshot_retention: Optional[SnapshotRetention] = None,
+                 observers: Optional[List[StateMachineObserver]] = None,
+                 step_cache: Optional[LRUCache] = None):
+        """
+        Args:
+            state_schema: TypedDict describing the workflow state. Fields may be
+                declared as ``Annotated[T, reducer]`` to control how a step's
+                update is merged into the current value (default: replace).
+                Reducers apply to every update, so updates from steps that ran
+                in parallel all reach the field.
+            deepcopy_snapshots: Deep-copy the full state into every snapshot.
+                By default snapshots share field values with the state (and
+                with the initial state passed to run()), so a step that
+                mutates a value in place, e.g. ``state["messages"].append()``,
+                also changes it in every earlier snapshot and in the caller's
+                dict. Returning the field still records it as changed, so
+                the final state and checkpoints are correct either way; set
+                this only when earlier snapshots must keep their own values.
+            max_workers: Maximum number of sibling steps executed concurrently
+                when a transition fans out to several targets.
+            checkpointer: Optional durable store; every finished step is written
+                to it so a run can be resumed or forked after a crash.
+            snapshot_retention: Which snapshots each Run keeps in memory
+                (default: all). Bounds memory for long tool loops.
+            observers: Receivers for run/step/transition events (see
+                lib.events). Nothing is printed or logged without one; use
+                PrintObserver for the classic console output.
+            step_cache: Optional LRU/TTL cache for memoizing steps that declare
+                ``reads``. Keys are the step id plus a hash of the declared
+                fields, so only share one cache between machines whose step
+                ids mean the same thing. ``step_cache.stats`` reports hits
+                and misses.
+        """
         self.state_schema = state_schema
+        self.deepcopy_snapshots = deepcopy_snapshots
+        self.max_workers = max_workers
+        self.reducers = get_reducers(state_schema)
+        self.checkpointer = checkpointer
+        self.snapshot_retention = snapshot_retention or SnapshotRetention.keep_all()
+        self.observers: List[StateMachineObserver] = list(observers or [])
+        self.step_cache = step_cache
+        self._compiled: Optional[CompiledGraph[StateSchema]] = None
         self.steps: Dict[str, Step[StateSchema]] = {}
         self.transitions: Dict[str, List[Transition[StateSchema]]] = {}
 
@@ -182,10 +589,19 @@ class StateMachine(Generic[StateSchema]):
     def __repr__(self) -> str:
         return self.__str__()
 
+    def add_observer(self, observer: StateMachineObserver):
+        """Subscribe an observer to run/step/transition events"""
+        self.observers.append(observer)
+
+    def _emit(self, event: str, *args):
+        for observer in self.observers:
+            getattr(observer, event)(*args)
+
     def add_steps(self, steps: List[Step[StateSchema]]):
         """Add steps to the workflow"""
         for step in steps:
             self.steps[step.step_id] = step
+        self._compiled = None
 
     def connect(
         self,
@@ -200,58 +616,450 @@ class StateMachine(Generic[StateSchema]):
         if src_id not in self.transitions:
             self.transitions[src_id] = []
         self.transitions[src_id].append(transition)
+        self._compiled = None
 
-    def run(self, state: StateSchema, resource: Resource = None):
-        # Validate that state has at least one field from the schema
-        expected_fields = get_type_hints(self.state_schema)
-        state_fields = set(state.keys())
-        common_fields = state_fields.intersection(expected_fields)
-        
-        if not common_fields:
-            raise ValueError(f"Initial state must have at least one field from the schema. Expected fields: {list(expected_fields.keys())}")
+    def compile(self) -> CompiledGraph[StateSchema]:
+        """Validate the graph once and precompute the lookups used by run().
+
+        The result is cached until steps or transitions change, so calling it
+        again is free. run()/arun() compile on first use.
+
+        Raises:
+            ValueError: if there is not exactly one EntryPoint, a transition
+                points to an unknown step, a non-terminal step has no outgoing
+                transition, or a step cannot be reached from the entry point.
+        """
+        if self._compiled is not None:
+            return self._compiled
 
+        problems: List[str] = []
         entry_points = [s for s in self.steps.values() if isinstance(s, EntryPoint)]
         if not entry_points:
-            raise Exception("No EntryPoint step found in workflow")
+            problems.append("No EntryPoint step found in workflow")
         if len(entry_points) > 1:
-            raise Exception("Multiple EntryPoint steps found in workflow")
-        
+            problems.append("Multiple EntryPoint steps found in workflow")
+
+        for src_id, transitions in self.transitions.items():
+            if src_id not in self.steps:
+                problems.append(f"Transition source '{src_id}' is not a registered step")
+            for t in transitions:
+                for target in t.targets:
+                    if target not in self.steps:
+                        problems.append(f"Transition '{src_id}' -> '{target}' points to an unknown step")
+
+        for step_id, step in self.steps.items():
+            if not isinstance(step, Termination) and not self.transitions.get(step_id):
+                problems.append(f"Step '{step_id}' has no outgoing transitions")
+
+        descendants = {step_id: self._descendants(step_id) for step_id in self.steps}
+        if len(entry_points) == 1:
+            reachable = descendants[entry_points[0].step_id] | {entry_points[0].step_id}
+            for step_id in self.steps:
+                if step_id not in reachable:
+                    problems.append(f"Step '{step_id}' is not reachable from the entry point")
+
+        if problems:
+            details = "\n - ".join([""] + problems)
+            raise ValueError("Invalid workflow graph." + details)
+
+        self._compiled = CompiledGraph(
+            entry_id=entry_points[0].step_id,
+            fields=schema_fields(self.state_schema),
+            steps=dict(self.steps),
+            transitions={src: tuple(ts) for src, ts in self.transitions.items()},
+            descendants=descendants,
+        )
+        return self._compiled
+
+    def _descendants(self, step_id: str) -> FrozenSet[str]:
+        reachable: Set[str] = set()
+        pending = [step_id]
+        while pending:
+            for t in self.transitions.get(pending.pop(), []):
+                for target in t.targets:
+                    if target in self.steps and target not in reachable:
+                        reachable.add(target)
+                        pending.append(target)
+        return frozenset(reachable)
+
+    def _snapshot(self, run: Run[StateSchema], previous_state: StateSchema,
+                  state: StateSchema, update: Dict[str, Any], step_id: str,
+                  timing: Optional[StepTiming] = None) -> Snapshot[StateSchema]:
+        if self.deepcopy_snapshots:
+            # In-place mutations keep object identity, so diffing is not reliable:
+            # fall back to a standalone full copy of the state.
+            return Snapshot.create(copy.deepcopy(state), self.state_schema, step_id, timing=timing)
+        parent = run.last_snapshot
+        changes = None
+        if parent is not None:
+            # Every returned field counts as changed, even if it is the same
+            # object mutated in place, so checkpoints persist it
+            changes = {
+                key: value for key, value in state.items()
+                if key in update or key not in previous_state or previous_state[key] is not value
+            }
+        return Snapshot.create(state, self.state_schema, step_id, parent=parent,
+                               changes=changes, timing=timing)
+
+    def _cache_lookup(self, step: Step[StateSchema], state: StateSchema) -> Tuple[Optional[str], Any]:
+        if self.step_cache is None:
+            return None, MISSING
+        key = step.cache_key(state)
+        if key is None:
+            return None, MISSING
+        return key, self.step_cache.get(key, MISSING)
+
+    def _timed_execute(self, step: Step[StateSchema], state: StateSchema,
+                       resource: Resource = None, lane: int = 0) -> Tuple[Dict[str, Any], StepTiming]:
+        started_at = datetime.now()
+        started = time.perf_counter()
+        key, update = self._cache_lookup(step, state)
+        cached = update is not MISSING
+        if not cached:
+            update = step.execute(state, self.state_schema, resource)
+            if key is not None:
+                self.step_cache.set(key, update, ttl=step.cache_ttl)
+        duration = time.perf_counter() - started
+        return update, StepTiming(started_at, datetime.now(), duration, lane, cached)
+
+    async def _atimed_execute(self, step: Step[StateSchema], state: StateSchema,
+                              resource: Resource = None, lane: int = 0) -> Tuple[Dict[str, Any], StepTiming]:
+        started_at = datetime.now()
+        started = time.perf_counter()
+        key, update = self._cache_lookup(step, state)
+        cached = update is not MISSING
+        if not cached:
+            update = await step.aexecute(state, self.state_schema, resource)
+            if key is not None:
+                self.step_cache.set(key, update, ttl=step.cache_ttl)
+        duration = time.perf_counter() - started
+        return update, StepTiming(started_at, datetime.now(), duration, lane, cached)
+
+    def _execute_steps(self, steps: List[Step[StateSchema]], state: StateSchema,
+                       resource: Resource = None) -> List[Tuple[Dict[str, Any], StepTiming]]:
+        """Execute sibling steps against the same state, concurrently if more than one"""
+        if len(steps) == 1:
+            return [self._timed_execute(steps[0], state, resource)]
+
+        workers = max(1, min(self.max_workers, len(steps)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="state-machine") as pool:
+            futures = [
+                pool.submit(self._timed_execute, step, state, resource, lane)
+                for lane, step in enumerate(steps)
+            ]
+            return [future.result() for future in futures]
+
+    def _apply_update(self, state: StateSchema, update: Dict[str, Any]) -> StateSchema:
+        updated = {**state}
+        for key, value in update.items():
+            reducer = self.reducers.get(key)
+            if reducer is not None and key in updated:
+                updated[key] = reducer(updated[key], value)
+            else:
+                updated[key] = value
+        return cast(StateSchema, updated)
+
+    def _start(self, state: StateSchema) -> str:
+        """Validate the initial state against the compiled graph, returning the entry step id"""
+        graph = self.compile()
+        # Validate that state has at least one field from the schema
+        if graph.fields.isdisjoint(state.keys()):
+            raise ValueError(f"Initial state must have at least one field from the schema. Expected fields: {sorted(graph.fields)}")
+        return graph.entry_id
+
+    def _join(self, frontier: List[str]) -> Tuple[List[str], List[str]]:
+        """Split the frontier into steps that run now and steps that wait.
+
+        A step waits while another pending branch can still reach it, so a
+        fan-in step runs once, after all of its live incoming branches.
+        """
+        graph = self.compile()
+        waiting = [
+            step_id for step_id in frontier
+            if any(step_id in graph.descendants[other] for other in frontier if other != step_id)
+        ]
+        if all(step_id in waiting or isinstance(graph.steps[step_id], Termination) for step_id in frontier):
+            # Pending steps that reach each other (a cycle): run them all
+            return frontier, []
+        return [step_id for step_id in frontier if step_id not in waiting], waiting
+
+    def _split_frontier(self, run: Run[StateSchema], frontier: List[str]) -> List[Step[StateSchema]]:
+        """Return the non-terminal steps of the frontier (empty when the run should stop)"""
+        graph = self.compile()
+        steps = [graph.steps[step_id] for step_id in frontier]
+        active = [s for s in steps if not isinstance(s, Termination)]
+        if not active:
+            if self.observers:
+                self._emit("on_termination", run, steps[0].step_id)
+        elif self.observers:
+            for step in active:
+                self._emit("on_step_start", run, step.step_id)
+        return active
+
+    def _record_updates(self, run: Run[StateSchema], state: StateSchema,
+                        steps: List[Step[StateSchema]],
+                        results: List[Tuple[Dict[str, Any], StepTiming]]) -> StateSchema:
+        """Merge step updates into the state and snapshot each step"""
+        for step, (update, timing) in zip(steps, results):
+            # Replace state entirely
+            previous_state = state
+            state = self._apply_update(state, update)
+
+            # Create and add snapshot to the current run, sharing unchanged fields
+            snapshot = self._snapshot(run, previous_state, state, update, step.step_id, timing)
+            run.add_snapshot(snapshot)
+            if self.observers:
+                self._emit("on_step_end", run, snapshot)
+        return state
+
+    def _extend_frontier(self, run: Run[StateSchema], step: Step[StateSchema],
+                         targets: List[str], next_steps: List[str]):
+        if not targets:
+            raise Exception(f"[StateMachine] No transitions found from step: {step.step_id}")
+        if self.observers:
+            self._emit("on_transition", run, step.step_id, targets)
+        next_steps += targets
+
+    def _checkpoint(self, run: Run[StateSchema], step_count: int, next_steps: List[str]):
+        if self.checkpointer is not None:
+            self.checkpointer.save(run, run.snapshots[-step_count:], next_steps)
+        # Retention runs after checkpointing so the durable store keeps every step
+        self.snapshot_retention.apply(run, step_count)
+
+    def _finish(self, run: Run[StateSchema]) -> Run[StateSchema]:
+        run.complete()
+        if self.checkpointer is not None:
+            self.checkpointer.complete(run)
+        if self.observers:
+            self._emit("on_run_end", run)
+        return run
+
+    def _drive(self, run: Run[StateSchema], state: StateSchema, frontier: List[str],
+               resource: Resource = None) -> Run[StateSchema]:
+        transitions = self.compile().transitions
+        if self.observers:
+            self._emit("on_run_start", run, state)
+        try:
+            # Steps are executed in supersteps: every ready step in the frontier sees
+            # the same state, and their updates are merged before transitions resolve.
+            # Steps still reachable from another pending branch wait for it (join).
+            while frontier:
+                ready, waiting = self._join(frontier)
+                active = self._split_frontier(run, ready)
+                if not active:
+                    break
+
+                results = self._execute_steps(active, state, resource)
+                state = self._record_updates(run, state, active, results)
+
+                next_steps: List[str] = []
+                for step in active:
+                    targets: List[str] = []
+                    for t in transitions.get(step.step_id, ()):
+                        targets += t.resolve(state)
+                    self._extend_frontier(run, step, targets, next_steps)
+
+                # Branches that converge on the same step join there (fan-in)
+                frontier = list(dict.fromkeys(waiting + next_steps))
+                self._checkpoint(run, len(active), frontier)
+        except Exception as error:
+            if self.checkpointer is not None:
+                self.checkpointer.abort(run)
+            if self.observers:
+                self._emit("on_run_error", run, error)
+            raise
+
+        return self._finish(run)
+
+    async def _adrive(self, run: Run[StateSchema], state: StateSchema, frontier: List[str],
+                      resource: Resource = None) -> Run[StateSchema]:
+        transitions = self.compile().transitions
+        if self.observers:
+            self._emit("on_run_start", run, state)
+        try:
+            while frontier:
+                ready, waiting = self._join(frontier)
+                active = self._split_frontier(run, ready)
+                if not active:
+                    break
+
+                results = await asyncio.gather(*[
+                    self._atimed_execute(step, state, resource, lane) for lane, step in enumerate(active)
+                ])
+                state = self._record_updates(run, state, active, list(results))
+
+                next_steps: List[str] = []
+                for step in active:
+                    targets: List[str] = []
+                    for t in transitions.get(step.step_id, ()):
+                        targets += await t.aresolve(state)
+                    self._extend_frontier(run, step, targets, next_steps)
+
+                # Branches that converge on the same step join there (fan-in)
+                frontier = list(dict.fromkeys(waiting + next_steps))
+                self._checkpoint(run, len(active), frontier)
+        except Exception as error:
+            if self.checkpointer is not None:
+                self.checkpointer.abort(run)
+            if self.observers:
+                self._emit("on_run_error", run, error)
+            raise
+
+        return self._finish(run)
+
+    def run(self, state: StateSchema, resource: Resource = None):
+        entry_id = self._start(state)
+
         # Create a new run for this execution
         current_run = Run.create()
-        
-        current_step_id = entry_points[0].step_id        
-
-        while current_step_id:
-            step = self.steps[current_step_id]
-            if isinstance(step, Termination):
-                print(f"[StateMachine] Terminating: {current_step_id}")
-                break
-            
-            # Replace state entirely
-            state = step.run(state, self.state_schema, resource)  
+        return self._drive(current_run, state, [entry_id], resource)
 
-            if isinstance(step, EntryPoint):
-                print(f"[StateMachine] Starting: {current_step_id}")
-            else:
-                print(f"[StateMachine] Executing step: {current_step_id}")
+    async def arun(self, state: StateSchema, resource: Resource = None):
+        """Async version of run().
+
+        ``async def`` step logic and transition conditions are awaited on the
+        running event loop; sync step logic runs in a worker thread so it does
+        not block other runs sharing the loop.
+        """
+        entry_id = self._start(state)
+
+        # Create a new run for this execution
+        current_run = Run.create()
+        return await self._adrive(current_run, state, [entry_id], resource)
 
-            # Create and add snapshot to the current run
-            snapshot = Snapshot.create(copy.deepcopy(state), self.state_schema, current_step_id)
-            current_run.add_snapshot(snapshot)
+    def _run_item(self, index: int, state: StateSchema, resource: Resource = None) -> BatchItem[StateSchema]:
+        item = BatchItem[StateSchema](index)
+        try:
+            entry_id = self._start(state)
+            item.run = Run.create()
+            self._drive(item.run, state, [entry_id], resource)
+        except Exception as error:
+            item.error = error
+        return item
 
-            transitions = self.transitions.get(current_step_id, [])
-            next_steps: List[str] = []
+    async def _arun_item(self, index: int, state: StateSchema, resource: Resource,
+                         semaphore: asyncio.Semaphore) -> BatchItem[StateSchema]:
+        item = BatchItem[StateSchema](index)
+        async with semaphore:
+            try:
+                entry_id = self._start(state)
+                item.run = Run.create()
+                await self._adrive(item.run, state, [entry_id], resource)
+            except Exception as error:
+                item.error = error
+        return item
 
-            for t in transitions:
-                next_steps += t.resolve(state)
+    def run_many(self, states: List[StateSchema], resource: Resource = None,
+                 max_concurrency: int = 8) -> BatchResult[StateSchema]:
+        """Run many initial states concurrently on a bounded thread pool.
+
+        A failing item does not abort the batch: its error (and the partial
+        run, if it got that far) is recorded on its BatchItem. The same
+        ``resource`` is shared by every run, so the objects it holds (LLM
+        clients, vector stores, ...) must be safe to use from several threads.
+
+        Args:
+            states: Initial states, one per run
+            resource: Resource passed to every run
+            max_concurrency: Maximum number of runs executing at once
+
+        Returns:
+            BatchResult: One item per input state, in input order
+
+        Raises:
+            ValueError: if the graph itself is invalid (checked once, up front)
+
+        Example:
+            >>> batch = machine.run_many([{"question": q} for q in questions], resource)
+            >>> answers = [run.get_final_state()["answer"] for run in batch.runs if run]
+        """
+        self.compile()
+        states = list(states)
+        if not states:
+            return BatchResult[StateSchema]([])
+        if len(states) == 1 or max_concurrency <= 1:
+            return BatchResult[StateSchema]([
+                self._run_item(index, state, resource) for index, state in enumerate(states)
+            ])
+
+        workers = min(max_concurrency, len(states))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="state-machine-batch") as pool:
+            futures = [
+                pool.submit(self._run_item, index, state, resource)
+                for index, state in enumerate(states)
+            ]
+            return BatchResult[StateSchema]([future.result() for future in futures])
+
+    async def arun_many(self, states: List[StateSchema], resource: Resource = None,
+                        max_concurrency: int = 8) -> BatchResult[StateSchema]:
+        """Async version of run_many(); runs share the event loop, bounded by a semaphore"""
+        self.compile()
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        items = await asyncio.gather(*[
+            self._arun_item(index, state, resource, semaphore) for index, state in enumerate(states)
+        ])
+        return BatchResult[StateSchema](list(items))
+
+    def _require_checkpointer(self) -> Checkpointer:
+        if self.checkpointer is None:
+            raise ValueError("StateMachine has no checkpointer configured")
+        return self.checkpointer
+
+    def _restore(self, run: Run[StateSchema], records: List[SnapshotRecord]) -> Run[StateSchema]:
+        """Rebuild snapshots from stored records, re-linking the shared-state chain"""
+        for record in records:
+            run.add_snapshot(Snapshot(
+                snapshot_id=record.snapshot_id,
+                timestamp=record.timestamp,
+                changes=record.changes,
+                state_schema=self.state_schema,
+                step_id=record.step_id,
+                parent=run.last_snapshot if record.has_parent else None,
+                timing=record.timing,
+            ))
+            # Trim as records load so restoring a long run stays bounded too
+            self.snapshot_retention.apply(run)
+        return run
+
+    def resume(self, run_id: str, resource: Resource = None) -> Run[StateSchema]:
+        """Continue a checkpointed run from its last stored snapshot.
+
+        Steps that already finished are not executed again. A run that had
+        already completed is returned as stored.
+        """
+        checkpointer = self._require_checkpointer()
+        header = checkpointer.load_run(run_id)
+        records = checkpointer.load_snapshots(run_id)
+        if header is None or not records:
+            raise ValueError(f"No checkpointed snapshots found for run '{run_id}'")
+
+        run = self._restore(Run(run_id=header.run_id, start_timestamp=header.start_timestamp), records)
+        if header.end_timestamp is not None:
+            run.end_timestamp = header.end_timestamp
+            return run
+        return self._drive(run, run.get_final_state(), records[-1].next_steps, resource)
 
-            if not next_steps:
-                raise Exception(f"[StateMachine] No transitions found from step: {current_step_id}")
+    def fork(self, snapshot_id: str, resource: Resource = None) -> Run[StateSchema]:
+        """Start a new run from a stored snapshot.
 
-            if len(next_steps) > 1:
-                raise NotImplementedError("Parallel execution not implemented yet.")
+        The new run shares the history up to that snapshot (without re-running
+        it) and continues with the steps that were scheduled after it.
 
-            current_step_id = next_steps[0]
+        Raises:
+            ValueError: if the snapshot is unknown, or is not the last of the
+                steps that ran in parallel with it (their updates follow it)
+        """
+        checkpointer = self._require_checkpointer()
+        origin = checkpointer.find_snapshot(snapshot_id)
+        if origin is None:
+            raise ValueError(f"Snapshot '{snapshot_id}' not found in checkpointer")
+        if origin.next_steps is None:
+            # Forking here would continue without its siblings' updates
+            raise ValueError(f"Snapshot '{snapshot_id}' is not the last of its parallel steps; "
+                             "fork from the last snapshot of that superstep instead")
 
-        current_run.complete()
-        return current_run
+        history = [r for r in checkpointer.load_snapshots(origin.run_id) if r.seq <= origin.seq]
+        run = Run.create()
+        checkpointer.copy_run(origin.run_id, origin.seq, run.run_id, run.start_timestamp)
+        self._restore(run, history)
+        return self._drive(run, run.get_final_state(), origin.next_steps, resource)
@@ -1,28 +1,183 @@
+import asyncio
+import hashlib
 import inspect
 import json
 import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import (
-    Any, Callable, 
+    Any, Callable, Dict, List,
     Literal, Optional, Union, TypeAlias,
     get_type_hints, get_origin, get_args,
 )
-from functools import wraps
+from dataclasses import dataclass
+from functools import cached_property, lru_cache, wraps
 from openai.types.chat.chat_completion_message_tool_call import ChatCompletionMessageToolCall
+from pydantic import ConfigDict, TypeAdapter, ValidationError
+from typing_extensions import NotRequired, TypedDict
 import tiktoken
 
+from lib.caching import MISSING, CacheStats, LRUCache
+from lib.sandbox import ExecutionMode, process_target, register_module, run_in_process
+
 
 # Type alias for OpenAI's tool call implementation
 ToolCall: TypeAlias = ChatCompletionMessageToolCall
 
+
+def _infer_json_schema_type(typ: Any) -> dict:
+    """JSON schema for a type hint (memoized; the result must not be mutated)"""
+    try:
+        return _cached_json_schema(typ)
+    except TypeError:  # unhashable hint
+        return _build_json_schema(typ)
+
+
+@lru_cache(maxsize=None)
+def _cached_json_schema(typ: Any) -> dict:
+    return _build_json_schema(typ)
+
+
+def _build_json_schema(typ: Any) -> dict:
+    origin = get_origin(typ)
+
+    # Handle Literal (enums)
+    if origin is Literal:
+        return {
+            "type": "string",
+            "enum": list(get_args(typ))
+        }
+
+    # Handle Optional[T]
+    if origin is Union:
+        args = get_args(typ)
+        non_none = [arg for arg in args if arg is not type(None)]
+        if len(non_none) == 1:
+            return _infer_json_schema_type(non_none[0])
+        return {"type": "string"}  # fallback
+
+    # Handle collections
+    if origin is list:
+        return {
+            "type": "array",
+            "items": _infer_json_schema_type(get_args(typ)[0] if get_args(typ) else str)
+        }
+
+    if origin is dict:
+        return {
+            "type": "object",
+            "additionalProperties": _infer_json_schema_type(get_args(typ)[1] if get_args(typ) else str)
+        }
+
+    # Handle TypedDict-like classes (have __annotations__)
+    if inspect.isclass(typ) and hasattr(typ, "__annotations__"):
+        props = {}
+        annotations = getattr(typ, "__annotations__", {})
+        for field_name, field_type in annotations.items():
+            props[field_name] = _infer_json_schema_type(field_type)
+        return {
+            "type": "object",
+            "properties": props,
+        }
+
+    # Primitive mappings
+    mapping = {
+        str: "string",
+        int: "integer",
+        float: "number",
+        bool: "boolean",
+        datetime.date: "string",
+        datetime.datetime: "string",
+    }
+
+    return {"type": mapping.get(typ, "string")}
+
+
+@lru_cache(maxsize=None)
+def _return_schema_suffix(ret_type: Any) -> str:
+    """Description suffix documenting a return type's JSON schema ("" if none)"""
+    try:
+        schema = _infer_json_schema_type(ret_type)
+    except Exception:
+        return ""
+    return "\n\nReturns schema:\n" + json.dumps(schema, indent=2, ensure_ascii=False)
+
+
+@dataclass(frozen=True)
+class ToolSpec:
+    """A tool's OpenAI function spec, compiled once and reused by every payload.
+
+    ``spec`` is sent as-is on each request and must not be mutated;
+    ``serialized`` is its JSON encoding, which also keys the token memo.
+    """
+    name: str
+    spec: Dict[str, Any]
+    serialized: bytes
+
+    @classmethod
+    def compile(cls, spec: Dict[str, Any]) -> 'ToolSpec':
+        return cls(spec["function"]["name"], spec, json.dumps(spec, ensure_ascii=False).encode("utf-8"))
+
+    @cached_property
+    def tokens(self) -> int:
+        """Estimated tokens this spec adds to a payload (computed on first use)"""
+        return _default_token_counter.count_text(self.serialized.decode("utf-8"))
+
+
+class ToolArgumentError(ValueError):
+    """Tool call arguments that are not valid JSON or do not match the tool's signature"""
+
+    def __init__(self, tool_name: str, problems: List[Dict[str, str]]):
+        self.tool_name = tool_name
+        self.problems = problems
+        details = "\n - ".join([""] + [f"{p['field']}: {p['problem']}" for p in problems])
+        super().__init__(f"Invalid arguments for tool '{tool_name}'." + details)
+
+    def result(self) -> Dict[str, Any]:
+        """Compact error returned to the model as the tool result, so it can retry the call"""
+        return {"status": "error", "error": f"Invalid arguments for tool '{self.tool_name}'",
+                "problems": self.problems}
+
+
 class Tool:
     def __init__(
         self,
         func: Callable,
         name: Optional[str] = None,
-        description: Optional[str] = None
+        description: Optional[str] = None,
+        timeout: Optional[float] = None,
+        cacheable: bool = False,
+        ttl: Optional[float] = None,
+        mode: ExecutionMode = "thread",
+        memory_limit_mb: Optional[int] = None
     ):
         self.func = func
         self.name = name or func.__name__
+        # Seconds an Agent waits for this tool (None = the agent's default)
+        self.timeout = timeout
+        # Where an Agent runs the tool: "inline" on the agent's thread (no
+        # timeout), "thread" in its worker pool (the default) or "process" in
+        # a killable worker process, for CPU-heavy tools. Only process mode
+        # enforces memory_limit_mb and actually stops a timed-out call.
+        if mode not in ("inline", "thread", "process"):
+            raise ValueError(f"Tool '{self.name}': unknown execution mode '{mode}'")
+        if memory_limit_mb is not None and mode != "process":
+            raise ValueError(f"Tool '{self.name}': memory_limit_mb requires mode='process'")
+        if mode == "process":
+            if process_target(func):
+                raise ValueError(f"Tool '{self.name}' cannot use mode='process': {process_target(func)}")
+            register_module(func.__module__)
+        self.mode = mode
+        self.memory_limit_mb = memory_limit_mb
+        # Results may be reused across runs through an Agent's tool_cache.
+        # Only mark tools whose result depends on their arguments alone.
+        self.cacheable = cacheable
+        self.ttl = ttl
+        self.is_async = inspect.iscoroutinefunction(func)
+        # Compiled function spec, built on first use (see spec)
+        self._spec: Optional[ToolSpec] = None
+        # Argument validator, built on first use (see validate_arguments)
+        self._validator: Optional[TypeAdapter] = None
         self.description = description or inspect.getdoc(func)
         self.signature = inspect.signature(func, eval_str=True)
         self.type_hints = get_type_hints(func)
@@ -33,10 +188,9 @@ class Tool:
         ]
 
         # Append return JSON schema (derived from type hints) to description for the model
-        ret_schema = self._build_return_schema()
-        if ret_schema:
-            ret_schema_str = json.dumps(ret_schema, indent=2, ensure_ascii=False)
-            suffix = "\n\nReturns schema:\n" + ret_schema_str
+        ret_type = self.type_hints.get('return')
+        suffix = self._return_schema_suffix(ret_type) if ret_type else ""
+        if suffix:
             self.description = (self.description + suffix) if self.description else suffix
 
     def _build_param_schema(self, name: str, param: inspect.Parameter):
@@ -49,69 +203,16 @@ class Tool:
         }
 
     def _infer_json_schema_type(self, typ: Any) -> dict:
-        origin = get_origin(typ)
-
-        # Handle Literal (enums)
-        if origin is Literal:
-            return {
-                "type": "string",
-                "enum": list(get_args(typ))
-            }
-
-        # Handle Optional[T]
-        if origin is Union:
-            args = get_args(typ)
-            non_none = [arg for arg in args if arg is not type(None)]
-            if len(non_none) == 1:
-                return self._infer_json_schema_type(non_none[0])
-            return {"type": "string"}  # fallback
-
-        # Handle collections
-        if origin is list:
-            return {
-                "type": "array",
-                "items": self._infer_json_schema_type(get_args(typ)[0] if get_args(typ) else str)
-            }
+        return _infer_json_schema_type(typ)
 
-        if origin is dict:
-            return {
-                "type": "object",
-                "additionalProperties": self._infer_json_schema_type(get_args(typ)[1] if get_args(typ) else str)
-            }
-
-        # Handle TypedDict-like classes (have __annotations__)
-        if inspect.isclass(typ) and hasattr(typ, "__annotations__"):
-            props = {}
-            annotations = getattr(typ, "__annotations__", {})
-            for field_name, field_type in annotations.items():
-                props[field_name] = self._infer_json_schema_type(field_type)
-            return {
-                "type": "object",
-                "properties": props,
-            }
-
-        # Primitive mappings
-        mapping = {
-            str: "string",
-            int: "integer",
-            float: "number",
-            bool: "boolean",
-            datetime.date: "string",
-            datetime.datetime: "string",
-        }
-
-        return {"type": mapping.get(typ, "string")}
-
-    def _build_return_schema(self) -> Optional[dict]:
-        ret_type = self.type_hints.get('return')
-        if not ret_type:
-            return None
+    @staticmethod
+    def _return_schema_suffix(ret_type: Any) -> str:
         try:
-            return self._infer_json_schema_type(ret_type)
-        except Exception:
-            return None
+            return _return_schema_suffix(ret_type)
+        except TypeError:  # unhashable hint
+            return _return_schema_suffix.__wrapped__(ret_type)
 
-    def dict(self) -> dict:
+    def _build_spec(self) -> dict:
         return {
             "type": "function",
             "function": {
@@ -131,9 +232,115 @@ class Tool:
             }
         }
 
+    @property
+    def spec(self) -> ToolSpec:
+        """The compiled function spec; built once, so set name/description/parameters before first use"""
+        if self._spec is None:
+            self._spec = ToolSpec.compile(self._build_spec())
+        return self._spec
+
+    def dict(self) -> dict:
+        """OpenAI function spec (shared; do not mutate)"""
+        return self.spec.spec
+
+    def token_estimate(self) -> int:
+        """Estimated tokens this tool's spec adds to a payload (cached)"""
+        return self.spec.tokens
+
+    def _build_validator(self) -> TypeAdapter:
+        """TypeAdapter over a TypedDict of the parameters (unannotated ones accept Any)"""
+        fields = {}
+        for key, param in self.signature.parameters.items():
+            if param.kind in (inspect.Parameter.VAR_KEYWORD, inspect.Parameter.VAR_POSITIONAL):
+                continue
+            annotation = self.type_hints.get(key, Any)
+            fields[key] = annotation if param.default is inspect.Parameter.empty else NotRequired[annotation]
+        arguments = TypedDict(f"{self.name}_arguments", fields)
+        # The config also applies to nested TypedDicts, whose extra keys (e.g.
+        # a search result's "favicon") pass through; unknown top-level keys
+        # are rejected in validate_arguments
+        arguments.__pydantic_config__ = ConfigDict(extra="allow", arbitrary_types_allowed=True)
+        return TypeAdapter(arguments)
+
+    def _unknown_arguments(self, arguments: Any) -> List[str]:
+        """Top-level keys that match no parameter (none if the tool takes **kwargs)"""
+        parameters = self.signature.parameters
+        if not isinstance(arguments, dict) or any(
+                param.kind is inspect.Parameter.VAR_KEYWORD for param in parameters.values()):
+            return []
+        return [key for key in arguments if key not in parameters
+                or parameters[key].kind is inspect.Parameter.VAR_POSITIONAL]
+
+    @property
+    def validator(self) -> TypeAdapter:
+        if self._validator is None:
+            self._validator = self._build_validator()
+        return self._validator
+
+    def validate_arguments(self, arguments: Any) -> Dict[str, Any]:
+        """Validate and coerce call arguments (a JSON string or a dict).
+
+        Returns:
+            The arguments converted to the parameters' types (e.g. "3" -> 3)
+
+        Raises:
+            ToolArgumentError: if the JSON is malformed or the arguments do not
+                match the signature (missing, unexpected or mistyped fields)
+        """
+        if isinstance(arguments, (str, bytes)):
+            try:
+                arguments = json.loads(arguments or "{}")
+            except json.JSONDecodeError as e:
+                raise ToolArgumentError(self.name, [{"field": "arguments", "problem": f"Invalid JSON: {e.msg}"}])
+        problems = []
+        try:
+            validated = self.validator.validate_python(arguments)
+        except ValidationError as e:
+            problems = [
+                {"field": ".".join(str(part) for part in error["loc"]) or "arguments", "problem": error["msg"]}
+                for error in e.errors(include_url=False)
+            ]
+        problems += [{"field": key, "problem": "Extra inputs are not permitted"}
+                     for key in self._unknown_arguments(arguments)]
+        if problems:
+            raise ToolArgumentError(self.name, problems)
+        return validated
+
+    def execute(self, arguments: Dict[str, Any], timeout: Optional[float] = None) -> Any:
+        """Call the tool according to its execution mode.
+
+        Process mode runs it in a fresh worker that is killed after ``timeout``
+        seconds or when it exceeds memory_limit_mb; other modes call it directly
+        and leave timeouts to the caller.
+
+        Raises:
+            ToolTimeoutError: (process mode) if the call did not finish in time
+            ToolMemoryError: (process mode) if the call hit the memory limit
+        """
+        if self.mode == "process":
+            return run_in_process(self.func.__module__, self.func.__qualname__, arguments,
+                                  timeout=timeout, memory_limit_mb=self.memory_limit_mb)
+        return self(**arguments)
+
     def __call__(self, *args, **kwargs):
+        if self.is_async:
+            # Sync callers (e.g. Agent.invoke's worker threads) get the awaited result
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                return asyncio.run(self.func(*args, **kwargs))
+            # asyncio.run refuses to nest inside a running loop (e.g. Jupyter), so
+            # give the call its own loop on a worker thread
+            with ThreadPoolExecutor(max_workers=1, thread_name_prefix="tool-async") as pool:
+                return pool.submit(asyncio.run, self.func(*args, **kwargs)).result()
         return self.func(*args, **kwargs)
 
+    async def acall(self, *args, **kwargs):
+        """Await async tools; run sync tools in the default executor"""
+        if self.is_async:
+            return await self.func(*args, **kwargs)
+        return await asyncio.to_thread(self.func, *args, **kwargs)
+
     def __repr__(self):
         return f"<Tool name={self.name} params={[p['name'] for p in self.parameters]}>"
 
@@ -143,12 +350,15 @@ class Tool:
 
 
 
-def tool(func=None, *, name: str = None, description: str = None):
+def tool(func=None, *, name: str = None, description: str = None, timeout: float = None,
+         cacheable: bool = False, ttl: float = None, mode: ExecutionMode = "thread",
+         memory_limit_mb: int = None):
     def wrapper(f):
         @wraps(f)
         def wrapped(*args, **kwargs):
             return f(*args, **kwargs)
-        return Tool(f, name=name, description=description)
+        return Tool(f, name=name, description=description, timeout=timeout,
+                    cacheable=cacheable, ttl=ttl, mode=mode, memory_limit_mb=memory_limit_mb)
     
     # @tool ou @tool(name="foo")
     return wrapper(func) if func else wrapper
@@ -156,34 +366,185 @@ def tool(func=None, *, name: str = None, description: str = None):
 
 # =================== Token utilities ===================
 
+def _sanitize_for_tokens(obj: Any) -> Any:
+    # Drop non-serializable fields (e.g., tool_calls) and coerce unknowns to str
+    if obj is None or isinstance(obj, (str, int, float, bool)):
+        return obj
+    if isinstance(obj, dict):
+        return {k: _sanitize_for_tokens(v) for k, v in obj.items() if k != "tool_calls"}
+    if isinstance(obj, list):
+        return [_sanitize_for_tokens(v) for v in obj]
+    try:
+        json.dumps(obj)
+        return obj
+    except Exception:
+        return str(obj)
+
+
+# Approximate tokens of the {"tools": [...]} wrapper and of each separator between specs
+TOOLS_WRAPPER_TOKENS = 4
+TOOL_SEPARATOR_TOKENS = 1
+# Same for the {"messages": [...]} wrapper
+MESSAGES_WRAPPER_TOKENS = 4
+MESSAGE_SEPARATOR_TOKENS = 1
+
+
+class TokenCounter:
+    """Token estimates with the encoder loaded once and counts memoized per message.
+
+    A chat history is re-sent on every call but only its newest messages
+    change, so each message's count is cached under a hash of its JSON form.
+    Estimating a long history then costs a dump and a hash per message, and
+    only unseen messages are encoded.
+
+    Example:
+        >>> counter = TokenCounter()
+        >>> counter.count_payload(payload["messages"], payload.get("tools"))
+        >>> counter.count_payloads([payload_a, payload_b])  # one encode_batch call
+    """
+
+    def __init__(self, encoding_name: str = "o200k_base", maxsize: int = 8192, encoding: Any = None):
+        """
+        Args:
+            encoding_name: tiktoken encoding to use
+            maxsize: Maximum number of memoized message/spec counts
+            encoding: Ready-made encoding (anything with encode/encode_batch)
+                used instead of loading ``encoding_name``, e.g. where the
+                tiktoken files cannot be downloaded
+        """
+        self.encoding_name = encoding_name
+        self._encoding = encoding
+        self._lock = threading.Lock()
+        self._counts = LRUCache(maxsize=maxsize)
+
+    def __str__(self) -> str:
+        return f"TokenCounter('{self.encoding_name}', cached={self._counts.stats.size})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+    @property
+    def encoding(self):
+        """The tiktoken encoding, loaded on first use"""
+        if self._encoding is None:
+            with self._lock:
+                if self._encoding is None:
+                    self._encoding = tiktoken.get_encoding(self.encoding_name)
+        return self._encoding
+
+    @property
+    def stats(self) -> CacheStats:
+        """Hit/miss counters of the per-message memo"""
+        return self._counts.stats
+
+    @staticmethod
+    def _text(obj: Any) -> str:
+        return json.dumps(_sanitize_for_tokens(obj), ensure_ascii=False)
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def count(self, obj: Any) -> int:
+        """Tokens of one message or tool spec (memoized by content)"""
+        return self.count_text(self._text(obj))
+
+    def count_text(self, text: str) -> int:
+        """Tokens of an already-serialized message or spec (memoized)"""
+        key = self._key(text)
+        tokens = self._counts.get(key, MISSING)
+        if tokens is MISSING:
+            tokens = len(self.encoding.encode(text))
+            self._counts.set(key, tokens)
+        return tokens
+
+    def count_many(self, objs: List[Any]) -> List[int]:
+        """Tokens of each message or spec; unseen ones are encoded in one encode_batch call"""
+        texts = [self._text(obj) for obj in objs]
+        keys = [self._key(text) for text in texts]
+        counts = [self._counts.get(key, MISSING) for key in keys]
+        missing = {}
+        for key, text, tokens in zip(keys, texts, counts):
+            if tokens is MISSING:
+                missing.setdefault(key, text)
+        if missing:
+            encoded = self.encoding.encode_batch(list(missing.values()))
+            for key, tokens in zip(missing, encoded):
+                self._counts.set(key, len(tokens))
+                missing[key] = len(tokens)
+            counts = [missing[key] if tokens is MISSING else tokens for key, tokens in zip(keys, counts)]
+        return counts
+
+    @staticmethod
+    def _wrap(message_counts: List[int], tool_counts: List[int]) -> int:
+        total = 0
+        if message_counts:
+            total += MESSAGES_WRAPPER_TOKENS + sum(message_counts) + MESSAGE_SEPARATOR_TOKENS * (len(message_counts) - 1)
+        if tool_counts:
+            total += TOOLS_WRAPPER_TOKENS + sum(tool_counts) + TOOL_SEPARATOR_TOKENS * (len(tool_counts) - 1)
+        return total
+
+    def count_payload(self, messages: List[dict], tools: Optional[List[dict]] = None) -> int:
+        """Estimated input tokens of a chat request (messages + tools)"""
+        return self._wrap([self.count(m) for m in messages], [self.count(t) for t in tools or []])
+
+    def count_payloads(self, payloads: List[Dict[str, Any]]) -> List[int]:
+        """Estimate many chat requests (dicts with "messages" and optional "tools") at once"""
+        items = []
+        for payload in payloads:
+            items.extend(payload["messages"])
+            items.extend(payload.get("tools") or [])
+        counts = self.count_many(items)
+        totals, position = [], 0
+        for payload in payloads:
+            n_messages, n_tools = len(payload["messages"]), len(payload.get("tools") or [])
+            message_counts = counts[position:position + n_messages]
+            tool_counts = counts[position + n_messages:position + n_messages + n_tools]
+            totals.append(self._wrap(message_counts, tool_counts))
+            position += n_messages + n_tools
+        return totals
+
+    def clear(self):
+        self._counts.clear()
+
+
+_default_token_counter = TokenCounter()
+
+
+def get_default_token_counter() -> TokenCounter:
+    """The process-wide TokenCounter used by the estimate_* helpers"""
+    return _default_token_counter
+
+
+def set_default_token_counter(counter: TokenCounter):
+    """Replace the process-wide TokenCounter (e.g. to use another encoding)"""
+    global _default_token_counter
+    _default_token_counter = counter
+
+
+def estimate_tokens_for_message(message: dict) -> int:
+    """Estimate the tokens one chat message contributes to a payload (o200k_base)"""
+    return _default_token_counter.count(message)
+
+
+def estimate_tokens_for_tool(spec: dict) -> int:
+    """Estimate the tokens one tool spec contributes to a payload (o200k_base)"""
+    return _default_token_counter.count(spec)
+
+
 def estimate_tokens_for_payload(messages: list[dict], tools: list[dict] | None = None) -> int:
     """Estimate token count for gpt-4o-mini payload (messages + tools).
 
     Uses tiktoken o200k_base to approximate the input tokens. This is an estimate,
-    not an exact server-side count.
+    not an exact server-side count. Per-message counts are memoized, so only
+    messages not seen before are encoded.
     """
-    enc = tiktoken.get_encoding("o200k_base")
-
-    def _sanitize(obj: Any) -> Any:
-        # Drop non-serializable fields (e.g., tool_calls) and coerce unknowns to str
-        if isinstance(obj, dict):
-            return {k: _sanitize(v) for k, v in obj.items() if k != "tool_calls"}
-        if isinstance(obj, list):
-            return [_sanitize(v) for v in obj]
-        try:
-            json.dumps(obj)
-            return obj
-        except Exception:
-            return str(obj)
-
-    def _tok_len(obj: dict) -> int:
-        sanitized = _sanitize(obj)
-        return len(enc.encode(json.dumps(sanitized, ensure_ascii=False)))
-
-    total = _tok_len({"messages": messages})
-    if tools:
-        total += _tok_len({"tools": tools})
-    return total
+    return _default_token_counter.count_payload(messages, tools)
+
+
+def estimate_tokens_for_payloads(payloads: list[dict]) -> list[int]:
+    """Batch estimate_tokens_for_payload() for chat request dicts (see TokenCounter.count_payloads)"""
+    return _default_token_counter.count_payloads(payloads)
 
 
 class ModelConfig:
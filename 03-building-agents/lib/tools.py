@@ -1,14 +1,18 @@
 from __future__ import annotations
 
 import os
-from typing import TypedDict, List, Dict, Optional, Literal
+from typing import TYPE_CHECKING, TypedDict, List, Dict, Optional, Literal
 
-import requests
-from tavily import TavilyClient
 from datetime import datetime
 
 from .tooling import tool, Tool
 
+# requests and tavily are imported by the tools that use them, so importing
+# this module (e.g. into compare_sources' worker processes) stays cheap
+if TYPE_CHECKING:
+    from tavily import TavilyClient
+
+
 class GOTCharacter(TypedDict):
     name: str
     slug: str
@@ -136,6 +140,8 @@ def _get_tavily_client() -> TavilyClient:
     api_key = os.getenv("TAVILY_API_KEY")
     if not api_key:
         raise RuntimeError("TAVILY_API_KEY is not set")
+    from tavily import TavilyClient
+
     return TavilyClient(api_key=api_key)
 
 
@@ -158,6 +164,8 @@ def get_got_quote() -> GOTQuoteResult:
         - Useful fields: `sentence`, `character.name`, `character.house.name`.
         - Timeout: 30s; raises for non-2xx responses.
     """
+    import requests
+
     url = "https://api.gameofthronesquotes.xyz/v1/random"
     response = requests.get(url, timeout=30)
     response.raise_for_status()
@@ -168,7 +176,7 @@ class CityWeatherResult(ToolStatus, total=False):
     data: OpenWeatherResponse
 
 
-@tool
+@tool(cacheable=True, ttl=600)
 def get_city_weather(city: str) -> CityWeatherResult:
     """Get current weather for a city using OpenWeather (metric units).
 
@@ -194,6 +202,8 @@ def get_city_weather(city: str) -> CityWeatherResult:
         - Raises RuntimeError if the API key is missing.
         - Raises for non-2xx responses.
     """
+    import requests
+
     base_url = "https://api.openweathermap.org/data/2.5/weather"
     api_key = os.getenv("OPENWEATHER_API_KEY")
     if not api_key:
@@ -208,7 +218,7 @@ class ExchangeRateResult(ToolStatus, total=False):
     rate: float
 
 
-@tool
+@tool(cacheable=True, ttl=300)
 def get_exchange_rate(from_currency: str, to_currency: str) -> ExchangeRateResult:
     """Get the conversion rate between two currencies using ExchangeRate-API.
 
@@ -231,6 +241,8 @@ def get_exchange_rate(from_currency: str, to_currency: str) -> ExchangeRateResul
         - Raises KeyError if `to_currency` is not in the returned rates.
         - Raises for non-2xx responses.
     """
+    import requests
+
     base_url = "https://v6.exchangerate-api.com/v6"
     api_key = os.getenv("EXCHANGERATE_API_KEY")
     if not api_key:
@@ -251,7 +263,7 @@ class PostResult(ToolStatus, total=False):
     post: Post
 
 
-@tool
+@tool(cacheable=True, ttl=300)
 def get_post(post_id: int) -> PostResult:
     """Fetch a post by id from JSONPlaceholder.
 
@@ -266,6 +278,8 @@ def get_post(post_id: int) -> PostResult:
         - JSONPlaceholder is a fake API; data is static/non-persistent.
         - Raises for non-2xx responses.
     """
+    import requests
+
     url = f"https://jsonplaceholder.typicode.com/posts/{post_id}"
     response = requests.get(url=url, timeout=30)
     response.raise_for_status()
@@ -289,6 +303,8 @@ def create_post(title: str, body: str, user_id: int) -> PostResult:
         - JSONPlaceholder is fake; posts are not persisted server-side.
         - Payload is sent as JSON; raises for non-2xx responses.
     """
+    import requests
+
     url = "https://jsonplaceholder.typicode.com/posts"
     payload = {"title": title, "body": body, "userId": user_id}
     response = requests.post(url=url, json=payload, timeout=30)
@@ -314,6 +330,8 @@ def update_post(post_id: int, title: Optional[str] = None, body: Optional[str] =
         - JSONPlaceholder is fake; updates are not persisted.
         - Payload is sent as JSON; raises for non-2xx responses.
     """
+    import requests
+
     url = f"https://jsonplaceholder.typicode.com/posts/{post_id}"
     payload: Dict[str, str] = {}
     if title is not None:
@@ -329,7 +347,7 @@ class WebSearchResult(ToolStatus, total=False):
     data: WebSearchFormattedResponse
 
 
-@tool
+@tool(cacheable=True, ttl=3600)
 def web_search(query: str,
                search_depth: Literal["basic", "advanced"] = "basic",
                max_results: int = 5) -> WebSearchResult:
@@ -408,7 +426,7 @@ class CompareSourcesResult(ToolStatus, total=False):
     report: ComparisonReport
 
 
-@tool
+@tool(mode="process", timeout=30)
 def compare_sources(items: List[TavilyResultItem], top_n: int = 3) -> CompareSourcesResult:
     """Compare multiple source snippets to extract common and unique terms and quick highlights.
 
@@ -0,0 +1,95 @@
+from typing import Any, Dict, List
+import json
+
+from lib.state_machine import Run, latency_stats
+
+
+def _to_us(seconds: float) -> int:
+    return int(round(seconds * 1_000_000))
+
+
+def to_chrome_trace(runs: List[Run]) -> Dict[str, Any]:
+    """Build a Chrome trace (chrome://tracing / Perfetto) from timed runs.
+
+    Each run is shown as its own process row; steps that ran in parallel are
+    placed on separate thread lanes inside that row.
+    """
+    events: List[Dict[str, Any]] = []
+    for pid, run in enumerate(runs, start=1):
+        events.append({
+            "name": "process_name",
+            "ph": "M",
+            "pid": pid,
+            "args": {"name": f"Run {run.run_id}"},
+        })
+        for snapshot in run.snapshots:
+            timing = snapshot.timing
+            if timing is None:
+                continue
+            events.append({
+                "name": snapshot.step_id,
+                "cat": "step",
+                "ph": "X",
+                "ts": _to_us(timing.started_at.timestamp()),
+                "dur": _to_us(timing.duration),
+                "pid": pid,
+                "tid": timing.lane,
+                "args": {"run_id": run.run_id, "snapshot_id": snapshot.snapshot_id},
+            })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def to_spans(runs: List[Run]) -> List[Dict[str, Any]]:
+    """Flatten timed runs into JSON-friendly spans: one per run plus one per step"""
+    spans: List[Dict[str, Any]] = []
+    for run in runs:
+        spans.append({
+            "span_id": run.run_id,
+            "parent_span_id": None,
+            "run_id": run.run_id,
+            "name": "run",
+            "start": run.start_timestamp.isoformat(),
+            "end": run.end_timestamp.isoformat() if run.end_timestamp else None,
+            "duration_ms": (
+                (run.end_timestamp - run.start_timestamp).total_seconds() * 1000
+                if run.end_timestamp else None
+            ),
+        })
+        for snapshot in run.snapshots:
+            timing = snapshot.timing
+            if timing is None:
+                continue
+            spans.append({
+                "span_id": snapshot.snapshot_id,
+                "parent_span_id": run.run_id,
+                "run_id": run.run_id,
+                "name": snapshot.step_id,
+                "start": timing.started_at.isoformat(),
+                "end": timing.ended_at.isoformat(),
+                "duration_ms": timing.duration * 1000,
+                "lane": timing.lane,
+            })
+    return spans
+
+
+def aggregate_latency(runs: List[Run]) -> Dict[str, Dict[str, float]]:
+    """Latency stats per step_id across many runs (e.g. to compare p95 of
+    message_prep, llm_processor and tool_executor)"""
+    durations: Dict[str, List[float]] = {}
+    for run in runs:
+        for snapshot in run.snapshots:
+            if snapshot.timing is not None:
+                durations.setdefault(snapshot.step_id, []).append(snapshot.timing.duration)
+    return {step_id: latency_stats(values) for step_id, values in durations.items()}
+
+
+def export_chrome_trace(runs: List[Run], path: str):
+    """Write runs as a Chrome trace JSON file"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(to_chrome_trace(runs), f)
+
+
+def export_json_spans(runs: List[Run], path: str):
+    """Write runs as a JSON array of spans"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(to_spans(runs), f, indent=2)
@@ -1,14 +1,15 @@
-from typing import List, Optional, Dict, Any, Union
+from typing import TYPE_CHECKING, List, Optional, Dict, Any, Union
 from typing_extensions import TypedDict
-import chromadb
-from chromadb.utils import embedding_functions
-from chromadb.api.models.Collection import Collection as ChromaCollection
-from chromadb.api.types import EmbeddingFunction, QueryResult, GetResult
 import os
 
 from lib.loaders import PDFLoader, JSONLoader
 from lib.documents import Document, Corpus
 
+if TYPE_CHECKING:
+    # chromadb takes about a second to import; it is loaded by VectorStoreManager
+    from chromadb.api.models.Collection import Collection as ChromaCollection
+    from chromadb.api.types import EmbeddingFunction, QueryResult, GetResult
+
 
 class VectorStore:
     """
@@ -26,7 +27,7 @@ class VectorStore:
     - Automatic embedding generation via OpenAI
     """
 
-    def __init__(self, chroma_collection: ChromaCollection):
+    def __init__(self, chroma_collection: 'ChromaCollection'):
         self._collection = chroma_collection
 
     def add(self, item: Union[Document, Corpus, List[Document]]):
@@ -75,7 +76,7 @@ class VectorStore:
 
     def query(self, query_texts: List[str], n_results: int = 3,
               where: Optional[Dict[str, Any]] = None,
-              where_document: Optional[Dict[str, Any]] = None) -> QueryResult:
+              where_document: Optional[Dict[str, Any]] = None) -> 'QueryResult':
         """
         Perform semantic similarity search against stored documents.
         
@@ -114,7 +115,7 @@ class VectorStore:
 
     def get(self, ids: Optional[List[str]] = None, 
             where: Optional[Dict[str, Any]] = None,
-            limit: Optional[int] = None) -> GetResult:
+            limit: Optional[int] = None) -> 'GetResult':
         """
         Retrieve documents by ID or metadata filters without similarity search.
         
@@ -162,6 +163,8 @@ class VectorStoreManager:
     """
 
     def __init__(self, openai_api_key: str):
+        import chromadb
+
         # Enable persistence: default to ./games/.chroma if env not set
         persist_dir = os.getenv("CHROMA_PERSIST_DIR")
         if not persist_dir:
@@ -186,7 +189,9 @@ class VectorStoreManager:
             )
         self.embedding_function = self._create_embedding_function(openai_api_key)
 
-    def _create_embedding_function(self, api_key: str) -> EmbeddingFunction:
+    def _create_embedding_function(self, api_key: str) -> 'EmbeddingFunction':
+        from chromadb.utils import embedding_functions
+
         api_base = os.getenv("OPENAI_BASE_URL", "https://openai.vocareum.com/v1")
         model_name = os.getenv("CHROMA_EMBED_MODEL", "text-embedding-ada-002")
         embeddings_fn = embedding_functions.OpenAIEmbeddingFunction(
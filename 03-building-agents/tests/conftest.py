@@ -0,0 +1,43 @@
+"""Test fixtures for the building-agents course library."""
+
+from __future__ import annotations
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+
+PACKAGE_ROOT = Path(__file__).resolve().parents[1]
+if str(PACKAGE_ROOT) not in sys.path:
+    sys.path.insert(0, str(PACKAGE_ROOT))
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+
+class _WhitespaceEncoding:
+    """Stand-in for a tiktoken encoding: one token per whitespace-separated word"""
+
+    def __init__(self):
+        self.calls = 0
+        self.batch_calls = 0
+
+    def encode(self, text: str):
+        self.calls += 1
+        return text.split()
+
+    def encode_batch(self, texts):
+        self.batch_calls += 1
+        return [text.split() for text in texts]
+
+
+@pytest.fixture
+def offline_encoding(monkeypatch):
+    """The o200k_base files are downloaded on first use; keep token estimates offline"""
+    encoding = _WhitespaceEncoding()
+    monkeypatch.setattr("tiktoken.get_encoding", lambda name: encoding)
+    # Fresh memo per test so call counts do not depend on test order
+    from lib.tooling import TokenCounter
+    monkeypatch.setattr("lib.tooling._default_token_counter", TokenCounter())
+    return encoding
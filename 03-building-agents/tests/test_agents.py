@@ -0,0 +1,328 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+from lib.agents import Agent
+from lib.caching import MISSING, ToolResultCache
+from lib.messages import AIMessage
+from lib.state_machine import SnapshotRetention
+from lib.tooling import ToolCall, tool
+
+
+@tool
+def slow_echo(text: str, delay: float) -> dict:
+    """Echo text after a delay"""
+    time.sleep(delay)
+    return {"text": text}
+
+
+@tool(timeout=0.05)
+def stuck(text: str) -> dict:
+    """Never answers in time"""
+    time.sleep(0.5)
+    return {"text": text}
+
+
+def _call(call_id: str, name: str, **arguments) -> ToolCall:
+    return ToolCall(id=call_id, type="function",
+                    function={"name": name, "arguments": json.dumps(arguments)})
+
+
+def _tool_state(*calls: ToolCall) -> dict:
+    return {"messages": [], "current_tool_calls": list(calls), "session_id": "s"}
+
+
+def test_agent_can_be_created_before_credentials_are_set(monkeypatch) -> None:
+    monkeypatch.delenv("OPENAI_API_KEY")
+    agent = Agent("gpt-4o-mini", "Use tools.", tools=[slow_echo])
+
+    assert agent._llm is None
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    assert agent.llm.tools == {"slow_echo": slow_echo}
+
+
+def test_tool_calls_run_concurrently_in_call_order() -> None:
+    agent = Agent("gpt-4o-mini", "Use tools.", tools=[slow_echo])
+    started = time.perf_counter()
+    update = agent._tool_step(_tool_state(
+        _call("1", "slow_echo", text="first", delay=0.2),
+        _call("2", "slow_echo", text="second", delay=0.05),
+        _call("3", "missing_tool"),
+        _call("4", "slow_echo", text="third", delay=0.1),
+    ))
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 0.35
+    assert [m.tool_call_id for m in update["messages"]] == ["1", "2", "4"]
+    assert [json.loads(m.content)["text"] for m in update["messages"]] == ["first", "second", "third"]
+    assert update["current_tool_calls"] is None
+
+
+def test_timed_out_tool_returns_error_result() -> None:
+    agent = Agent("gpt-4o-mini", "Use tools.", tools=[slow_echo, stuck])
+    started = time.perf_counter()
+    update = agent._tool_step(_tool_state(
+        _call("1", "stuck", text="late"),
+        _call("2", "slow_echo", text="on time", delay=0.0),
+    ))
+
+    assert time.perf_counter() - started < 0.3
+    assert "timed out" in json.loads(update["messages"][0].content)["error"]
+    assert json.loads(update["messages"][1].content) == {"text": "on time"}
+
+
+def test_queued_tool_calls_get_their_full_timeout() -> None:
+    agent = Agent("gpt-4o-mini", "Use tools.", tools=[slow_echo], max_tool_workers=1, tool_timeout=0.5)
+    update = agent._tool_step(_tool_state(
+        *(_call(str(i), "slow_echo", text=f"call {i}", delay=0.3) for i in range(3))
+    ))
+
+    assert [json.loads(m.content) for m in update["messages"]] == [{"text": f"call {i}"} for i in range(3)]
+
+
+def test_invalid_arguments_are_rejected_before_running_the_tool() -> None:
+    calls = []
+
+    @tool
+    def add(a: int, b: int) -> dict:
+        """Add two integers"""
+        calls.append((a, b))
+        return {"sum": a + b}
+
+    agent = Agent("gpt-4o-mini", "Use tools.", tools=[add])
+    update = agent._tool_step(_tool_state(
+        _call("1", "add", a="2", b=3),
+        _call("2", "add", a="two"),
+    ))
+
+    assert calls == [(2, 3)]
+    assert json.loads(update["messages"][0].content) == {"sum": 5}
+    error = json.loads(update["messages"][1].content)
+    assert error["error"] == "Invalid arguments for tool 'add'"
+    assert [problem["field"] for problem in error["problems"]] == ["a", "b"]
+
+
+def test_cacheable_tool_results_are_reused_across_runs() -> None:
+    calls = []
+
+    @tool(cacheable=True, ttl=60)
+    def rate(from_currency: str, to_currency: str) -> dict:
+        """Exchange rate"""
+        calls.append((from_currency, to_currency))
+        return {"rate": 5.0}
+
+    @tool
+    def quote() -> dict:
+        """Random quote"""
+        calls.append("quote")
+        return {"quote": "winter"}
+
+    cache = ToolResultCache()
+    agent = Agent("gpt-4o-mini", "Use tools.", tools=[rate, quote], tool_cache=cache)
+    for _ in range(2):
+        update = agent._tool_step(_tool_state(
+            _call("1", "rate", from_currency="USD", to_currency="BRL"),
+            _call("2", "quote"),
+        ))
+        assert [json.loads(m.content) for m in update["messages"]] == [{"rate": 5.0}, {"quote": "winter"}]
+
+    assert calls == [("USD", "BRL"), "quote", "quote"]
+    assert cache.stats()["tools"]["rate"] == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_timed_out_results_are_not_cached() -> None:
+    @tool(cacheable=True, timeout=0.05)
+    def slow() -> dict:
+        """Slow lookup"""
+        time.sleep(0.2)
+        return {"ok": True}
+
+    cache = ToolResultCache()
+    agent = Agent("gpt-4o-mini", "Use tools.", tools=[slow], tool_cache=cache)
+    agent._tool_step(_tool_state(_call("1", "slow")))
+
+    assert cache.get("slow", {}) is MISSING
+
+
+def test_error_results_are_not_cached() -> None:
+    @tool(cacheable=True, ttl=300)
+    def rate(currency: str) -> dict:
+        """Exchange rate lookup"""
+        return {"status": "error", "error": "rate service unavailable"}
+
+    cache = ToolResultCache()
+    agent = Agent("gpt-4o-mini", "Use tools.", tools=[rate], tool_cache=cache)
+    agent._tool_step(_tool_state(_call("1", "rate", currency="BRL")))
+
+    assert cache.get("rate", {"currency": "BRL"}) is MISSING
+
+
+def _chunk(content=None, tool_calls=None, usage=None):
+    choices = [] if content is None and tool_calls is None else [
+        SimpleNamespace(delta=SimpleNamespace(content=content, tool_calls=tool_calls))
+    ]
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+def _fragment(index, id=None, name=None, arguments=None):
+    return SimpleNamespace(index=index, id=id, function=SimpleNamespace(name=name, arguments=arguments))
+
+
+class _StreamingCompletions:
+    def __init__(self, tool_delay: float = 0):
+        self.calls = 0
+        self.tool_delay = tool_delay
+
+    def create(self, **payload):
+        assert payload["stream"]
+        self.calls += 1
+        if self.calls == 1:
+            return iter([
+                _chunk(tool_calls=[_fragment(0, id="call-1", name="slow_echo", arguments='{"text": ')]),
+                _chunk(tool_calls=[_fragment(0, arguments=f'"hi", "delay": {self.tool_delay}}}')]),
+                _chunk(usage=SimpleNamespace(prompt_tokens=5, completion_tokens=3, total_tokens=8)),
+            ])
+        return iter([_chunk(content="Hel"), _chunk(content="lo"),
+                     _chunk(usage=SimpleNamespace(prompt_tokens=9, completion_tokens=2, total_tokens=11))])
+
+
+def test_stream_yields_tokens_tool_events_and_final_run(offline_encoding) -> None:
+    agent = Agent("gpt-4o-mini", "Use tools.", tools=[slow_echo], history_token_counter=lambda m: 1)
+    agent.llm.client = SimpleNamespace(chat=SimpleNamespace(completions=_StreamingCompletions()))
+
+    events = list(agent.stream("say hi", session_id="s"))
+
+    assert [e.type for e in events] == ["tool_start", "tool_end", "token", "token", "run_end"]
+    assert events[0].arguments == {"text": "hi", "delay": 0}
+    assert events[1].result == {"text": "hi"}
+    assert "".join(e.content for e in events if e.type == "token") == "Hello"
+    final_state = events[-1].run.get_final_state()
+    assert final_state["messages"][-1].content == "Hello"
+    assert final_state["messages"][2].tool_calls[0].function.arguments == '{"text": "hi", "delay": 0}'
+    assert final_state["cumulative_tokens"] == 19
+    assert agent.get_session_runs("s")[0].run_id == events[-1].run.run_id
+
+
+def test_cached_replies_do_not_add_to_cumulative_tokens() -> None:
+    agent = Agent("gpt-4o-mini", "Be brief.")
+    state = {"messages": [], "session_id": "s", "cumulative_tokens": 10}
+    reply = AIMessage(content="hi")
+
+    agent._llm = SimpleNamespace(last_usage={"total_tokens": 8})
+    assert agent._llm_update(state, reply)["cumulative_tokens"] == 18
+
+    agent._llm = SimpleNamespace(last_usage={"total_tokens": 8, "cached": True})
+    update = agent._llm_update(state, reply)
+    assert update["total_tokens"] == 8
+    assert "cumulative_tokens" not in update
+
+
+def test_closing_the_stream_early_cancels_the_run(offline_encoding) -> None:
+    agent = Agent("gpt-4o-mini", "Use tools.", tools=[slow_echo], history_token_counter=lambda m: 1)
+    completions = _StreamingCompletions(tool_delay=0.2)
+    agent.llm.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+    events = agent.stream("say hi", session_id="s")
+    assert next(events).type == "tool_start"
+    events.close()
+    time.sleep(0.4)
+
+    # The run stopped after the tool instead of asking the model again, and
+    # the partial turn was not remembered
+    assert completions.calls == 1
+    assert agent.get_session_runs("s") == []
+    assert agent.get_conversation("s").messages() == []
+
+
+def test_snapshot_retention_bounds_the_runs_kept_in_session_memory(offline_encoding) -> None:
+    agent = Agent("gpt-4o-mini", "Use tools.", tools=[slow_echo], history_token_counter=lambda m: 1,
+                  snapshot_retention=SnapshotRetention.final_only())
+    agent.llm.client = SimpleNamespace(chat=SimpleNamespace(completions=_StreamingCompletions()))
+
+    run = list(agent.stream("say hi", session_id="s"))[-1].run
+
+    # Stored as is (no deep copy), with only the final snapshot retained
+    assert agent.get_session_runs("s")[0] is run
+    assert len(run.snapshots) == 1
+    assert run.get_final_state()["messages"][-1].content == "Hello"
+
+
+@tool
+async def async_lookup(key: str) -> dict:
+    """Async lookup"""
+    await asyncio.sleep(0.1)
+    return {"key": key}
+
+
+class _AsyncCompletions:
+    async def create(self, **payload):
+        messages = payload["messages"]
+        if messages[-1]["role"] == "user":
+            question = messages[-1]["content"]
+            tool_calls = [
+                _call(f"{question}-1", "async_lookup", key=question),
+                _call(f"{question}-2", "slow_echo", text=question, delay=0.1),
+            ]
+            message = SimpleNamespace(content=None, tool_calls=tool_calls)
+        else:
+            message = SimpleNamespace(content=f"done {messages[-2]['content']}", tool_calls=None)
+        usage = SimpleNamespace(prompt_tokens=1, completion_tokens=1, total_tokens=2)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+def test_ainvoke_serves_concurrent_sessions(offline_encoding) -> None:
+    agent = Agent("gpt-4o-mini", "Use tools.", tools=[async_lookup, slow_echo],
+                  history_token_counter=lambda m: 1)
+    agent.llm._async_client = SimpleNamespace(chat=SimpleNamespace(completions=_AsyncCompletions()))
+
+    async def main():
+        return await asyncio.gather(*(agent.ainvoke(f"q{i}", session_id=f"s{i}") for i in range(5)))
+
+    started = time.perf_counter()
+    runs = asyncio.run(main())
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 0.5
+    for i, run in enumerate(runs):
+        state = run.get_final_state()
+        tool_results = [json.loads(m.content) for m in state["messages"] if m.role == "tool"]
+        assert tool_results == [{"key": f"q{i}"}, {"text": f"q{i}"}]
+        assert state["cumulative_tokens"] == 4
+        assert len(agent.get_session_runs(f"s{i}")) == 1
+
+
+def test_ainvoke_summarizes_history_off_the_event_loop(offline_encoding) -> None:
+    def summarize(previous, evicted):
+        # A blocking LLM call here would stall every session on the loop
+        time.sleep(0.3)
+        return "summary"
+
+    agent = Agent("gpt-4o-mini", "Use tools.", tools=[async_lookup, slow_echo],
+                  history_token_counter=lambda m: 1, history_token_budget=1, history_summarizer=summarize)
+    agent.llm._async_client = SimpleNamespace(chat=SimpleNamespace(completions=_AsyncCompletions()))
+
+    async def session(session_id: str):
+        # The second turn evicts the first, which is summarized
+        for turn in range(2):
+            await agent.ainvoke(f"{session_id}-{turn}", session_id=session_id)
+
+    async def main():
+        await asyncio.gather(session("s0"), session("s1"))
+
+    started = time.perf_counter()
+    asyncio.run(main())
+    elapsed = time.perf_counter() - started
+
+    # Two 0.1 s turns, then both sessions summarize at once
+    assert elapsed < 0.7
+    assert agent.get_conversation("s0").summary == "summary"
+
+
+def test_sync_invoke_path_awaits_async_tools() -> None:
+    agent = Agent("gpt-4o-mini", "Use tools.", tools=[async_lookup])
+    update = agent._tool_step(_tool_state(_call("1", "async_lookup", key="k")))
+
+    assert json.loads(update["messages"][0].content) == {"key": "k"}
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import time
+from typing import List, TypedDict
+
+import pytest
+
+from lib.caching import MISSING, LRUCache, ToolResultCache, stable_hash
+from lib.messages import UserMessage
+from lib.state_machine import EntryPoint, StateMachine, Step, Termination
+
+
+def test_lru_cache_evicts_least_recently_used() -> None:
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b", MISSING) is MISSING
+    assert cache.get("a") == 1
+    stats = cache.stats
+    assert (stats.hits, stats.misses, stats.evictions, stats.size) == (2, 1, 1, 2)
+
+
+def test_lru_cache_expires_entries() -> None:
+    cache = LRUCache(ttl=60)
+    cache.set("short", "value", ttl=0.01)
+    cache.set("long", "value")
+    time.sleep(0.02)
+
+    assert cache.get("short", MISSING) is MISSING
+    assert cache.get("long") == "value"
+    assert cache.stats.expirations == 1
+
+
+def test_stable_hash_ignores_dict_order_and_handles_models() -> None:
+    assert stable_hash({"a": 1, "b": [1, 2]}) == stable_hash({"b": [1, 2], "a": 1})
+    assert stable_hash([UserMessage(content="hi")]) == stable_hash([UserMessage(content="hi")])
+    assert stable_hash([UserMessage(content="hi")]) != stable_hash([UserMessage(content="bye")])
+
+
+class QAState(TypedDict):
+    question: str
+    attempt: int
+    answer: str
+
+
+def _build_memoized_machine(calls: List[str], cache: LRUCache) -> StateMachine[QAState]:
+    def answer(state: QAState) -> dict:
+        calls.append(state["question"])
+        return {"answer": state["question"].upper()}
+
+    machine = StateMachine[QAState](QAState, step_cache=cache)
+    entry = EntryPoint[QAState]()
+    step = Step[QAState]("answer", answer, reads=["question"])
+    termination = Termination[QAState]()
+    machine.add_steps([entry, step, termination])
+    machine.connect(entry, step)
+    machine.connect(step, termination)
+    return machine
+
+
+def test_step_with_reads_is_memoized_on_declared_fields() -> None:
+    calls: List[str] = []
+    cache = LRUCache()
+    machine = _build_memoized_machine(calls, cache)
+
+    first = machine.run({"question": "why", "attempt": 1})
+    # attempt is not a declared read, so it does not change the key
+    second = machine.run({"question": "why", "attempt": 2})
+    third = machine.run({"question": "how", "attempt": 1})
+
+    assert calls == ["why", "how"]
+    assert second.get_final_state()["answer"] == first.get_final_state()["answer"] == "WHY"
+    assert third.get_final_state()["answer"] == "HOW"
+    assert second.snapshots[-1].timing.cached
+    assert not third.snapshots[-1].timing.cached
+    assert (cache.stats.hits, cache.stats.misses) == (1, 2)
+
+
+def test_steps_without_reads_or_cache_always_execute() -> None:
+    calls: List[str] = []
+    machine = _build_memoized_machine(calls, cache=None)
+    machine.run({"question": "why", "attempt": 1})
+    machine.run({"question": "why", "attempt": 1})
+
+    assert calls == ["why", "why"]
+
+
+class _Truncated:
+    """Like a large numpy array: different values, identical repr"""
+
+    def __init__(self, values):
+        self.values = values
+
+    def __repr__(self) -> str:
+        return "array([0, 0, ..., 0])"
+
+    def upper(self) -> str:
+        return repr(self)
+
+
+def test_values_without_exact_canonical_form_are_not_cached() -> None:
+    with pytest.raises(TypeError):
+        stable_hash({"data": _Truncated([1])})
+
+    calls: List[str] = []
+    machine = _build_memoized_machine(calls, LRUCache())
+    machine.run({"question": _Truncated([1]), "attempt": 1})
+    machine.run({"question": _Truncated([2]), "attempt": 1})
+
+    assert len(calls) == 2
+
+
+def test_tool_result_cache_persists_to_sqlite(tmp_path) -> None:
+    path = str(tmp_path / "tools.db")
+    cache = ToolResultCache(path=path)
+    cache.set("get_exchange_rate", {"to_currency": "BRL", "from_currency": "USD"}, {"rate": 5.1})
+
+    # A new cache (e.g. another process) reads the stored result; argument order does not matter
+    restarted = ToolResultCache(path=path)
+    assert restarted.get("get_exchange_rate", {"from_currency": "USD", "to_currency": "BRL"}) == {"rate": 5.1}
+    assert restarted.get("get_exchange_rate", {"from_currency": "USD", "to_currency": "EUR"}) is MISSING
+
+    stats = restarted.stats()
+    assert (stats["hits"], stats["misses"], stats["store_hits"]) == (1, 1, 1)
+    assert stats["tools"]["get_exchange_rate"]["hit_rate"] == 0.5
+    cache.close()
+    restarted.close()
+
+
+def test_tool_result_cache_respects_ttl(tmp_path) -> None:
+    cache = ToolResultCache(path=str(tmp_path / "tools.db"))
+    cache.set("web_search", {"query": "ev"}, ["result"], ttl=0.01)
+    time.sleep(0.02)
+
+    assert cache.get("web_search", {"query": "ev"}) is MISSING
+    cache.close()
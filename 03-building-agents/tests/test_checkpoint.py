@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+from typing import List, TypedDict
+
+import pytest
+
+from lib.checkpoint import SQLiteCheckpointer
+from lib.state_machine import EntryPoint, SnapshotRetention, StateMachine, Step, Termination
+
+
+class PipelineState(TypedDict):
+    question: str
+    documents: List[str]
+    answer: str
+
+
+class FlakyPipeline:
+    def __init__(self, checkpointer: SQLiteCheckpointer):
+        self.retrieve_calls = 0
+        self.fail_generate = True
+        self.machine = StateMachine[PipelineState](PipelineState, checkpointer=checkpointer)
+        entry = EntryPoint[PipelineState]()
+        retrieve = Step[PipelineState]("retrieve", self._retrieve)
+        generate = Step[PipelineState]("generate", self._generate)
+        termination = Termination[PipelineState]()
+        self.machine.add_steps([entry, retrieve, generate, termination])
+        self.machine.connect(entry, retrieve)
+        self.machine.connect(retrieve, generate)
+        self.machine.connect(generate, termination)
+
+    def _retrieve(self, state: PipelineState) -> dict:
+        self.retrieve_calls += 1
+        return {"documents": [f"doc about {state['question']}"]}
+
+    def _generate(self, state: PipelineState) -> dict:
+        if self.fail_generate:
+            raise RuntimeError("process crashed")
+        return {"answer": f"answer from {len(state['documents'])} docs"}
+
+
+@pytest.fixture
+def checkpointer(tmp_path) -> SQLiteCheckpointer:
+    store = SQLiteCheckpointer(str(tmp_path / "runs.db"))
+    yield store
+    store.close()
+
+
+def _crashed_run_id(pipeline: FlakyPipeline, checkpointer: SQLiteCheckpointer) -> str:
+    with pytest.raises(RuntimeError):
+        pipeline.machine.run({"question": "ev sales"})
+    (unfinished,) = [r for r in checkpointer.list_runs() if r.end_timestamp is None]
+    return unfinished.run_id
+
+
+def test_resume_continues_without_rerunning_finished_steps(checkpointer) -> None:
+    pipeline = FlakyPipeline(checkpointer)
+    run_id = _crashed_run_id(pipeline, checkpointer)
+
+    # A fresh process would reopen the same database file
+    reopened = SQLiteCheckpointer(checkpointer.path)
+    pipeline.machine.checkpointer = reopened
+    pipeline.fail_generate = False
+    run = pipeline.machine.resume(run_id)
+    reopened.close()
+
+    assert pipeline.retrieve_calls == 1
+    assert run.run_id == run_id
+    assert [s.step_id for s in run.snapshots] == ["__entry__", "retrieve", "generate"]
+    assert run.get_final_state()["answer"] == "answer from 1 docs"
+    assert run.end_timestamp is not None
+    assert all(s.timing is not None for s in run.snapshots)
+
+
+def test_resume_of_completed_run_returns_stored_run(checkpointer) -> None:
+    pipeline = FlakyPipeline(checkpointer)
+    pipeline.fail_generate = False
+    finished = pipeline.machine.run({"question": "ev sales"})
+
+    restored = pipeline.machine.resume(finished.run_id)
+    assert pipeline.retrieve_calls == 1
+    assert restored.get_final_state() == finished.get_final_state()
+    assert restored.end_timestamp == finished.end_timestamp
+
+
+def test_fork_from_snapshot_creates_new_run(checkpointer) -> None:
+    pipeline = FlakyPipeline(checkpointer)
+    pipeline.fail_generate = False
+    original = pipeline.machine.run({"question": "ev sales"})
+    retrieve_snapshot = original.snapshots[1]
+
+    forked = pipeline.machine.fork(retrieve_snapshot.snapshot_id)
+
+    assert forked.run_id != original.run_id
+    assert pipeline.retrieve_calls == 1
+    assert [s.step_id for s in forked.snapshots] == ["__entry__", "retrieve", "generate"]
+    assert forked.get_final_state() == original.get_final_state()
+
+    # The fork is itself checkpointed and can be resumed
+    assert pipeline.machine.resume(forked.run_id).get_final_state() == forked.get_final_state()
+
+
+
+def test_resume_applies_named_step_retention_to_restored_history(checkpointer) -> None:
+    machine = StateMachine[PipelineState](PipelineState, checkpointer=checkpointer,
+                                          snapshot_retention=SnapshotRetention.steps("search_a"))
+    crash = [True]
+
+    def merge(state: PipelineState) -> dict:
+        if crash[0]:
+            raise RuntimeError("process crashed")
+        return {"answer": " | ".join(state["documents"])}
+
+    entry = EntryPoint[PipelineState]()
+    termination = Termination[PipelineState]()
+    machine.add_steps([
+        entry,
+        Step[PipelineState]("search_a", lambda state: {"documents": ["a"]}),
+        Step[PipelineState]("search_b", lambda state: {"question": "b"}),
+        Step[PipelineState]("merge", merge),
+        termination,
+    ])
+    machine.connect(entry, ["search_a", "search_b"])
+    machine.connect("search_a", "merge")
+    machine.connect("search_b", "merge")
+    machine.connect("merge", termination)
+
+    with pytest.raises(RuntimeError):
+        machine.run({"question": "q", "documents": []})
+    (unfinished,) = checkpointer.list_runs()
+    crash[0] = False
+    run = machine.resume(unfinished.run_id)
+
+    assert [s.step_id for s in run.snapshots] == ["search_a", "merge"]
+    assert run.get_final_state()["answer"] == "a"
+
+
+def test_resume_requires_checkpointer() -> None:
+    machine = StateMachine[PipelineState](PipelineState)
+    with pytest.raises(ValueError):
+        machine.resume("missing")
+
+
+class ChatState(TypedDict):
+    messages: List[str]
+
+
+def test_growing_list_is_stored_as_appended_items(checkpointer) -> None:
+    machine = StateMachine[ChatState](ChatState, checkpointer=checkpointer)
+    entry = EntryPoint[ChatState]()
+
+    def reply(text: str):
+        return lambda state: {"messages": state["messages"] + [text]}
+
+    turns = [Step[ChatState](f"turn_{i}", reply(f"m{i}")) for i in range(20)]
+    termination = Termination[ChatState]()
+    machine.add_steps([entry, *turns, termination])
+    machine.connect(entry, turns[0])
+    for step, following in zip(turns, turns[1:] + [termination]):
+        machine.connect(step, following)
+
+    run = machine.run({"messages": ["hello"]})
+
+    sizes = [len(row[0]) for row in checkpointer._conn.execute("SELECT changes FROM snapshots ORDER BY seq")]
+    # One new message per row, not the whole history
+    assert max(sizes[2:]) < sizes[2] + 8
+    records = checkpointer.load_snapshots(run.run_id)
+    assert records[-1].changes["messages"] == run.get_final_state()["messages"]
+    assert checkpointer.find_snapshot(run.snapshots[10].snapshot_id).changes["messages"] == \
+        ["hello"] + [f"m{i}" for i in range(10)]
+
+
+def _fan_out_machine(checkpointer: SQLiteCheckpointer, fail: bool) -> StateMachine[PipelineState]:
+    def generate(state: PipelineState) -> dict:
+        if fail:
+            raise RuntimeError("process crashed")
+        return {"answer": state["question"]}
+
+    machine = StateMachine[PipelineState](PipelineState, checkpointer=checkpointer)
+    entry = EntryPoint[PipelineState]()
+    termination = Termination[PipelineState]()
+    machine.add_steps([
+        entry,
+        Step[PipelineState]("search_a", lambda state: {"documents": ["a"]}),
+        Step[PipelineState]("rewrite", lambda state: {"question": "rewritten"}),
+        Step[PipelineState]("generate", generate),
+        termination,
+    ])
+    machine.connect(entry, ["search_a", "rewrite"])
+    machine.connect("search_a", "generate")
+    machine.connect("rewrite", "generate")
+    machine.connect("generate", termination)
+    return machine
+
+
+def test_fork_refuses_snapshots_inside_a_parallel_superstep(checkpointer) -> None:
+    run = _fan_out_machine(checkpointer, fail=False).run({"question": "q", "documents": []})
+    machine = _fan_out_machine(checkpointer, fail=False)
+
+    with pytest.raises(ValueError, match="not the last of its parallel steps"):
+        machine.fork(run.snapshots[1].snapshot_id)
+    forked = machine.fork(run.snapshots[2].snapshot_id)
+    assert forked.get_final_state()["answer"] == "rewritten"
+
+
+def test_failed_run_releases_stored_lists(checkpointer) -> None:
+    with pytest.raises(RuntimeError):
+        _fan_out_machine(checkpointer, fail=True).run({"question": "q", "documents": []})
+
+    assert checkpointer._stored_lists == {}
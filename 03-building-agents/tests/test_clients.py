@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import threading
+
+from lib.clients import PoolLimits, close_clients, get_openai_client
+from lib.llm import LLM
+
+
+def test_llms_with_same_credentials_share_one_client() -> None:
+    close_clients()
+    first = LLM(api_key="key-a", base_url="http://localhost:9999/v1")
+    second = LLM(model="gpt-4o", api_key="key-a", base_url="http://localhost:9999/v1")
+    other_key = LLM(api_key="key-b", base_url="http://localhost:9999/v1")
+
+    assert first.client is second.client
+    assert other_key.client is not first.client
+    close_clients()
+
+
+def test_pool_limits_are_part_of_the_client_key() -> None:
+    close_clients()
+    small = PoolLimits(max_connections=4, max_keepalive_connections=2)
+    default_client = get_openai_client("key", "http://localhost:9999/v1")
+    small_client = get_openai_client("key", "http://localhost:9999/v1", small)
+
+    assert small_client is not default_client
+    assert get_openai_client("key", "http://localhost:9999/v1", PoolLimits(max_connections=4, max_keepalive_connections=2)) is small_client
+    assert small_client.max_retries == small.max_retries
+    close_clients()
+
+
+
+def test_pooled_clients_keep_the_sdk_timeout_unless_set() -> None:
+    close_clients()
+    default_client = get_openai_client("key", "http://localhost:9999/v1")
+    short = get_openai_client("key", "http://localhost:9999/v1", PoolLimits(timeout=5.0))
+
+    assert default_client.timeout.read == 600
+    assert short.timeout == 5.0
+    close_clients()
+
+
+def test_last_usage_is_tracked_per_thread() -> None:
+    llm = LLM(api_key="key", base_url="http://localhost:9999/v1")
+    llm.last_usage = {"total_tokens": 10}
+    seen = []
+    worker = threading.Thread(target=lambda: seen.append(llm.last_usage))
+    worker.start()
+    worker.join()
+
+    assert seen == [None]
+    assert llm.last_usage == {"total_tokens": 10}
+    close_clients()
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import json
+
+from lib.agents import AgentState
+from lib.evaluation import AgentEvaluator, TestCase as EvaluationCase
+from lib.messages import AIMessage, ToolMessage, UserMessage
+from lib.state_machine import EntryPoint, SnapshotRetention, StateMachine, Step, Termination
+from lib.tooling import ToolCall
+
+
+def _tool_call(call_id: str, name: str) -> ToolCall:
+    return ToolCall(id=call_id, type="function", function={"name": name, "arguments": "{}"})
+
+
+def _scripted_agent_run(retention: SnapshotRetention):
+    """Replay an agent trajectory (two tool rounds, then an answer) without any LLM"""
+    machine = StateMachine[AgentState](AgentState, snapshot_retention=retention)
+    replies = [
+        AIMessage(content="", tool_calls=[_tool_call("1", "web_search")]),
+        AIMessage(content="", tool_calls=[_tool_call("2", "compare_sources")]),
+        AIMessage(content="Final answer"),
+    ]
+
+    def llm(state: AgentState) -> dict:
+        reply = replies[(state.get("cumulative_tokens") or 0) // 10]
+        return {
+            "messages": state["messages"] + [reply],
+            "current_tool_calls": reply.tool_calls,
+            "total_tokens": 10,
+            "cumulative_tokens": (state.get("cumulative_tokens") or 0) + 10,
+        }
+
+    def tools(state: AgentState) -> dict:
+        results = [
+            ToolMessage(content=json.dumps({"status": "ok"}), tool_call_id=c.id, name=c.function.name)
+            for c in state["current_tool_calls"]
+        ]
+        return {"messages": state["messages"] + results, "current_tool_calls": None}
+
+    entry = EntryPoint[AgentState]()
+    prep = Step[AgentState]("message_prep", lambda s: {"messages": [UserMessage(content=s["user_query"])]})
+    llm_step = Step[AgentState]("llm_processor", llm)
+    tool_step = Step[AgentState]("tool_executor", tools)
+    termination = Termination[AgentState]()
+    machine.add_steps([entry, prep, llm_step, tool_step, termination])
+    machine.connect(entry, prep)
+    machine.connect(prep, llm_step)
+    machine.connect(llm_step, [tool_step, termination],
+                    lambda s: tool_step if s.get("current_tool_calls") else termination)
+    machine.connect(tool_step, llm_step)
+    return machine.run({"user_query": "compare EV outlooks", "session_id": "s"})
+
+
+TEST_CASE = EvaluationCase(
+    id="ev",
+    description="Research and compare sources",
+    user_query="compare EV outlooks",
+    expected_tools=["web_search", "compare_sources"],
+)
+
+
+def test_evaluate_trajectory_with_full_history() -> None:
+    result = AgentEvaluator().evaluate_trajectory(TEST_CASE, _scripted_agent_run(SnapshotRetention.keep_all()))
+
+    assert result.task_completion.steps_taken == 6
+    assert result.system_metrics.per_step_tokens == [10, 10, 10]
+    assert result.overall_score == 1.0
+    assert "partial trajectory" not in result.feedback
+
+
+def test_evaluate_trajectory_degrades_with_final_only_retention() -> None:
+    run = _scripted_agent_run(SnapshotRetention.final_only())
+    result = AgentEvaluator().evaluate_trajectory(TEST_CASE, run)
+
+    # Step counts and tool usage survive; per-step tokens only cover what was kept
+    assert result.task_completion.steps_taken == 6
+    assert result.tool_interaction.correct_tool_selected
+    assert result.system_metrics.total_tokens == 30
+    assert result.system_metrics.per_step_tokens == [10]
+    assert result.overall_score == 1.0
+    assert "partial trajectory: 1 of 7 snapshots retained" in result.feedback
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import logging
+from typing import List, TypedDict
+
+import pytest
+
+from lib.events import LoggingObserver, PrintObserver, StateMachineObserver
+from lib.state_machine import EntryPoint, StateMachine, Step, Termination
+
+
+class EchoState(TypedDict):
+    text: str
+
+
+class RecordingObserver(StateMachineObserver):
+    def __init__(self):
+        self.events: List[tuple] = []
+
+    def on_run_start(self, run, state):
+        self.events.append(("run_start",))
+
+    def on_step_start(self, run, step_id):
+        self.events.append(("step_start", step_id))
+
+    def on_step_end(self, run, snapshot):
+        self.events.append(("step_end", snapshot.step_id))
+
+    def on_transition(self, run, source, targets):
+        self.events.append(("transition", source, tuple(targets)))
+
+    def on_termination(self, run, step_id):
+        self.events.append(("termination", step_id))
+
+    def on_run_end(self, run):
+        self.events.append(("run_end",))
+
+    def on_run_error(self, run, error):
+        self.events.append(("run_error", type(error).__name__))
+
+
+def _build_machine(logic=lambda state: {"text": state["text"].upper()}, **kwargs) -> StateMachine[EchoState]:
+    machine = StateMachine[EchoState](EchoState, **kwargs)
+    entry = EntryPoint[EchoState]()
+    termination = Termination[EchoState]()
+    machine.add_steps([entry, Step[EchoState]("shout", logic), termination])
+    machine.connect(entry, "shout")
+    machine.connect("shout", termination)
+    return machine
+
+
+def test_observer_receives_events_in_order() -> None:
+    observer = RecordingObserver()
+    _build_machine(observers=[observer]).run({"text": "hi"})
+
+    assert observer.events == [
+        ("run_start",),
+        ("step_start", "__entry__"),
+        ("step_end", "__entry__"),
+        ("transition", "__entry__", ("shout",)),
+        ("step_start", "shout"),
+        ("step_end", "shout"),
+        ("transition", "shout", ("__termination__",)),
+        ("termination", "__termination__"),
+        ("run_end",),
+    ]
+
+
+def test_observer_is_told_about_failures() -> None:
+    def boom(state: EchoState) -> dict:
+        raise RuntimeError("boom")
+
+    observer = RecordingObserver()
+    machine = _build_machine(boom)
+    machine.add_observer(observer)
+    with pytest.raises(RuntimeError):
+        machine.run({"text": "hi"})
+    assert observer.events[-1] == ("run_error", "RuntimeError")
+
+
+def test_no_observers_means_no_output(capsys) -> None:
+    _build_machine().run({"text": "hi"})
+    assert capsys.readouterr().out == ""
+
+
+def test_print_observer_keeps_console_progress(capsys) -> None:
+    _build_machine(observers=[PrintObserver()]).run({"text": "hi"})
+    assert capsys.readouterr().out.splitlines() == [
+        "[StateMachine] Starting: __entry__",
+        "[StateMachine] Executing step: shout",
+        "[StateMachine] Terminating: __termination__",
+    ]
+
+
+def test_logging_observer_attaches_structured_fields(caplog) -> None:
+    logger = logging.getLogger("tests.state_machine")
+    with caplog.at_level(logging.INFO, logger="tests.state_machine"):
+        run = _build_machine(observers=[LoggingObserver(logger, level=logging.INFO)]).run({"text": "hi"})
+
+    step_end = [r for r in caplog.records if r.event == "step_end" and r.step_id == "shout"]
+    assert len(step_end) == 1
+    assert step_end[0].run_id == run.run_id
+    assert step_end[0].duration_ms >= 0
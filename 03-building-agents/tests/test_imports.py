@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+
+PACKAGE_ROOT = Path(__file__).resolve().parents[1]
+# Loaded on first use only (VectorStoreManager, web_search/HTTP tools, PDFLoader)
+HEAVY_MODULES = ["chromadb", "tavily", "requests", "pdfplumber"]
+
+
+def test_importing_lib_does_not_load_optional_dependencies() -> None:
+    code = (
+        "import json, sys\n"
+        "import lib.agents, lib.tools, lib.rag, lib.memory, lib.vector_db, lib.loaders\n"
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    )
+    completed = subprocess.run([sys.executable, "-c", code], cwd=PACKAGE_ROOT,
+                               capture_output=True, text=True, check=True)
+
+    assert json.loads(completed.stdout) == []
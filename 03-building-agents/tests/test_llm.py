@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+from lib.caching import ResponseCache
+from lib.llm import LLM
+from lib.messages import UserMessage
+from lib.tooling import ModelConfig, Tool, ToolCall
+
+
+def _make_tool(index: int) -> Tool:
+    def lookup(query: str) -> dict:
+        return {"query": query}
+
+    return Tool(lookup, name=f"lookup_{index}", description=f"Lookup number {index} " + "word " * 20)
+
+
+def test_build_payload_prunes_tools_with_cached_estimates(offline_encoding) -> None:
+    tools = [_make_tool(i) for i in range(20)]
+    llm = LLM(tools=tools, api_key="key", base_url="http://localhost:9999/v1")
+    per_tool = tools[0].token_estimate() + 1
+    offline_encoding.calls = 0
+    llm.model_config = ModelConfig("test", max_context_tokens=10_000, input_budget_tokens=20 + 5 * per_tool)
+    messages = [UserMessage(content="hello there")]
+
+    payload = llm._build_payload(messages)
+    assert [spec["function"]["name"] for spec in payload["tools"]] == [f"lookup_{i}" for i in range(5)]
+    # Messages once plus each remaining tool once; lookup_0 was already cached
+    assert offline_encoding.calls == 1 + 19
+
+    # The unchanged history is memoized, so nothing is re-encoded
+    offline_encoding.calls = 0
+    llm._build_payload(messages)
+    assert offline_encoding.calls == 0
+
+
+def test_build_payload_keeps_all_tools_within_budget(offline_encoding) -> None:
+    tools = [_make_tool(i) for i in range(3)]
+    llm = LLM(tools=tools, api_key="key", base_url="http://localhost:9999/v1")
+
+    payload = llm._build_payload([UserMessage(content="hello")])
+    assert len(payload["tools"]) == 3
+    assert payload["tool_choice"] == "auto"
+
+
+class _CountingCompletions:
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, **payload):
+        self.calls += 1
+        tool_calls = [ToolCall(id="call-1", type="function",
+                               function={"name": "lookup", "arguments": '{"query": "x"}'})]
+        message = SimpleNamespace(content=f"reply {self.calls}", tool_calls=tool_calls)
+        usage = SimpleNamespace(prompt_tokens=7, completion_tokens=3, total_tokens=10)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+def _cached_llm(cache: ResponseCache, temperature: float = 0.0):
+    completions = _CountingCompletions()
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return LLM(temperature=temperature, client=client, response_cache=cache), completions
+
+
+def test_response_cache_replays_identical_requests(tmp_path) -> None:
+    cache = ResponseCache(path=str(tmp_path / "llm.db"))
+    llm, completions = _cached_llm(cache)
+
+    first = llm.invoke("What is RAG?")
+    second = llm.invoke("What is RAG?")
+    other = llm.invoke("What is an agent?")
+
+    assert completions.calls == 2
+    assert second.content == first.content == "reply 1"
+    assert second.tool_calls[0].function.arguments == '{"query": "x"}'
+    assert other.content == "reply 2"
+    assert llm.last_usage == {"prompt_tokens": 7, "completion_tokens": 3, "total_tokens": 10}
+
+    # A fresh process reading the same database is served from disk
+    restarted, restarted_completions = _cached_llm(ResponseCache(path=str(tmp_path / "llm.db")))
+    assert restarted.invoke("What is RAG?").content == "reply 1"
+    assert restarted.last_usage["cached"] is True
+    assert restarted_completions.calls == 0
+    assert restarted.response_cache.stats()["store_hits"] == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_response_cache_skips_sampled_requests() -> None:
+    cache = ResponseCache()
+    llm, completions = _cached_llm(cache, temperature=0.7)
+    llm.invoke("hi")
+    llm.invoke("hi")
+
+    assert completions.calls == 2
+    assert cache.stats()["hits"] == cache.stats()["misses"] == 0
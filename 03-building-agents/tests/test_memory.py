@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+from typing import List
+
+from lib.agents import Agent
+from lib.memory import ConversationWindow
+from lib.messages import AIMessage, BaseMessage, UserMessage
+
+
+def _word_count(message: BaseMessage) -> int:
+    return len((message.content or "").split())
+
+
+def _turn(question: str, answer: str) -> List[BaseMessage]:
+    return [UserMessage(content=question), AIMessage(content=answer)]
+
+
+def test_window_evicts_oldest_turns_past_budget() -> None:
+    window = ConversationWindow(token_budget=10, token_counter=_word_count)
+    window.append_turn(_turn("one two", "three four"))
+    window.append_turn(_turn("five six", "seven eight"))
+    window.append_turn(_turn("nine ten", "eleven twelve"))
+
+    assert [m.content for m in window.messages()] == ["five six", "seven eight", "nine ten", "eleven twelve"]
+    assert window.total_tokens == 8
+    assert window.evicted_turns == 1
+
+
+def test_window_always_keeps_latest_turn() -> None:
+    window = ConversationWindow(token_budget=2, token_counter=_word_count)
+    window.append_turn(_turn("a b c", "d e f"))
+
+    assert len(window.messages()) == 2
+
+
+def test_window_summarizes_evicted_turns() -> None:
+    calls = []
+
+    def summarizer(previous, evicted):
+        calls.append([m.content for m in evicted])
+        return f"{previous or ''}+{len(evicted)}"
+
+    window = ConversationWindow(token_budget=9, token_counter=_word_count, summarizer=summarizer)
+    for i in range(4):
+        window.append_turn(_turn(f"q{i} x", f"a{i} y"))
+
+    assert calls == [["q0 x", "a0 y"], ["q1 x", "a1 y"]]
+    assert window.summary == "+2+2"
+    assert [m.content for m in window.messages()] == ["q2 x", "a2 y", "q3 x", "a3 y"]
+    assert window.total_tokens + window.summary_tokens <= 9
+
+
+class _FakeCompletions:
+    def __init__(self):
+        self.payloads = []
+
+    def create(self, **payload):
+        self.payloads.append(payload)
+        message = SimpleNamespace(content=f"answer {len(self.payloads)}", tool_calls=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+def test_agent_replays_bounded_window() -> None:
+    agent = Agent("gpt-4o-mini", "Be brief.", history_token_budget=12, history_token_counter=_word_count)
+    completions = _FakeCompletions()
+    agent.llm.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+    for i in range(5):
+        agent.invoke(f"question number {i}", session_id="s")
+
+    last_messages = completions.payloads[-1]["messages"]
+    assert [m["content"] for m in last_messages[1:]] == [
+        "question number 2", "answer 3", "question number 3", "answer 4", "question number 4",
+    ]
+    assert agent.get_conversation("s").evicted_turns == 3
+    assert len(agent.get_session_runs("s")) == 5
+
+    agent.reset_session("s")
+    assert agent.get_conversation("s").messages() == []
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+from openai import OpenAI
+
+from lib.agents import Agent
+from lib.llm import LLM
+from lib.mock_server import LatencyModel, MockOpenAIServer, MockReply, deterministic_embedding
+from lib.tooling import tool
+
+
+@tool
+def lookup_order(order_id: str) -> dict:
+    """Look up an order"""
+    return {"order_id": order_id, "status": "shipped"}
+
+
+@pytest.fixture
+def server():
+    with MockOpenAIServer() as mock:
+        yield mock
+
+
+def test_llm_invoke_against_mock(server, offline_encoding) -> None:
+    llm = LLM(api_key="mock", base_url=server.base_url, temperature=0.0)
+    response = llm.invoke("hello there")
+
+    assert response.content == "Mock answer to: hello there"
+    assert llm.last_usage["total_tokens"] > 0
+    assert server.requests["chat"] == 1
+
+
+def test_agent_completes_tool_round_trip(server, offline_encoding, monkeypatch) -> None:
+    monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+    monkeypatch.setenv("OPENAI_API_KEY", "mock")
+    agent = Agent("gpt-4o-mini", "Use tools.", tools=[lookup_order], temperature=0.0)
+    run = agent.invoke("Where is my order?")
+
+    messages = run.get_final_state()["messages"]
+    tool_message = next(m for m in messages if m.role == "tool")
+    assert json.loads(tool_message.content)["status"] == "shipped"
+    assert messages[-1].content == "Mock answer to: Where is my order?"
+    assert server.requests["chat"] == 2
+
+
+def test_scripted_replies_and_streaming(offline_encoding) -> None:
+    replies = [MockReply(tool_calls=[("lookup_order", {"order_id": "42"})]), MockReply(content="It shipped.")]
+    with MockOpenAIServer(replies) as server:
+        llm = LLM(api_key="mock", base_url=server.base_url, tools=[lookup_order])
+        first = list(llm.stream("Where is order 42?"))[-1].message
+        second = list(llm.stream("And now?"))
+
+    assert first.tool_calls[0].function.name == "lookup_order"
+    assert json.loads(first.tool_calls[0].function.arguments) == {"order_id": "42"}
+    assert [e.content for e in second if e.type == "delta"] == ["It", " shipped."]
+    assert second[-1].message.content == "It shipped."
+
+
+def test_embeddings_are_deterministic(server) -> None:
+    client = OpenAI(api_key="mock", base_url=server.base_url)
+    first = client.embeddings.create(model="text-embedding-3-small", input=["electric cars", "solar panels"])
+    second = client.embeddings.create(model="text-embedding-3-small", input="electric cars",
+                                      encoding_format="float")
+
+    vector = first.data[0].embedding
+    assert len(vector) == server.embedding_dimensions
+    assert vector == pytest.approx(second.data[0].embedding, abs=1e-6)
+    assert vector == pytest.approx(deterministic_embedding("electric cars"), abs=1e-6)
+    assert first.data[1].embedding != pytest.approx(vector, abs=1e-6)
+    client.close()
+
+
+def test_latency_models_are_seeded() -> None:
+    assert LatencyModel.fixed(0.1).sample() == 0.1
+    first = [LatencyModel.lognormal(0.2, seed=7).sample() for _ in range(3)]
+    second = [LatencyModel.lognormal(0.2, seed=7).sample() for _ in range(3)]
+    assert first == second
+    assert all(0.05 <= LatencyModel.uniform(0.05, 0.1, seed=1).sample() <= 0.1 for _ in range(10))
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+
+import pytest
+
+from lib.agents import Agent
+from lib.sandbox import ToolMemoryError, ToolTimeoutError
+from lib.tooling import ToolCall, tool
+
+
+# Process-mode tools must live at module level so the worker can import them
+
+
+@tool(mode="process")
+def square(n: int) -> dict:
+    """Square a number"""
+    return {"square": n * n}
+
+
+@tool(mode="process", timeout=0.5)
+def spin(seconds: float) -> dict:
+    """Busy-loop"""
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        pass
+    return {"done": True}
+
+
+@tool(mode="process", memory_limit_mb=64)
+def hog(megabytes: int) -> dict:
+    """Allocate memory"""
+    block = bytearray(megabytes * 1024 * 1024)
+    return {"size": len(block)}
+
+
+@tool(mode="inline")
+def where() -> dict:
+    """Report the running thread"""
+    return {"thread": threading.current_thread().name}
+
+
+def _call(call_id: str, name: str, **arguments) -> ToolCall:
+    return ToolCall(id=call_id, type="function",
+                    function={"name": name, "arguments": json.dumps(arguments)})
+
+
+def test_process_mode_enforces_timeout_and_memory_limit() -> None:
+    assert square.execute({"n": 7}) == {"square": 49}
+    with pytest.raises(ToolTimeoutError):
+        spin.execute({"seconds": 5}, timeout=0.5)
+    with pytest.raises(ToolMemoryError):
+        hog.execute({"megabytes": 512})
+    assert hog.execute({"megabytes": 8}) == {"size": 8 * 1024 * 1024}
+
+
+def test_agent_turns_sandbox_failures_into_error_envelopes() -> None:
+    agent = Agent("gpt-4o-mini", "Use tools.", tools=[square, spin, hog, where])
+    started = time.perf_counter()
+    update = agent._tool_step({"messages": [], "session_id": "s", "current_tool_calls": [
+        _call("1", "spin", seconds=5),
+        _call("2", "hog", megabytes=512),
+        _call("3", "square", n=3),
+        _call("4", "where"),
+    ]})
+
+    results = [json.loads(message.content) for message in update["messages"]]
+    assert time.perf_counter() - started < 4
+    assert results[0] == {"status": "error", "error": "Tool 'spin' timed out after 0.5s"}
+    assert results[1] == {"status": "error", "error": "Tool 'hog' exceeded its memory limit of 64 MB"}
+    assert results[2] == {"square": 9}
+    assert results[3] == {"thread": threading.current_thread().name}
+
+
+def test_invalid_execution_settings_are_rejected() -> None:
+    def local(n: int) -> dict:
+        """Local function"""
+        return {}
+
+    with pytest.raises(ValueError, match="defined inside a function"):
+        tool(mode="process")(local)
+    with pytest.raises(ValueError, match="requires mode='process'"):
+        tool(memory_limit_mb=64)(local)
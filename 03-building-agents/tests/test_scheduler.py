@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from lib.llm import LLM
+from lib.scheduler import Priority, RateLimits, RequestScheduler, RetryPolicy
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def test_token_budget_throttles_requests() -> None:
+    scheduler = RequestScheduler(RateLimits(tokens_per_minute=6000))  # 100 tokens/s
+    scheduler.acquire(tokens=6000)
+    started = time.perf_counter()
+    scheduler.acquire(tokens=20)
+
+    assert 0.15 <= time.perf_counter() - started < 0.5
+    assert scheduler.metrics()["queue_depth"] == 0
+
+
+def test_higher_priority_requests_are_admitted_first() -> None:
+    scheduler = RequestScheduler(RateLimits(tokens_per_minute=6000))
+    scheduler.acquire(tokens=6000)
+    order = []
+
+    def request(name: str, priority: Priority):
+        scheduler.acquire(tokens=10, priority=priority)
+        order.append(name)
+
+    batch = threading.Thread(target=request, args=("judge", Priority.BATCH))
+    batch.start()
+    time.sleep(0.02)
+    interactive = threading.Thread(target=request, args=("user", Priority.INTERACTIVE))
+    interactive.start()
+    time.sleep(0.02)
+    assert scheduler.metrics()["queue_depth_by_priority"] == {"interactive": 1, "batch": 1}
+    batch.join()
+    interactive.join()
+
+    assert order == ["user", "judge"]
+    assert scheduler.metrics()["max_queue_depth"] == 2
+
+
+def test_retries_transient_errors_with_backoff() -> None:
+    scheduler = RequestScheduler(retry=RetryPolicy(max_retries=3, base_delay=0.001))
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise _StatusError(429 if len(attempts) == 1 else 503)
+        return "ok"
+
+    assert scheduler.call(flaky) == "ok"
+    with pytest.raises(_StatusError):
+        scheduler.call(lambda: (_ for _ in ()).throw(_StatusError(400)))
+
+    metrics = scheduler.metrics()
+    assert (metrics["submitted"], metrics["completed"], metrics["failed"], metrics["retries"]) == (2, 1, 1, 2)
+    assert metrics["retries_by_status"] == {"429": 1, "503": 1}
+
+
+def test_llm_invoke_routes_through_scheduler() -> None:
+    failures = [_StatusError(500)]
+
+    def create(**payload):
+        if failures:
+            raise failures.pop()
+        message = SimpleNamespace(content="hello", tool_calls=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+    scheduler = RequestScheduler(retry=RetryPolicy(base_delay=0.001))
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    llm = LLM(client=client, scheduler=scheduler, priority=Priority.INTERACTIVE)
+
+    assert llm.invoke("hi").content == "hello"
+    assert scheduler.metrics()["retries"] == 1
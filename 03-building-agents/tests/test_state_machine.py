@@ -0,0 +1,406 @@
+from __future__ import annotations
+
+import asyncio
+import operator
+import time
+from typing import Annotated, List, TypedDict
+
+import pytest
+
+from lib.state_machine import EntryPoint, SnapshotRetention, StateMachine, Step, Termination
+
+
+class CounterState(TypedDict):
+    count: int
+    messages: List[str]
+    label: str
+
+
+def _build_loop_machine(iterations: int, **kwargs) -> StateMachine[CounterState]:
+    machine = StateMachine[CounterState](CounterState, **kwargs)
+    entry = EntryPoint[CounterState]()
+    increment = Step[CounterState](
+        "increment",
+        lambda state: {
+            "count": state["count"] + 1,
+            "messages": state["messages"] + [f"msg-{state['count']}"],
+        },
+    )
+    relabel = Step[CounterState]("relabel", lambda state: {"label": f"after-{state['count']}"})
+    termination = Termination[CounterState]()
+    machine.add_steps([entry, increment, relabel, termination])
+    machine.connect(entry, increment)
+    machine.connect(increment, relabel)
+    machine.connect(
+        relabel,
+        [increment, termination],
+        lambda state: increment if state["count"] < iterations else termination,
+    )
+    return machine
+
+
+def test_snapshots_store_only_changed_fields() -> None:
+    machine = _build_loop_machine(3)
+    run = machine.run({"count": 0, "messages": [], "label": "start"})
+
+    relabel_snaps = [s for s in run.snapshots if s.step_id == "relabel"]
+    assert all(set(s.changes) == {"label"} for s in relabel_snaps)
+
+    # Unchanged lists are shared with the parent snapshot rather than copied
+    first_relabel = relabel_snaps[0]
+    assert first_relabel.state_data["messages"] is first_relabel.parent.state_data["messages"]
+
+
+def test_snapshot_state_data_is_a_full_view() -> None:
+    machine = _build_loop_machine(3)
+    run = machine.run({"count": 0, "messages": [], "label": "start"})
+
+    final = run.get_final_state()
+    assert final == {"count": 3, "messages": ["msg-0", "msg-1", "msg-2"], "label": "after-3"}
+
+    counts = [s.state_data["count"] for s in run.snapshots if s.step_id == "increment"]
+    assert counts == [1, 2, 3]
+
+
+def test_detach_keeps_state_and_drops_parent() -> None:
+    machine = _build_loop_machine(2)
+    run = machine.run({"count": 0, "messages": [], "label": "start"})
+
+    last = run.snapshots[-1]
+    expected = last.state_data
+    last.detach()
+    assert last.parent is None
+    assert last.state_data == expected
+
+
+def test_in_place_mutation_is_recorded_and_shared_by_default() -> None:
+    machine = StateMachine[CounterState](CounterState)
+    entry = EntryPoint[CounterState]()
+
+    def mutate(state: CounterState) -> dict:
+        state["messages"].append("mutated")
+        return {"messages": state["messages"]}
+
+    termination = Termination[CounterState]()
+    machine.add_steps([entry, Step[CounterState]("mutate", mutate), termination])
+    machine.connect(entry, "mutate")
+    machine.connect("mutate", termination)
+
+    initial = {"count": 0, "messages": [], "label": "start"}
+    run = machine.run(initial)
+
+    assert run.snapshots[-1].changes == {"messages": ["mutated"]}
+    assert run.get_final_state()["messages"] == ["mutated"]
+    # Values are shared, not copied: earlier snapshots and the caller see the mutation
+    assert run.snapshots[0].state_data["messages"] == ["mutated"]
+    assert initial["messages"] == ["mutated"]
+
+
+def test_deepcopy_snapshots_protects_against_in_place_mutation() -> None:
+    machine = StateMachine[CounterState](CounterState, deepcopy_snapshots=True)
+    entry = EntryPoint[CounterState]()
+
+    def mutate(state: CounterState) -> dict:
+        state["messages"].append("mutated")
+        return {"messages": state["messages"], "count": state["count"] + 1}
+
+    termination = Termination[CounterState]()
+    machine.add_steps([entry, Step[CounterState]("mutate", mutate), termination])
+    machine.connect(entry, "mutate")
+    machine.connect("mutate", termination)
+
+    run = machine.run({"count": 0, "messages": [], "label": "start"})
+    assert run.snapshots[0].state_data["messages"] == []
+    assert run.get_final_state()["messages"] == ["mutated"]
+
+
+class FanOutState(TypedDict):
+    question: str
+    documents: Annotated[List[str], operator.add]
+    answer: str
+
+
+def _build_fan_out_machine(delay: float = 0.0) -> StateMachine[FanOutState]:
+    machine = StateMachine[FanOutState](FanOutState)
+    entry = EntryPoint[FanOutState]()
+
+    def make_retriever(name: str):
+        def retrieve(state: FanOutState) -> dict:
+            time.sleep(delay)
+            return {"documents": [f"{name}:{state['question']}"]}
+        return retrieve
+
+    store_a = Step[FanOutState]("store_a", make_retriever("a"))
+    store_b = Step[FanOutState]("store_b", make_retriever("b"))
+    merge = Step[FanOutState]("merge", lambda state: {"answer": " | ".join(state["documents"])})
+    termination = Termination[FanOutState]()
+
+    machine.add_steps([entry, store_a, store_b, merge, termination])
+    machine.connect(entry, [store_a, store_b])
+    machine.connect(store_a, merge)
+    machine.connect(store_b, merge)
+    machine.connect(merge, termination)
+    return machine
+
+
+def test_fan_out_merges_updates_with_reducers() -> None:
+    machine = _build_fan_out_machine()
+    run = machine.run({"question": "q", "documents": []})
+
+    final = run.get_final_state()
+    assert final["documents"] == ["a:q", "b:q"]
+    assert final["answer"] == "a:q | b:q"
+    # The merge step runs once even though both branches lead to it
+    assert [s.step_id for s in run.snapshots] == ["__entry__", "store_a", "store_b", "merge"]
+
+
+def test_fan_in_waits_for_branches_of_different_lengths() -> None:
+    machine = StateMachine[FanOutState](FanOutState)
+    entry = EntryPoint[FanOutState]()
+
+    def add(name: str):
+        return lambda state: {"documents": [name]}
+
+    termination = Termination[FanOutState]()
+    machine.add_steps([
+        entry,
+        Step[FanOutState]("short", add("short")),
+        Step[FanOutState]("long", add("long")),
+        Step[FanOutState]("longer", add("longer")),
+        Step[FanOutState]("merge", lambda state: {"answer": " | ".join(state["documents"])}),
+        termination,
+    ])
+    machine.connect(entry, ["short", "long"])
+    machine.connect("short", "merge")
+    machine.connect("long", "longer")
+    machine.connect("longer", "merge")
+    machine.connect("merge", termination)
+
+    run = machine.run({"question": "q", "documents": []})
+
+    assert [s.step_id for s in run.snapshots] == ["__entry__", "short", "long", "longer", "merge"]
+    assert run.get_final_state()["answer"] == "short | long | longer"
+
+
+def test_reducers_apply_to_single_step_updates() -> None:
+    machine = StateMachine[FanOutState](FanOutState)
+    entry = EntryPoint[FanOutState]()
+    termination = Termination[FanOutState]()
+    machine.add_steps([entry, Step[FanOutState]("retrieve", lambda state: {"documents": ["new"]}), termination])
+    machine.connect(entry, "retrieve")
+    machine.connect("retrieve", termination)
+
+    run = machine.run({"question": "q", "documents": ["old"]})
+    assert run.get_final_state()["documents"] == ["old", "new"]
+
+
+def test_fan_out_runs_siblings_concurrently() -> None:
+    machine = _build_fan_out_machine(delay=0.2)
+    started = time.perf_counter()
+    machine.run({"question": "q", "documents": []})
+    assert time.perf_counter() - started < 0.35
+
+
+def test_fan_out_without_reducer_keeps_last_update() -> None:
+    machine = StateMachine[CounterState](CounterState)
+    entry = EntryPoint[CounterState]()
+
+    def labeler(label: str):
+        def logic(state: CounterState) -> dict:
+            return {"label": label}
+        return logic
+
+    termination = Termination[CounterState]()
+    machine.add_steps([
+        entry,
+        Step[CounterState]("first", labeler("first")),
+        Step[CounterState]("second", labeler("second")),
+        termination,
+    ])
+    machine.connect(entry, ["first", "second"])
+    machine.connect("first", termination)
+    machine.connect("second", termination)
+
+    run = machine.run({"count": 0, "messages": [], "label": "start"})
+    assert run.get_final_state()["label"] == "second"
+
+
+def _build_async_machine(delay: float) -> StateMachine[CounterState]:
+    machine = StateMachine[CounterState](CounterState)
+    entry = EntryPoint[CounterState]()
+
+    async def slow_increment(state: CounterState) -> dict:
+        await asyncio.sleep(delay)
+        return {"count": state["count"] + 1}
+
+    async def route(state: CounterState) -> str:
+        return "relabel"
+
+    termination = Termination[CounterState]()
+    machine.add_steps([
+        entry,
+        Step[CounterState]("increment", slow_increment),
+        Step[CounterState]("relabel", lambda state: {"label": f"count-{state['count']}"}),
+        termination,
+    ])
+    machine.connect(entry, "increment")
+    machine.connect("increment", ["relabel"], route)
+    machine.connect("relabel", termination)
+    return machine
+
+
+def test_arun_awaits_async_steps_and_conditions() -> None:
+    machine = _build_async_machine(delay=0.0)
+    run = asyncio.run(machine.arun({"count": 0, "messages": [], "label": "start"}))
+
+    assert [s.step_id for s in run.snapshots] == ["__entry__", "increment", "relabel"]
+    assert run.get_final_state()["label"] == "count-1"
+    assert run.end_timestamp is not None
+
+
+def test_arun_drives_concurrent_runs_on_one_loop() -> None:
+    machine = _build_async_machine(delay=0.2)
+
+    async def run_all():
+        return await asyncio.gather(*[
+            machine.arun({"count": i, "messages": [], "label": "start"}) for i in range(20)
+        ])
+
+    started = time.perf_counter()
+    runs = asyncio.run(run_all())
+    assert time.perf_counter() - started < 1.0
+    assert [r.get_final_state()["count"] for r in runs] == [i + 1 for i in range(20)]
+
+
+def test_run_rejects_async_steps() -> None:
+    machine = _build_async_machine(delay=0.0)
+    with pytest.raises(TypeError):
+        machine.run({"count": 0, "messages": [], "label": "start"})
+
+
+def test_compile_is_cached_until_graph_changes() -> None:
+    machine = _build_loop_machine(2)
+    graph = machine.compile()
+    assert machine.compile() is graph
+    assert graph.entry_id == "__entry__"
+    assert graph.fields == {"count", "messages", "label"}
+
+    machine.add_steps([Step[CounterState]("extra", lambda state: {})])
+    machine.connect("extra", "relabel")
+    with pytest.raises(ValueError, match="'extra' is not reachable"):
+        machine.compile()
+
+
+def test_compile_reports_dangling_targets_and_dead_ends() -> None:
+    machine = StateMachine[CounterState](CounterState)
+    entry = EntryPoint[CounterState]()
+    machine.add_steps([entry, Step[CounterState]("dead_end", lambda state: {})])
+    machine.connect(entry, ["dead_end", "missing"])
+
+    with pytest.raises(ValueError) as excinfo:
+        machine.compile()
+    message = str(excinfo.value)
+    assert "'__entry__' -> 'missing' points to an unknown step" in message
+    assert "Step 'dead_end' has no outgoing transitions" in message
+
+
+def test_compile_requires_single_entry_point() -> None:
+    machine = StateMachine[CounterState](CounterState)
+    with pytest.raises(ValueError, match="No EntryPoint"):
+        machine.run({"count": 0})
+
+
+def _run_with_retention(retention: SnapshotRetention, iterations: int = 5):
+    machine = _build_loop_machine(iterations, snapshot_retention=retention)
+    return machine.run({"count": 0, "messages": [], "label": "start"})
+
+
+def test_retention_final_only_keeps_last_snapshot() -> None:
+    run = _run_with_retention(SnapshotRetention.final_only())
+
+    assert len(run.snapshots) == 1
+    assert run.snapshots[0].parent is None
+    assert run.get_final_state()["messages"] == [f"msg-{i}" for i in range(5)]
+    assert run.total_snapshots == 11
+    assert run.step_counts == {"__entry__": 1, "increment": 5, "relabel": 5}
+    assert not run.has_full_history
+
+
+def test_retention_last_n_bounds_snapshots() -> None:
+    run = _run_with_retention(SnapshotRetention.last(3), iterations=50)
+
+    assert [s.step_id for s in run.snapshots] == ["relabel", "increment", "relabel"]
+    assert [s.state_data["count"] for s in run.snapshots] == [49, 50, 50]
+    assert run.snapshots[0].parent is None
+    assert run.get_final_state()["label"] == "after-50"
+
+
+def test_retention_named_steps_keeps_those_and_latest() -> None:
+    run = _run_with_retention(SnapshotRetention.steps("increment"), iterations=3)
+
+    assert [s.step_id for s in run.snapshots] == ["increment", "increment", "increment", "relabel"]
+    assert [s.state_data["count"] for s in run.snapshots] == [1, 2, 3, 3]
+    assert run.get_final_state() == {
+        "count": 3, "messages": ["msg-0", "msg-1", "msg-2"], "label": "after-3",
+    }
+
+
+
+def test_retention_named_steps_filters_every_fan_out_snapshot() -> None:
+    machine = _build_fan_out_machine()
+    machine.snapshot_retention = SnapshotRetention.steps("store_a")
+    run = machine.run({"question": "q", "documents": []})
+
+    assert [s.step_id for s in run.snapshots] == ["store_a", "merge"]
+    assert run.get_final_state()["answer"] == "a:q | b:q"
+
+
+def _build_batch_machine(delay: float = 0.0) -> StateMachine[CounterState]:
+    def increment(state: CounterState) -> dict:
+        if state["count"] < 0:
+            raise ValueError(f"negative count: {state['count']}")
+        time.sleep(delay)
+        return {"count": state["count"] + 1}
+
+    machine = StateMachine[CounterState](CounterState)
+    entry = EntryPoint[CounterState]()
+    step = Step[CounterState]("increment", increment)
+    termination = Termination[CounterState]()
+    machine.add_steps([entry, step, termination])
+    machine.connect(entry, step)
+    machine.connect(step, termination)
+    return machine
+
+
+def test_run_many_keeps_input_order_and_reports_failures() -> None:
+    machine = _build_batch_machine()
+    batch = machine.run_many([{"count": 1}, {"count": -1}, {"label": "x"}, {"count": 5}, {"messages": []}],
+                             max_concurrency=3)
+
+    assert len(batch) == 5
+    assert batch.runs[0].get_final_state()["count"] == 2
+    assert batch.runs[3].get_final_state()["count"] == 6
+    assert sorted(batch.errors) == [1, 2, 4]
+    assert isinstance(batch.errors[1], ValueError)
+    # The failing run keeps the snapshots recorded before the error
+    assert batch.runs[1] is not None and batch.runs[1].end_timestamp is None
+    assert batch.metadata == {"total": 5, "succeeded": 2, "failed": 3}
+
+
+def test_run_many_bounds_concurrency() -> None:
+    machine = _build_batch_machine(delay=0.05)
+    started = time.perf_counter()
+    batch = machine.run_many([{"count": i} for i in range(8)], max_concurrency=4)
+    elapsed = time.perf_counter() - started
+
+    assert batch.ok
+    assert [run.get_final_state()["count"] for run in batch.runs] == list(range(1, 9))
+    assert 0.1 <= elapsed < 0.35
+
+
+def test_arun_many_reports_failures() -> None:
+    machine = _build_batch_machine()
+    batch = asyncio.run(machine.arun_many([{"count": -2}, {"count": 2}], max_concurrency=2))
+
+    assert list(batch.errors) == [0]
+    assert batch.runs[1].get_final_state()["count"] == 3
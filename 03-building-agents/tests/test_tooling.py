@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import asyncio
+from typing import List, Optional, TypedDict
+
+import pytest
+
+from lib.llm import LLM
+from lib.messages import AIMessage, SystemMessage, UserMessage
+from lib.tooling import TokenCounter, Tool, ToolArgumentError, estimate_tokens_for_payload
+
+
+def _history(turns: int) -> list:
+    messages = [SystemMessage(content="You are helpful.").dict()]
+    for i in range(turns):
+        messages.append(UserMessage(content=f"question {i}").dict())
+        messages.append(AIMessage(content=f"answer {i}").dict())
+    return messages
+
+
+def test_growing_history_only_encodes_new_messages(offline_encoding) -> None:
+    messages = _history(10)
+    first = estimate_tokens_for_payload(messages)
+    assert offline_encoding.calls == len(messages)
+
+    offline_encoding.calls = 0
+    messages.append(UserMessage(content="one more question").dict())
+    second = estimate_tokens_for_payload(messages)
+
+    assert offline_encoding.calls == 1
+    # The new message's words plus one separator
+    assert second - first == len('{"role": "user", "content": "one more question"}'.split()) + 1
+
+
+def test_count_payloads_encodes_unseen_messages_in_one_batch(offline_encoding) -> None:
+    counter = TokenCounter()
+    shared = _history(3)
+    payloads = [
+        {"messages": shared + [UserMessage(content="a").dict()]},
+        {"messages": shared + [UserMessage(content="b").dict()],
+         "tools": [{"type": "function", "function": {"name": "lookup"}}]},
+    ]
+
+    totals = counter.count_payloads(payloads)
+
+    assert offline_encoding.batch_calls == 1 and offline_encoding.calls == 0
+    assert totals == [counter.count_payload(p["messages"], p.get("tools")) for p in payloads]
+    # Shared history was encoded once: 7 shared + 2 new messages + 1 tool spec
+    assert counter.stats.size == 10
+    assert offline_encoding.calls == 0
+
+
+class Order(TypedDict):
+    order_id: str
+    items: List[str]
+    note: Optional[str]
+
+
+def find_order(order_id: str) -> Order:
+    """Find an order"""
+    return {"order_id": order_id, "items": [], "note": None}
+
+
+def test_tool_spec_is_compiled_once_and_shared_by_payloads(offline_encoding) -> None:
+    tools = [Tool(find_order, name=f"find_order_{i}") for i in range(3)]
+    llm = LLM(tools=tools, api_key="key", base_url="http://localhost:9999/v1")
+
+    first = llm._build_payload([UserMessage(content="hi")])
+    second = llm._build_payload([UserMessage(content="hello")])
+
+    assert all(a is b is tool.dict() for a, b, tool in zip(first["tools"], second["tools"], tools))
+    assert tools[0].spec.serialized.startswith(b'{"type": "function"')
+    assert '"order_id"' in tools[0].description
+
+    offline_encoding.calls = 0
+    assert [tool.token_estimate() for tool in tools] == [spec.tokens for spec in llm.tool_specs]
+    assert offline_encoding.calls == 0
+
+
+def test_register_tool_recompiles_the_llm_spec_list(offline_encoding) -> None:
+    llm = LLM(tools=[Tool(find_order)], api_key="key", base_url="http://localhost:9999/v1")
+    assert [spec.name for spec in llm.tool_specs] == ["find_order"]
+
+    llm.register_tool(Tool(find_order, name="find_order_again"))
+    assert [spec.name for spec in llm.tool_specs] == ["find_order", "find_order_again"]
+    payload = llm._build_payload([UserMessage(content="hi")])
+    assert [t["function"]["name"] for t in payload["tools"]] == ["find_order", "find_order_again"]
+
+
+def plan_trip(city: str, days: int = 1, stops: Optional[List[str]] = None) -> dict:
+    """Plan a trip"""
+    return {"city": city, "days": days}
+
+
+def test_validate_arguments_coerces_to_parameter_types() -> None:
+    trip = Tool(plan_trip)
+    assert trip.validate_arguments('{"city": "Lima", "days": "3"}') == {"city": "Lima", "days": 3}
+    assert trip.validate_arguments({"city": "Lima", "stops": ["Cusco"]}) == {"city": "Lima", "stops": ["Cusco"]}
+
+
+def test_validate_arguments_reports_every_problem_compactly() -> None:
+    trip = Tool(plan_trip)
+    with pytest.raises(ToolArgumentError) as excinfo:
+        trip.validate_arguments('{"days": "many", "budget": 10}')
+
+    assert excinfo.value.result() == {
+        "status": "error",
+        "error": "Invalid arguments for tool 'plan_trip'",
+        "problems": [
+            {"field": "city", "problem": "Field required"},
+            {"field": "days", "problem": "Input should be a valid integer, unable to parse string as an integer"},
+            {"field": "budget", "problem": "Extra inputs are not permitted"},
+        ],
+    }
+
+    with pytest.raises(ToolArgumentError, match="Invalid JSON"):
+        trip.validate_arguments('{"city": ')
+
+
+def count_items(orders: List[Order]) -> int:
+    """Count the items in some orders"""
+    return sum(len(order["items"]) for order in orders)
+
+
+def test_validate_arguments_keeps_extra_keys_of_nested_types() -> None:
+    counter = Tool(count_items)
+    order = {"order_id": "A1", "items": ["book"], "note": None, "carrier": "DHL"}
+
+    assert counter.validate_arguments({"orders": [order]}) == {"orders": [order]}
+    with pytest.raises(ToolArgumentError, match="Invalid arguments"):
+        counter.validate_arguments({"orders": [order], "limit": 1})
+
+
+async def double(value: int) -> int:
+    """Double a value"""
+    await asyncio.sleep(0)
+    return value * 2
+
+
+def test_async_tool_called_synchronously_inside_a_running_loop() -> None:
+    doubler = Tool(double)
+    assert doubler(value=2) == 4
+
+    async def notebook_cell():
+        # Like calling the tool from a Jupyter cell, where a loop is already running
+        return doubler(value=3)
+
+    assert asyncio.run(notebook_cell()) == 6
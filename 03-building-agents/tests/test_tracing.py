@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import json
+import time
+from typing import List, TypedDict
+
+from lib.state_machine import EntryPoint, StateMachine, Step, Termination
+from lib.tracing import aggregate_latency, export_chrome_trace, export_json_spans
+
+
+class AgentLikeState(TypedDict):
+    messages: List[str]
+
+
+def _build_machine() -> StateMachine[AgentLikeState]:
+    machine = StateMachine[AgentLikeState](AgentLikeState)
+    entry = EntryPoint[AgentLikeState]()
+
+    def slow(name: str, delay: float):
+        def logic(state: AgentLikeState) -> dict:
+            time.sleep(delay)
+            return {"messages": state["messages"] + [name]}
+        return logic
+
+    termination = Termination[AgentLikeState]()
+    machine.add_steps([
+        entry,
+        Step[AgentLikeState]("message_prep", slow("prep", 0.0)),
+        Step[AgentLikeState]("llm_processor", slow("llm", 0.03)),
+        termination,
+    ])
+    machine.connect(entry, "message_prep")
+    machine.connect("message_prep", "llm_processor")
+    machine.connect("llm_processor", termination)
+    return machine
+
+
+def test_snapshots_carry_step_timing() -> None:
+    run = _build_machine().run({"messages": []})
+
+    llm = run.snapshots[-1]
+    assert llm.timing is not None
+    assert llm.timing.duration >= 0.03
+    assert llm.timing.ended_at >= llm.timing.started_at
+    assert llm.metadata["duration_ms"] >= 30
+
+    breakdown = run.latency_breakdown()
+    assert set(breakdown) == {"__entry__", "message_prep", "llm_processor"}
+    assert breakdown["llm_processor"]["share"] > 0.5
+
+
+def test_exporters_write_chrome_trace_and_spans(tmp_path) -> None:
+    machine = _build_machine()
+    runs = [machine.run({"messages": []}) for _ in range(2)]
+
+    trace_path = tmp_path / "trace.json"
+    export_chrome_trace(runs, str(trace_path))
+    trace = json.loads(trace_path.read_text())
+    step_events = [e for e in trace["traceEvents"] if e["ph"] == "X"]
+    assert len(step_events) == 6
+    assert {e["pid"] for e in step_events} == {1, 2}
+
+    spans_path = tmp_path / "spans.json"
+    export_json_spans(runs, str(spans_path))
+    spans = json.loads(spans_path.read_text())
+    assert [s["name"] for s in spans if s["parent_span_id"] is None] == ["run", "run"]
+
+    stats = aggregate_latency(runs)
+    assert stats["llm_processor"]["count"] == 2
+    assert stats["llm_processor"]["p95_ms"] >= stats["message_prep"]["p95_ms"]